@@ -17,6 +17,107 @@ if REDIS_URL:
     except Exception as e:
         print(f"⚠️ Redis no disponible: {e}")
 
+# Retención de bitácoras particionadas (access_logs / panic_logs)
+LOG_RETENTION_MONTHS = int(os.getenv("LOG_RETENTION_MONTHS", "12")) # Meses que quedan "en caliente" en la BD
+LOG_PARTITION_MONTHS_AHEAD = int(os.getenv("LOG_PARTITION_MONTHS_AHEAD", "2"))
+LOG_ARCHIVE_DIR = os.getenv("LOG_ARCHIVE_DIR", "archive/logs") # Destino de los .csv.gz exportados
+
+# Buffer de escritura para eventos de portería (AccessLog en micro-lotes)
+ACCESS_BUFFER_FLUSH_MS = int(os.getenv("ACCESS_BUFFER_FLUSH_MS", "50"))
+ACCESS_BUFFER_MAX_ROWS = int(os.getenv("ACCESS_BUFFER_MAX_ROWS", "200"))
+ACCESS_BUFFER_MAX_PENDING = int(os.getenv("ACCESS_BUFFER_MAX_PENDING", "5000")) # Sobre esto -> commit directo
+
+# Tracking GPS en vivo (incidentes de pánico)
+TRACKING_VIEWER_INTERVAL_MS = int(os.getenv("TRACKING_VIEWER_INTERVAL_MS", "2000")) # Ritmo por defecto de cada guardia
+TRACKING_MIN_INTERVAL_MS = int(os.getenv("TRACKING_MIN_INTERVAL_MS", "500")) # Lo más rápido que puede pedir un visor
+TRACKING_TRAIL_SIZE = int(os.getenv("TRACKING_TRAIL_SIZE", "120")) # Puntos guardados por incidente (replay)
+TRACKING_TTL_SECONDS = int(os.getenv("TRACKING_TTL_SECONDS", "1800")) # Sin GPS por este tiempo -> se olvida
+
+# Incidentes de pánico
+PANIC_DEDUP_WINDOW_SECONDS = int(os.getenv("PANIC_DEDUP_WINDOW_SECONDS", "120")) # Toques repetidos = mismo incidente
+PANIC_INCIDENT_TTL_SECONDS = int(os.getenv("PANIC_INCIDENT_TTL_SECONDS", "1800")) # Se cierra solo si nadie lo resuelve
+PANIC_LANE_WORKERS = int(os.getenv("PANIC_LANE_WORKERS", "4")) # Hilos exclusivos para push/persistencia de pánico
+PANIC_SEND_TIMEOUT_MS = int(os.getenv("PANIC_SEND_TIMEOUT_MS", "2000")) # Socket lento no frena la alarma
+
+# Acuses de lectura de comunicados (bitmaps por boletín, escritos en lote)
+RECEIPT_FLUSH_MS = int(os.getenv("RECEIPT_FLUSH_MS", "500"))
+RECEIPT_MAX_PENDING = int(os.getenv("RECEIPT_MAX_PENDING", "50000")) # Sobre esto -> escritura directa
+
+# Reportes de salud de la PWA (app/utils/health_buffer.py)
+HEALTH_FLUSH_MS = int(os.getenv("HEALTH_FLUSH_MS", "10000"))
+HEALTH_MIN_INTERVAL_SECONDS = int(os.getenv("HEALTH_MIN_INTERVAL_SECONDS", "300")) # Por dispositivo (salvo cambio de permiso)
+HEALTH_MAX_PENDING = int(os.getenv("HEALTH_MAX_PENDING", "50000")) # Sobre esto -> escritura directa
+
+# Canal SSE de solo lectura (/sse/events)
+SSE_REPLAY_SIZE = int(os.getenv("SSE_REPLAY_SIZE", "500")) # Eventos recientes para reanudar con Last-Event-ID
+SSE_REPLAY_TTL_SECONDS = int(os.getenv("SSE_REPLAY_TTL_SECONDS", "300"))
+SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "100")) # Cliente que no lee -> se corta (reconecta y reanuda)
+SSE_KEEPALIVE_SECONDS = int(os.getenv("SSE_KEEPALIVE_SECONDS", "20"))
+
+# Salud de las conexiones en tiempo real (/ws/alerta, /sse/events)
+WS_PING_INTERVAL_SECONDS = int(os.getenv("WS_PING_INTERVAL_SECONDS", "25"))
+WS_IDLE_TIMEOUT_SECONDS = int(os.getenv("WS_IDLE_TIMEOUT_SECONDS", "75")) # Sin PONG ni mensajes -> se cierra
+WS_MAX_PER_ORG = int(os.getenv("WS_MAX_PER_ORG", "3000")) # Organization.config["ws_limit"] lo sobrescribe
+WS_MAX_PER_MEMBER = int(os.getenv("WS_MAX_PER_MEMBER", "5")) # Sobre esto se cierra la conexión más vieja
+METRICS_TOKEN = os.getenv("METRICS_TOKEN") # Sin token, /metrics no se expone
+
+# Caché de fragmentos HTMX (app/core/fragments.py)
+FRAGMENT_CACHE_TTL_SECONDS = int(os.getenv("FRAGMENT_CACHE_TTL_SECONDS", "300"))
+FRAGMENT_CACHE_MAX_ENTRIES = int(os.getenv("FRAGMENT_CACHE_MAX_ENTRIES", "2000"))
+
+# Plantillas Jinja (app/templating.py)
+APP_ENV = os.getenv("APP_ENV", "production" if os.getenv("RAILWAY_ENVIRONMENT") else "development")
+TEMPLATES_AUTO_RELOAD = os.getenv("TEMPLATES_AUTO_RELOAD", "true" if APP_ENV == "development" else "false").lower() == "true"
+TEMPLATES_PRECOMPILE = os.getenv("TEMPLATES_PRECOMPILE", "true" if APP_ENV == "production" else "false").lower() == "true"
+TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR", "/tmp/leavisamos-jinja") # Vacío = sin caché de bytecode
+
+# Pipeline de estáticos (app/core/assets.py)
+ASSET_FINGERPRINT = os.getenv("ASSET_FINGERPRINT", "true" if APP_ENV == "production" else "false").lower() == "true" # false = asset_url() devuelve /static/... (desarrollo)
+ASSET_BUILD_DIR = os.getenv("ASSET_BUILD_DIR", "/tmp/leavisamos-assets") # Variantes .br / .gz generadas
+ASSET_MAX_AGE_SECONDS = int(os.getenv("ASSET_MAX_AGE_SECONDS", "31536000")) # 1 año: la URL cambia si cambia el archivo
+
+# Medios con Range / ETag fuerte (app/core/media.py)
+MEDIA_MEMORY_CACHE_MB = int(os.getenv("MEDIA_MEMORY_CACHE_MB", "64")) # Archivos chicos servidos desde RAM
+MEDIA_MEMORY_MAX_FILE_MB = int(os.getenv("MEDIA_MEMORY_MAX_FILE_MB", "8")) # Más grandes: zero-copy o en trozos
+
+# Alertas de mascota perdida (app/core/pet_alerts.py)
+PET_ALERT_DELAY_SECONDS = int(os.getenv("PET_ALERT_DELAY_SECONDS", "20")) # Margen para arrepentirse antes de avisar
+PET_ALERT_WINDOW_SECONDS = int(os.getenv("PET_ALERT_WINDOW_SECONDS", "600")) # Misma mascota: un aviso por ventana
+
+# Directorio público de colegios (app/core/directory.py)
+DIRECTORY_TTL_SECONDS = int(os.getenv("DIRECTORY_TTL_SECONDS", "600")) # Red de seguridad: cambios hechos a mano en BD
+DIRECTORY_MAX_RESULTS = int(os.getenv("DIRECTORY_MAX_RESULTS", "20"))
+DIRECTORY_PROFILE_MAX_AGE = int(os.getenv("DIRECTORY_PROFILE_MAX_AGE", "300")) # Cache-Control de /cpc/* (navegador, CDN, buscadores)
+
+# Límite de peticiones (app/utils/rate_limit.py). Presupuesto "N/segundos":
+# balde de N fichas que se rellena en esa ventana. "org" va por plan
+# (Organization.config["plan"]; sin plan -> "default").
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "true" if APP_ENV == "production" else "false").lower() == "true" # IP de X-Forwarded-For
+RATE_LIMIT_PROXY_HOPS = int(os.getenv("RATE_LIMIT_PROXY_HOPS", "1")) # Proxies propios delante (Railway = 1): cada uno agrega una IP a la derecha
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000")) # Baldes en memoria (sin Redis)
+RATE_LIMITS = {
+    "auth": { # /auth/login: fuerza bruta de códigos
+        "ip": os.getenv("RATE_LIMIT_AUTH_IP", "10/60")
+    },
+    "public": { # /directory, /cpc: sin sesión, visitados por buscadores
+        "ip": os.getenv("RATE_LIMIT_PUBLIC_IP", "60/60"),
+        "org": {"default": "600/60", "pro": "3000/60"}
+    },
+    "llm": { # Cerebro y lectura de vouchers: cada llamada cuesta tokens de OpenAI
+        "ip": os.getenv("RATE_LIMIT_LLM_IP", "10/60"),
+        "org": {"default": "100/3600", "pro": "1000/3600"}
+    }
+}
+
+# Contraseñas argon2 (app/utils/security.py). Cambiar los parámetros no rompe
+# nada: cada hash viejo se rehace en el siguiente login correcto
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "3"))
+ARGON2_MEMORY_COST_KB = int(os.getenv("ARGON2_MEMORY_COST_KB", "65536")) # 64 MB por hash en curso
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "4"))
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", "2")) # Hashes simultáneos (CPU y RAM acotadas)
+PASSWORD_MAX_QUEUE = int(os.getenv("PASSWORD_MAX_QUEUE", "64")) # Logins esperando; sobre esto -> 503
+
 # Temas por defecto
 DEFAULT_THEME = {
     "site_name": "LeAvisamos",
@@ -0,0 +1,178 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+import time
+from fastapi.responses import Response
+from app.config import ASSET_FINGERPRINT, ASSET_BUILD_DIR, ASSET_MAX_AGE_SECONDS
+from app.core.media import MediaResponse
+
+try:
+    import brotli # Opcional: sin él solo se sirve gzip
+except ImportError:
+    brotli = None
+
+# ==========================================================
+# PIPELINE DE ESTÁTICOS
+# Al arrancar se recorre static/ y cada archivo recibe un nombre con el
+# hash de su contenido:  css/styles.css -> /assets/css/styles.3f9a1c2b7d.css
+# Esa URL nunca cambia de contenido -> Cache-Control: immutable (1 año).
+# Los textos (css/js/svg/json) se comprimen UNA vez (.br / .gz en
+# ASSET_BUILD_DIR) y se elige la variante según Accept-Encoding.
+#   En plantillas:  <link rel="stylesheet" href="{{ asset_url('css/styles.css') }}">
+# ==========================================================
+
+STATIC_DIR = "static"
+URL_PREFIX = "/assets/"
+COMPRESSIBLE = {".css", ".js", ".json", ".svg", ".html", ".txt", ".map", ".webmanifest"}
+MIN_COMPRESS_BYTES = 1024
+
+# Shell que el service worker guarda al instalarse (app/templates/pwa/service-worker.js)
+SW_PRECACHE = [
+    "css/styles.css",
+    "css/components/toast.css",
+    "js/modules/neural_core.js",
+    "js/modules/health_check.js",
+    "js/components/toast.js",
+    "css/pages/login.css",
+    "css/pages/dashboard.css",
+    "js/pages/dashboard.js",
+    "js/pages/home_security.js",
+    "sounds/sirena.mp3", # La pantalla offline de pánico la necesita
+    "sounds/ding-dong.mp3",
+    "img/icon-192.png",
+]
+
+
+class Asset:
+    __slots__ = ("source", "digest", "url", "media_type", "variants")
+
+    def __init__(self, source, digest, url, media_type):
+        self.source = source # Ruta real en disco
+        self.digest = digest
+        self.url = url
+        self.media_type = media_type
+        self.variants = {} # "br"/"gzip" -> ruta del archivo comprimido
+
+
+def _hashed_name(rel_path, digest):
+    stem, ext = os.path.splitext(rel_path)
+    return f"{stem}.{digest}{ext}"
+
+
+def _compress(asset, rel_path):
+    """ Genera (o reutiliza del build anterior) las variantes comprimidas. """
+    with open(asset.source, "rb") as f:
+        raw = f.read()
+    if len(raw) < MIN_COMPRESS_BYTES:
+        return
+
+    encoders = [("gzip", ".gz", lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli:
+        encoders.insert(0, ("br", ".br", lambda data: brotli.compress(data, quality=11)))
+
+    for encoding, suffix, encode in encoders:
+        target = os.path.join(ASSET_BUILD_DIR, _hashed_name(rel_path, asset.digest) + suffix)
+        if not os.path.exists(target):
+            data = encode(raw)
+            if len(data) > len(raw) * 0.9: # No vale la pena
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            tmp = f"{target}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, target) # Atómico: otro worker puede estar construyendo lo mismo
+        asset.variants[encoding] = target
+
+
+class AssetManifest:
+    def __init__(self, static_dir=STATIC_DIR):
+        self.static_dir = static_dir
+        self.by_path = {} # "css/styles.css" -> Asset
+        self.by_url = {} # "css/styles.3f9a1c2b7d.css" -> Asset
+        self._built = False
+        self._lock = threading.Lock()
+
+    def build(self):
+        """ Hash + compresión de todo static/. Idempotente; se llama al arrancar. """
+        with self._lock:
+            if self._built:
+                return
+            start = time.perf_counter()
+            compressed = 0
+            for root, _, files in os.walk(self.static_dir):
+                for name in files:
+                    source = os.path.join(root, name)
+                    rel_path = os.path.relpath(source, self.static_dir).replace(os.sep, "/")
+                    with open(source, "rb") as f:
+                        digest = hashlib.sha256(f.read()).hexdigest()[:10]
+                    hashed = _hashed_name(rel_path, digest)
+                    media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                    asset = Asset(source, digest, URL_PREFIX + hashed, media_type)
+
+                    if os.path.splitext(name)[1].lower() in COMPRESSIBLE:
+                        try:
+                            _compress(asset, rel_path)
+                            compressed += bool(asset.variants)
+                        except OSError as e:
+                            print(f"⚠️ Assets: no se pudo comprimir {rel_path}: {e}")
+
+                    self.by_path[rel_path] = asset
+                    self.by_url[hashed] = asset
+            self._built = True
+            print(f"✅ {len(self.by_path)} estáticos con hash ({compressed} comprimidos"
+                  f"{'' if brotli else ', sin brotli'}) en {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    def url_for(self, rel_path):
+        rel_path = rel_path.lstrip("/")
+        if ASSET_FINGERPRINT:
+            if not self._built:
+                self.build()
+            asset = self.by_path.get(rel_path)
+            if asset:
+                return asset.url
+        return f"/static/{rel_path}" # Sin hash (desarrollo o archivo desconocido)
+
+    def precache_for(self, slug=None):
+        """ URLs del shell + el portal propio de la organización (sites/<slug>.css/js). """
+        if not self._built:
+            self.build()
+        paths = list(SW_PRECACHE)
+        if slug:
+            paths += [p for p in (f"css/sites/{slug}.css", f"js/sites/{slug}.js") if p in self.by_path]
+        return [self.url_for(p) for p in paths]
+
+    def response(self, hashed_path, accept_encoding=""):
+        if not self._built:
+            self.build()
+        asset = self.by_url.get(hashed_path)
+        cache_control = f"public, max-age={ASSET_MAX_AGE_SECONDS}, immutable"
+
+        if asset is None:
+            # HTML viejo pidiendo un hash anterior (deploy reciente): se sirve la
+            # versión actual, pero SIN immutable para no fijar contenido ajeno a esa URL
+            stem, ext = os.path.splitext(hashed_path)
+            asset = self.by_path.get(os.path.splitext(stem)[0] + ext)
+            if asset is None:
+                return Response(status_code=404)
+            cache_control = "public, max-age=60"
+
+        # Range / If-Range / 304 los resuelve MediaResponse; el ETag fuerte
+        # cambia con la codificación (bytes distintos = ETag distinto)
+        headers = {"Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        accepted = {part.split(";")[0].strip() for part in accept_encoding.lower().split(",")}
+        for encoding in ("br", "gzip"):
+            if encoding in asset.variants and encoding in accepted:
+                headers["Content-Encoding"] = encoding
+                return MediaResponse(asset.variants[encoding], media_type=asset.media_type,
+                                     etag=f'"{asset.digest}-{encoding}"', headers=headers)
+        return MediaResponse(asset.source, media_type=asset.media_type, etag=f'"{asset.digest}"', headers=headers)
+
+
+assets = AssetManifest()
+
+
+def asset_url(rel_path):
+    """ Global de Jinja: asset_url('js/pages/dashboard.js') """
+    return assets.url_for(rel_path)
@@ -0,0 +1,143 @@
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+from sqlalchemy import or_
+from app.models import Bulletin
+from app.core.events import on, publish
+from app.core.targeting import audience_cache, normalize_criteria
+
+# ==========================================================
+# ÚLTIMOS COMUNICADOS ACTIVOS POR ORGANIZACIÓN (caché)
+# /dashboard y /api/bulletins/latest leen de aquí: sin ordenar la tabla
+# en cada visita. Se llena al crear un comunicado (bus de eventos, también
+# en los demás workers); los vencidos se descartan al leer.
+# Si los últimos N apuntan a otras audiencias, los vigentes anteriores
+# (hasta OLDER_SCAN_LIMIT) también quedan en memoria, por organización.
+# ==========================================================
+
+LATEST_PER_ORG = 5
+OLDER_SCAN_LIMIT = 50 # Comunicados vigentes más viejos que se revisan si ninguno del caché aplica
+
+
+@dataclass
+class BulletinSnapshot:
+    id: int
+    organization_id: int
+    title: str
+    content: str
+    priority: str
+    interaction_type: str
+    target_criteria: dict
+    created_at: datetime
+    expires_at: datetime = None
+
+    @classmethod
+    def from_model(cls, bulletin: Bulletin):
+        return cls(bulletin.id, bulletin.organization_id, bulletin.title, bulletin.content,
+                   bulletin.priority or "info", bulletin.interaction_type or "read_only",
+                   bulletin.target_criteria or {}, _aware(bulletin.created_at), _aware(bulletin.expires_at))
+
+    @classmethod
+    def from_payload(cls, data: dict):
+        data = dict(data)
+        for key in ("created_at", "expires_at"):
+            if isinstance(data.get(key), str):
+                data[key] = _aware(datetime.fromisoformat(data[key]))
+        return cls(**data)
+
+    def is_active(self, now):
+        return self.expires_at is None or self.expires_at > now
+
+
+def _aware(value):
+    # SQLite devuelve fechas "naive": se asumen UTC
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _reaches(db, member, snapshot):
+    criteria = normalize_criteria(snapshot.target_criteria)
+    return criteria == {"all": True} or member.id in audience_cache.resolve(db, member.organization_id, criteria)
+
+
+class LatestBulletinsCache:
+    def __init__(self, size=LATEST_PER_ORG):
+        self.size = size
+        self._by_org = {} # org_id -> [BulletinSnapshot] (más nuevo primero)
+        self._older = {} # org_id -> (created_at del último del caché, [BulletinSnapshot])
+
+    def _load(self, db, org_id):
+        now = datetime.now(timezone.utc)
+        rows = db.query(Bulletin).filter(
+            Bulletin.organization_id == org_id,
+            or_(Bulletin.expires_at == None, Bulletin.expires_at > now)
+        ).order_by(Bulletin.created_at.desc()).limit(self.size).all()
+        snapshots = [BulletinSnapshot.from_model(b) for b in rows]
+        self._by_org[org_id] = snapshots
+        return snapshots
+
+    def active(self, db, org_id):
+        now = datetime.now(timezone.utc)
+        snapshots = self._by_org.get(org_id)
+        if snapshots is None:
+            snapshots = self._load(db, org_id)
+
+        active = [s for s in snapshots if s.is_active(now)]
+        if len(active) < len(snapshots):
+            # Alguno expiró: recargar para rellenar el hueco con el siguiente vigente
+            snapshots = self._load(db, org_id)
+            active = [s for s in snapshots if s.is_active(now)]
+        return active
+
+    def latest_for(self, db, member):
+        """ El comunicado vigente más nuevo cuya audiencia incluye al vecino. """
+        active = self.active(db, member.organization_id)
+        for snapshot in active:
+            if _reaches(db, member, snapshot):
+                return snapshot
+        if len(active) < self.size:
+            return None # No hay más vigentes que los del caché
+
+        # Los últimos N son para otras audiencias: puede haber uno viejo "para todos"
+        for snapshot in self._older_than(db, member.organization_id, active[-1].created_at):
+            if _reaches(db, member, snapshot):
+                return snapshot
+        return None
+
+    def _older_than(self, db, org_id, anchor):
+        # Una consulta por organización (no por visita al dashboard): vale
+        # mientras no cambie el último del caché (push / recarga) y no venza ninguno
+        now = datetime.now(timezone.utc)
+        cached = self._older.get(org_id)
+        if cached and cached[0] == anchor and all(s.is_active(now) for s in cached[1]):
+            return cached[1]
+
+        rows = db.query(Bulletin).filter(
+            Bulletin.organization_id == org_id,
+            Bulletin.created_at < anchor,
+            or_(Bulletin.expires_at == None, Bulletin.expires_at > now)
+        ).order_by(Bulletin.created_at.desc()).limit(OLDER_SCAN_LIMIT).all()
+        snapshots = [BulletinSnapshot.from_model(b) for b in rows]
+        self._older[org_id] = (anchor, snapshots)
+        return snapshots
+
+    def push(self, snapshot: BulletinSnapshot):
+        snapshots = self._by_org.get(snapshot.organization_id)
+        if snapshots is None:
+            return # Aún no cargado: la primera lectura lo trae de la BD
+        snapshots = [s for s in snapshots if s.id != snapshot.id]
+        snapshots.insert(0, snapshot)
+        snapshots.sort(key=lambda s: s.created_at, reverse=True)
+        self._by_org[snapshot.organization_id] = snapshots[:self.size]
+
+latest_bulletins = LatestBulletinsCache()
+
+
+def announce_bulletin(bulletin: Bulletin):
+    """ Llamar tras el commit de un comunicado nuevo. """
+    publish("bulletin.created", bulletin=asdict(BulletinSnapshot.from_model(bulletin)))
+
+
+@on("bulletin.created")
+def _on_bulletin_created(payload):
+    latest_bulletins.push(BulletinSnapshot.from_payload(payload["bulletin"]))
@@ -0,0 +1,68 @@
+import hashlib
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from app.models import Device
+
+# ==========================================================
+# REGISTRO DE DISPOSITIVOS PUSH
+# Clave = sha256 del endpoint (64 caracteres fijos, índice único chico)
+# en vez del endpoint en sí (URL de 200-500 caracteres).
+# Un solo INSERT ... ON CONFLICT DO UPDATE: sin SELECT previo, sin carrera
+# cuando la PWA se re-suscribe varias veces seguidas tras una actualización.
+# ==========================================================
+
+MAX_BATCH = 20 # Dispositivos por llamada en /push/subscribe/batch
+
+
+def endpoint_hash(endpoint: str):
+    return hashlib.sha256(endpoint.encode()).hexdigest()
+
+
+def device_row(member_id, subscription: dict, details: dict, user_agent: str):
+    """ Fila lista para upsert_devices, o None si la suscripción no trae endpoint. """
+    endpoint = (subscription or {}).get("endpoint")
+    if not endpoint:
+        return None
+    keys = subscription.get("keys", {})
+    details = details or {}
+    return {
+        "member_id": member_id,
+        "push_endpoint": endpoint,
+        "endpoint_hash": endpoint_hash(endpoint),
+        "push_p256dh": keys.get("p256dh"),
+        "push_auth": keys.get("auth"),
+        # Huella Digital
+        "user_agent": user_agent,
+        "platform": details.get("platform"),
+        "timezone": details.get("timezone"),
+        "is_pwa": bool(details.get("is_pwa", False))
+    }
+
+
+def upsert_devices(db, rows):
+    """
+    Inserta o actualiza por endpoint_hash. Devuelve {endpoint_hash: device_id}.
+    El commit lo hace quien llama.
+    """
+    # El mismo endpoint dos veces en un lote rompe el ON CONFLICT: gana el último
+    rows = list({row["endpoint_hash"]: row for row in rows}.values())
+    if not rows:
+        return {}
+
+    dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+    stmt = dialect.insert(Device).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Device.endpoint_hash],
+        set_={
+            # El endpoint es del navegador: si otro vecino inicia sesión ahí, pasa a ser suyo
+            "member_id": stmt.excluded.member_id,
+            "push_p256dh": stmt.excluded.push_p256dh,
+            "push_auth": stmt.excluded.push_auth,
+            "user_agent": stmt.excluded.user_agent,
+            "platform": stmt.excluded.platform,
+            "timezone": stmt.excluded.timezone,
+            "is_pwa": stmt.excluded.is_pwa,
+            "last_seen": func.now()
+        }
+    ).returning(Device.endpoint_hash, Device.id)
+    return {row.endpoint_hash: row.id for row in db.execute(stmt)}
@@ -0,0 +1,169 @@
+import bisect
+import difflib
+import hashlib
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass, astuple
+from fastapi import Request
+from fastapi.responses import HTMLResponse, Response
+from app.models import Member, User, Organization
+from app.core.fragments import bump_versions, current_versions
+from app.config import DIRECTORY_TTL_SECONDS, DIRECTORY_MAX_RESULTS, DIRECTORY_PROFILE_MAX_AGE
+
+# ==========================================================
+# DIRECTORIO PÚBLICO (colegios profesionales)
+# /directory/accountants y /cpc/* son públicos (y los visitan buscadores):
+# antes cada tecla = JOIN Member/User/Organization con ILIKE '%q%'.
+# Ahora cada colegio tiene un índice en memoria, solo con campos públicos,
+# ordenado para buscar por prefijo con bisect (+ subcadena y parecido).
+# Se reconstruye cuando cambia la versión "directory:org:N" (Redis, todos
+# los workers) o al vencer DIRECTORY_TTL_SECONDS (cambios hechos a mano en BD).
+# ==========================================================
+
+ALL = None # Clave del índice "todos los colegios" (host sin colegio propio)
+
+
+def fold(text):
+    """ 'Pérez' -> 'perez': búsqueda sin mayúsculas ni tildes. """
+    text = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in text if not unicodedata.combining(c)).lower().strip()
+
+
+@dataclass(frozen=True)
+class DirectoryEntry:
+    public_id: str
+    name: str
+    photo_url: str
+    position: str
+    habilitado: bool
+    org_id: int
+    theme_color: str
+
+
+class DirectoryIndex:
+    def __init__(self, entries, version):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.entries = sorted(entries, key=lambda e: fold(e.name))
+        self.by_public_id = {e.public_id: e for e in self.entries}
+        self._names = [fold(e.name) for e in self.entries]
+        self._ids = [fold(e.public_id) for e in self.entries]
+
+        # (palabra, posición): nombre completo, cada palabra (apellidos) y matrícula
+        keys = set()
+        for i, (name, public_id) in enumerate(zip(self._names, self._ids)):
+            keys.add((name, i))
+            keys.update((word, i) for word in name.split())
+            keys.add((public_id, i))
+        self._keys = sorted(keys)
+        self._words = sorted({k for k, _ in self._keys})
+
+    def _prefix(self, q):
+        start = bisect.bisect_left(self._keys, (q, -1))
+        for key, i in self._keys[start:]:
+            if not key.startswith(q):
+                break
+            yield i
+
+    def first(self, limit=DIRECTORY_MAX_RESULTS):
+        """ Sin búsqueda: los primeros habilitados (orden alfabético). """
+        return [e for e in self.entries if e.habilitado][:limit]
+
+    def search(self, q, limit=DIRECTORY_MAX_RESULTS):
+        """ Habilitados que coinciden: prefijo > contiene > parecido (errores de tipeo). """
+        q = fold(q)
+        found, seen = [], set()
+
+        def take(positions):
+            for i in positions:
+                if i not in seen and self.entries[i].habilitado:
+                    seen.add(i)
+                    found.append(i)
+                    if len(found) >= limit:
+                        return True
+            return False
+
+        if q and not take(sorted(set(self._prefix(q)))):
+            if not take(i for i, (name, public_id) in enumerate(zip(self._names, self._ids))
+                        if q in name or q in public_id):
+                if len(q) >= 4:
+                    for word in difflib.get_close_matches(q, self._words, n=limit, cutoff=0.75):
+                        if take(sorted(set(self._prefix(word)))):
+                            break
+        return [self.entries[i] for i in found]
+
+
+def _scope(org_id):
+    return "directory:all" if org_id is ALL else f"directory:org:{org_id}"
+
+
+def announce_directory_changed(org_id):
+    """
+    Llamar tras el commit que da de alta/baja o (des)habilita a un colegiado.
+    Hoy ninguna ruta de la app edita membresías (se cargan por script / BD):
+    hasta que exista una, el índice se refresca solo por DIRECTORY_TTL_SECONDS.
+    """
+    bump_versions(_scope(org_id), _scope(ALL))
+
+
+class DirectoryCache:
+    def __init__(self, ttl=DIRECTORY_TTL_SECONDS):
+        self.ttl = ttl
+        self._by_org = {} # org_id | ALL -> DirectoryIndex
+        self._html = OrderedDict() # etag -> html de perfil (LRU)
+
+    def index(self, db, org_id=ALL):
+        versions = current_versions([_scope(org_id)])
+        cached = self._by_org.get(org_id)
+        if cached and versions is not None and cached.version == versions \
+                and time.monotonic() - cached.built_at < self.ttl:
+            return cached
+
+        query = db.query(
+            User.public_id, User.name, User.photo_url, Member.position, Member.is_active,
+            Member.organization_id, Organization.theme_color
+        ).join(User, User.id == Member.user_id).join(Organization, Organization.id == Member.organization_id) \
+            .filter(Organization.type == "colegio_prof", User.public_id.isnot(None))
+        if org_id is not ALL:
+            query = query.filter(Member.organization_id == org_id)
+
+        entries = {}
+        for row in query.all():
+            entry = DirectoryEntry(row.public_id, row.name or "", row.photo_url, row.position,
+                                   bool(row.is_active), row.organization_id, row.theme_color)
+            # Colegiado en dos colegios: se muestra la membresía habilitada
+            if row.public_id not in entries or entry.habilitado:
+                entries[row.public_id] = entry
+
+        index = DirectoryIndex(entries.values(), versions)
+        self._by_org[org_id] = index
+        return index
+
+    def render_profile(self, templates, request: Request, template, entry: DirectoryEntry, **extra):
+        """ Perfil público con ETag fuerte: cambia solo si cambian los datos del colegiado. """
+        raw = "|".join(map(str, (template, request.url.hostname, *astuple(entry))))
+        etag = '"' + hashlib.sha1(raw.encode()).hexdigest()[:20] + '"'
+        headers = {"ETag": etag, "Cache-Control": f"public, max-age={DIRECTORY_PROFILE_MAX_AGE}"}
+
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+
+        html = self._html.get(etag)
+        if html is None:
+            html = templates.get_template(template).render({"request": request, "profile": entry, **extra})
+            self._html[etag] = html
+            while len(self._html) > 500:
+                self._html.popitem(last=False)
+        else:
+            self._html.move_to_end(etag)
+        return HTMLResponse(html, headers=headers)
+
+
+directory_cache = DirectoryCache()
+
+
+def tenant_org_id(request: Request):
+    """ El colegio del host; si el host no es de un colegio, todos los colegios. """
+    org = getattr(request.state, "org", None)
+    return org["id"] if org and org.get("type") == "colegio_prof" else ALL
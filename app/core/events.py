@@ -0,0 +1,64 @@
+import asyncio
+import json
+import uuid
+from app.config import redis_client
+
+# ==========================================================
+# BUS DE EVENTOS (mínimo)
+# publish("bulletin.created", org_id=1, ...) llama a los handlers locales
+# y, si hay Redis, lo reenvía a los demás workers (pub/sub) para que
+# invaliden sus propias cachés en memoria.
+# ==========================================================
+
+CHANNEL = "leavisamos:events"
+WORKER_ID = uuid.uuid4().hex[:8] # Para no procesar dos veces lo que uno mismo publicó
+
+_handlers = {} # evento -> [fn(payload)]
+
+
+def subscribe(event, handler):
+    _handlers.setdefault(event, []).append(handler)
+    return handler
+
+
+def on(event):
+    """ Decorador: @on("bulletin.created") """
+    def register(handler):
+        return subscribe(event, handler)
+    return register
+
+
+def _dispatch(event, payload):
+    for handler in _handlers.get(event, ()):
+        try:
+            handler(payload)
+        except Exception as e:
+            print(f"❌ Error en handler de '{event}': {e}")
+
+
+def publish(event, **payload):
+    _dispatch(event, payload)
+    if redis_client:
+        try:
+            redis_client.publish(CHANNEL, json.dumps(
+                {"event": event, "origin": WORKER_ID, "payload": payload}, default=str))
+        except Exception as e:
+            print(f"⚠️ Bus de eventos sin Redis: {e}")
+
+
+async def listen():
+    """ Tarea de fondo: recibe los eventos publicados por OTROS workers. """
+    if not redis_client: return
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(CHANNEL)
+    while True:
+        try:
+            message = await asyncio.to_thread(pubsub.get_message, timeout=1.0)
+            if not message:
+                continue
+            data = json.loads(message["data"])
+            if data.get("origin") != WORKER_ID:
+                _dispatch(data["event"], data.get("payload") or {})
+        except Exception as e:
+            print(f"⚠️ Bus de eventos: {e}")
+            await asyncio.sleep(1)
@@ -0,0 +1,101 @@
+import hashlib
+import time
+import uuid
+from collections import OrderedDict
+from fastapi import Request
+from fastapi.responses import HTMLResponse, Response
+from app.config import redis_client, FRAGMENT_CACHE_TTL_SECONDS, FRAGMENT_CACHE_MAX_ENTRIES
+
+# ==========================================================
+# CACHÉ DE FRAGMENTOS HTMX
+# Clave = (template, ruta+query, org, member, versiones de los datos).
+# Cada escritura de dominio sube la versión de su "alcance":
+#   bump_versions("payments:org:3", "debts:member:41")
+# y las claves viejas dejan de coincidir (no hay que borrar nada).
+# Si el navegador ya tiene esa versión (If-None-Match) -> 304 sin consultas
+# ni render. Versiones en Redis (compartidas entre workers) o en memoria.
+# ==========================================================
+
+_local_versions = {} # Sin Redis: versiones del proceso
+# ...que vuelven a 0 al reiniciar: sin este prefijo, un ETag de antes del
+# reinicio coincidiría otra vez y el navegador recibiría 304 con datos viejos
+BOOT_ID = uuid.uuid4().hex[:8]
+
+
+def bump_versions(*scopes):
+    """ Llamar DESPUÉS del commit que cambió los datos de esos alcances. """
+    if redis_client:
+        try:
+            pipe = redis_client.pipeline()
+            for scope in scopes:
+                pipe.incr(f"fragver:{scope}")
+            pipe.execute()
+            return
+        except Exception as e:
+            print(f"⚠️ Fragmentos: no se pudo versionar en Redis ({e})")
+    for scope in scopes:
+        _local_versions[scope] = _local_versions.get(scope, 0) + 1
+
+
+def current_versions(scopes):
+    """ Versiones actuales (un solo MGET). None si Redis falla: no se cachea. """
+    if redis_client:
+        try:
+            return tuple(int(v or 0) for v in redis_client.mget([f"fragver:{s}" for s in scopes]))
+        except Exception:
+            return None
+    return tuple(f"{BOOT_ID}.{_local_versions.get(s, 0)}" for s in scopes)
+
+
+class FragmentCache:
+    def __init__(self, ttl=FRAGMENT_CACHE_TTL_SECONDS, max_entries=FRAGMENT_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._html = OrderedDict() # etag -> (expira, html)  (LRU)
+
+    @staticmethod
+    def etag_for(template, request: Request, org_id, member_id, scopes, versions):
+        # El host define el tema (tenant_middleware): también va en la clave
+        raw = "|".join(map(str, (template, request.url.hostname, request.url.path, request.url.query, org_id, member_id,
+                                  ",".join(scopes), ",".join(map(str, versions)))))
+        return '"' + hashlib.sha1(raw.encode()).hexdigest()[:20] + '"'
+
+    def _get(self, etag):
+        hit = self._html.get(etag)
+        if not hit: return None
+        if hit[0] < time.monotonic():
+            self._html.pop(etag, None)
+            return None
+        self._html.move_to_end(etag)
+        return hit[1]
+
+    def _put(self, etag, html):
+        self._html[etag] = (time.monotonic() + self.ttl, html)
+        self._html.move_to_end(etag)
+        while len(self._html) > self.max_entries:
+            self._html.popitem(last=False)
+
+    def respond(self, templates, request: Request, template: str, build, scopes,
+                org_id=None, member_id=None):
+        """
+        build() -> contexto del template (aquí van las consultas). Solo se
+        llama si ni el navegador ni este worker tienen la versión vigente.
+        """
+        versions = current_versions(scopes)
+        if versions is None:
+            return templates.TemplateResponse(template, {"request": request, **build()})
+
+        etag = self.etag_for(template, request, org_id, member_id, scopes, versions)
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Cookie, HX-Request"}
+
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+
+        html = self._get(etag)
+        if html is None:
+            html = templates.get_template(template).render({"request": request, **build()})
+            self._put(etag, html)
+        return HTMLResponse(html, headers=headers)
+
+
+fragment_cache = FragmentCache()
@@ -0,0 +1,188 @@
+import asyncio
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from app.config import (redis_client, PANIC_DEDUP_WINDOW_SECONDS,
+                        PANIC_INCIDENT_TTL_SECONDS, PANIC_LANE_WORKERS)
+from app.core.events import on, publish, WORKER_ID
+from app.core.tracking import tracking_store
+from app.utils.ws_manager import manager
+
+# ==========================================================
+# MOTOR DE INCIDENTES DE PÁNICO
+# - Un incidente por vecino dentro de la ventana (toques repetidos = debounce)
+# - Persistencia (PanicLog) y Push fuera del event loop, en hilos EXCLUSIVOS:
+#   no compiten con boletines, GPS ni endpoints síncronos.
+# - Con varios workers, la alerta y el cierre viajan por el bus de eventos:
+#   el guardia recibe la alarma aunque su socket esté en otro worker.
+# ==========================================================
+
+# Carril prioritario: pool propio para todo el trabajo bloqueante del pánico
+panic_lane = ThreadPoolExecutor(max_workers=PANIC_LANE_WORKERS, thread_name_prefix="panic")
+
+
+class Incident:
+    def __init__(self, org_id, member_id, user_label, location=None, coords=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.org_id = org_id
+        self.member_id = member_id
+        self.user_label = user_label
+        self.location = location
+        self.coords = coords
+        self.status = "active" # active -> resolved | expired
+        self.created_at = time.time()
+        self.last_trigger = self.created_at
+        self.taps = 1
+        self.panic_log_id = None
+        self.resolved_by = None
+
+
+class IncidentEngine:
+    def __init__(self, window=PANIC_DEDUP_WINDOW_SECONDS, ttl=PANIC_INCIDENT_TTL_SECONDS):
+        self.window = window
+        self.ttl = ttl
+        self.active = {} # (org_id, member_key) -> Incident
+        self.by_id = {}
+
+    @staticmethod
+    def _key(org_id, member_id, user_label):
+        # Sockets anónimos (sin sesión) se agrupan por la etiqueta que mandan
+        return (org_id, member_id if member_id else f"anon:{user_label}")
+
+    def trigger(self, org_id, member_id, user_label, location=None, coords=None):
+        """ Devuelve (incidente, es_nuevo). es_nuevo=False -> toque repetido, no re-alertar. """
+        self.expire()
+        now = time.time()
+        key = self._key(org_id, member_id, user_label)
+
+        incident = self.active.get(key)
+        if incident and now - incident.last_trigger < self.window:
+            incident.last_trigger = now
+            incident.taps += 1
+            if coords and not incident.coords:
+                incident.coords = coords
+            return incident, False
+
+        incident = Incident(org_id, member_id, user_label, location, coords)
+
+        # Dedup entre workers (si hay Redis): el primero que llega gana y avisa
+        # a TODOS los workers (announce); el toque repetido aquí solo se confirma
+        if redis_client:
+            try:
+                if not redis_client.set(f"panic:{key[0]}:{key[1]}", incident.id, nx=True, ex=self.window):
+                    return None, False
+                # Para que un guardia en otro worker pueda cerrarlo (resolve)
+                redis_client.set(f"panic:incident:{incident.id}", org_id, ex=self.ttl)
+            except Exception:
+                pass
+
+        self.active[key] = incident
+        self.by_id[incident.id] = incident
+        return incident, True
+
+    def active_for(self, org_id, member_id):
+        incident = self.active.get(self._key(org_id, member_id, None))
+        return incident if incident and incident.status == "active" else None
+
+    async def announce(self, message, org_id):
+        """ ALERTA_CRITICA: primero a los sockets de este worker, luego a los demás. """
+        await manager.broadcast_priority(message, org_id=org_id)
+        publish("panic.alert", origin=WORKER_ID, org_id=org_id, message=message)
+
+    def resolve(self, incident_id, resolved_by, org_id):
+        """
+        Solo un guardia de la MISMA organización cierra el incidente. Si se abrió
+        en otro worker, la organización se valida contra Redis. El cierre se
+        anuncia a todos los workers (panic.resolved). True si se cerró.
+        """
+        incident = self.by_id.get(incident_id)
+        if incident:
+            if incident.status != "active" or incident.org_id != org_id:
+                return False
+        elif not self._owned_elsewhere(incident_id, org_id):
+            return False
+        publish("panic.resolved", incident_id=incident_id, org_id=org_id, resolved_by=resolved_by)
+        return True
+
+    @staticmethod
+    def _owned_elsewhere(incident_id, org_id):
+        if not redis_client or not incident_id:
+            return False
+        try:
+            return redis_client.get(f"panic:incident:{incident_id}") == str(org_id)
+        except Exception:
+            return False
+
+    def release(self, incident_id, resolved_by=None):
+        """ Cierra la copia local (si este worker la tiene). """
+        incident = self.by_id.get(incident_id)
+        if incident and incident.status == "active":
+            incident.status = "resolved"
+            incident.resolved_by = resolved_by
+            self._forget(incident)
+        elif redis_client:
+            try:
+                redis_client.delete(f"panic:incident:{incident_id}")
+            except Exception:
+                pass
+
+    def expire(self):
+        now = time.time()
+        for incident in list(self.by_id.values()):
+            if now - incident.created_at > self.ttl:
+                incident.status = "expired"
+                self._forget(incident)
+
+    def _forget(self, incident):
+        self.by_id.pop(incident.id, None)
+        key = self._key(incident.org_id, incident.member_id, incident.user_label)
+        if self.active.get(key) is incident:
+            self.active.pop(key, None)
+        if redis_client:
+            try:
+                # La llave del vecino solo si sigue siendo de ESTE incidente
+                owner_key = f"panic:{key[0]}:{key[1]}"
+                if redis_client.get(owner_key) == incident.id:
+                    redis_client.delete(owner_key)
+                redis_client.delete(f"panic:incident:{incident.id}")
+            except Exception:
+                pass
+
+    @staticmethod
+    def run_in_lane(fn, *args):
+        """ Agenda trabajo bloqueante (BD / Push) en el carril de pánico, sin esperarlo. """
+        future = asyncio.get_running_loop().run_in_executor(panic_lane, fn, *args)
+        future.add_done_callback(_log_lane_error)
+        return future
+
+
+def _log_lane_error(future):
+    if not future.cancelled() and future.exception():
+        print(f"❌ Error carril de pánico: {future.exception()}")
+
+
+incident_engine = IncidentEngine()
+_background = set() # Referencias a las tareas lanzadas desde los handlers
+
+
+def _spawn(coro):
+    task = asyncio.get_running_loop().create_task(coro)
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+@on("panic.alert")
+def _on_panic_alert(payload):
+    if payload.get("origin") == WORKER_ID:
+        return # Este worker ya lo envió por el carril prioritario
+    _spawn(manager.broadcast_priority(payload["message"], org_id=payload["org_id"]))
+
+
+@on("panic.resolved")
+def _on_panic_resolved(payload):
+    incident_engine.release(payload["incident_id"], payload.get("resolved_by"))
+    tracking_store.close(payload["incident_id"])
+    _spawn(manager.broadcast_priority({
+        "type": "ALERTA_RESUELTA",
+        "incident_id": payload["incident_id"]
+    }, org_id=payload["org_id"]))
@@ -0,0 +1,45 @@
+from collections import defaultdict
+from sqlalchemy import asc
+from app.models import Debt
+
+# --- IMPUTACIÓN FIFO (Pagos -> Deudas más antiguas primero) ---
+
+def load_pending_debts(db, member_ids, for_update=False):
+    """
+    Carga en UNA sola consulta las deudas pendientes de varios vecinos,
+    agrupadas por member_id y ordenadas por vencimiento (FIFO).
+    for_update=True las bloquea hasta el commit (imputación).
+    """
+    if not member_ids:
+        return {}
+
+    query = db.query(Debt).filter(
+        Debt.member_id.in_(list(member_ids)),
+        Debt.status == "pending"
+    ).order_by(Debt.member_id, asc(Debt.due_date))
+    debts = (query.with_for_update() if for_update else query).all()
+
+    grouped = defaultdict(list)
+    for debt in debts:
+        grouped[debt.member_id].append(debt)
+    return grouped
+
+
+def apply_payment_fifo(amount, debts):
+    """
+    Descuenta 'amount' de las deudas (ya ordenadas) y devuelve el saldo a favor.
+    Las deudas saldadas quedan en 'paid' y se saltan si se reutiliza la lista.
+    """
+    remaining = amount
+    for debt in debts:
+        if remaining <= 0: break
+        if debt.status != "pending": continue
+
+        if remaining >= debt.balance:
+            remaining -= debt.balance
+            debt.balance = 0
+            debt.status = "paid"
+        else:
+            debt.balance -= remaining
+            remaining = 0
+    return remaining
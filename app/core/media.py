@@ -0,0 +1,216 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+from app.config import MEDIA_MEMORY_CACHE_MB, MEDIA_MEMORY_MAX_FILE_MB
+
+# ==========================================================
+# ENTREGA DE MEDIOS (sirena.mp3, ding-dong.mp3, fotos)
+# - Range / If-Range: el <audio> del celular pide trozos y reanuda
+#   descargas cortadas sin bajar de nuevo los 1.8 MB de la sirena.
+# - ETag FUERTE (hash del contenido): vale para If-Range y 304.
+# - Cuerpo: desde memoria si el archivo es chico (sin tocar disco),
+#   zero-copy (os.sendfile del servidor) si el servidor ASGI ofrece
+#   "http.response.zerocopysend", o en trozos leídos en un hilo.
+#   MediaResponse("static/sounds/sirena.mp3", media_type="audio/mpeg")
+#   MediaResponse(content=foto_bytes, media_type="image/jpeg")
+# ==========================================================
+
+CHUNK_SIZE = 256 * 1024
+MEDIA_PREFIXES = ("audio/", "video/", "image/")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def _etag(digest):
+    return '"' + digest[:20] + '"'
+
+
+class MediaCache:
+    """ ETag fuerte por (ruta, mtime, tamaño) + bytes de los archivos chicos (LRU). """
+
+    def __init__(self, budget_bytes, max_file_bytes):
+        self.budget_bytes = budget_bytes
+        self.max_file_bytes = max_file_bytes
+        self._etags = {}
+        self._bytes = OrderedDict()
+        self._used = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(path, stat_result):
+        return (path, stat_result.st_mtime_ns, stat_result.st_size)
+
+    def peek(self, key):
+        with self._lock:
+            data = self._bytes.get(key)
+            if data is not None:
+                self._bytes.move_to_end(key)
+            return self._etags.get(key), data
+
+    def load(self, path, stat_result, etag=None):
+        """ Bloqueante (lee el archivo): llamar en un hilo. """
+        key = self.key(path, stat_result)
+        known, data = self.peek(key)
+        etag = etag or known
+        cacheable = stat_result.st_size <= self.max_file_bytes
+        if etag and (data is not None or not cacheable):
+            return etag, data
+
+        if cacheable:
+            with open(path, "rb") as f:
+                data = f.read()
+            etag = etag or _etag(hashlib.sha256(data).hexdigest())
+            with self._lock:
+                if key not in self._bytes:
+                    self._bytes[key] = data
+                    self._used += len(data)
+                while self._used > self.budget_bytes and self._bytes:
+                    _, old = self._bytes.popitem(last=False)
+                    self._used -= len(old)
+        elif not etag:
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+            etag = _etag(digest.hexdigest())
+
+        with self._lock:
+            self._etags[key] = etag
+        return etag, data
+
+
+media_cache = MediaCache(MEDIA_MEMORY_CACHE_MB * 1024 * 1024, MEDIA_MEMORY_MAX_FILE_MB * 1024 * 1024)
+
+
+def parse_range(header, size):
+    """
+    'bytes=0-1023' -> (0, 1024). None = ignorar el Range y mandar todo
+    (mal formado o varios rangos: el RFC lo permite). 416 si no cabe.
+    """
+    units, _, spec = header.partition("=")
+    if units.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if not first:
+            suffix = int(last) # bytes=-500 -> los últimos 500
+            if suffix <= 0:
+                raise RangeNotSatisfiable()
+            return max(size - suffix, 0), size
+        start = int(first)
+        end = int(last) + 1 if last else size
+    except ValueError:
+        return None
+    if start >= size or end <= start:
+        raise RangeNotSatisfiable()
+    return start, min(end, size)
+
+
+def _read_chunk(f, offset, size):
+    f.seek(offset)
+    return f.read(size)
+
+
+class MediaResponse(Response):
+    def __init__(self, path=None, content: bytes = None, media_type="application/octet-stream",
+                 etag=None, stat_result=None, headers=None):
+        super().__init__(headers=headers, media_type=media_type)
+        self.path = path
+        self.content = content
+        self.etag = etag
+        self.stat_result = stat_result
+
+    async def __call__(self, scope, receive, send):
+        data, size = self.content, None
+        if self.path is not None:
+            if self.stat_result is None:
+                self.stat_result = await run_in_threadpool(os.stat, self.path)
+            size = self.stat_result.st_size
+            etag, data = media_cache.peek(MediaCache.key(self.path, self.stat_result))
+            if not (etag or self.etag) or (data is None and size <= media_cache.max_file_bytes):
+                etag, data = await run_in_threadpool(media_cache.load, self.path, self.stat_result, self.etag)
+            self.etag = self.etag or etag
+        else:
+            size = len(data)
+            self.etag = self.etag or _etag(hashlib.sha256(data).hexdigest())
+
+        request_headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        self.headers["etag"] = self.etag
+        self.headers["accept-ranges"] = "bytes"
+
+        # 304: If-None-Match admite comparación débil
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match:
+            tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+            if "*" in tags or self.etag in tags:
+                return await self._send_empty(send, 304)
+
+        start, end, status = 0, size, 200
+        http_range = request_headers.get("range")
+        if_range = request_headers.get("if-range")
+        # If-Range exige comparación FUERTE: si el archivo cambió, va completo
+        if http_range and (if_range is None or if_range == self.etag):
+            try:
+                requested = parse_range(http_range, size)
+            except RangeNotSatisfiable:
+                self.headers["content-range"] = f"bytes */{size}"
+                return await self._send_empty(send, 416)
+            if requested:
+                start, end = requested
+                status = 206
+                self.headers["content-range"] = f"bytes {start}-{end - 1}/{size}"
+
+        self.headers["content-length"] = str(end - start)
+        await send({"type": "http.response.start", "status": status, "headers": self.raw_headers})
+        if scope.get("method") == "HEAD":
+            return await send({"type": "http.response.body", "body": b""})
+
+        if data is not None:
+            body = data if (start, end) == (0, size) else data[start:end]
+            return await send({"type": "http.response.body", "body": body})
+
+        if "http.response.zerocopysend" in scope.get("extensions", {}):
+            # El servidor hace os.sendfile del descriptor: sin pasar por Python
+            with open(self.path, "rb") as f:
+                await send({"type": "http.response.zerocopysend", "file": f, "offset": start, "count": end - start})
+            return
+
+        f = await run_in_threadpool(open, self.path, "rb")
+        try:
+            offset = start
+            while offset < end:
+                chunk = await run_in_threadpool(_read_chunk, f, offset, min(CHUNK_SIZE, end - offset))
+                if not chunk:
+                    break # Archivo truncado mientras se enviaba
+                offset += len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": offset < end})
+            if offset < end:
+                await send({"type": "http.response.body", "body": b""})
+        finally:
+            await run_in_threadpool(f.close)
+
+    async def _send_empty(self, send, status):
+        for header in ("content-length", "content-type"):
+            if header in self.headers:
+                del self.headers[header]
+        self.headers["content-length"] = "0"
+        await send({"type": "http.response.start", "status": status, "headers": self.raw_headers})
+        await send({"type": "http.response.body", "body": b""})
+
+
+class MediaStaticFiles(StaticFiles):
+    """ /static: audio, video e imágenes pasan por MediaResponse; el resto igual que antes. """
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        media_type = response.headers.get("content-type", "")
+        if response.status_code != 200 or not media_type.startswith(MEDIA_PREFIXES):
+            return response
+        return MediaResponse(str(full_path), media_type=media_type, stat_result=stat_result,
+                             headers={"Cache-Control": "public, max-age=3600"})
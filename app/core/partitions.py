@@ -0,0 +1,137 @@
+import asyncio
+import gzip
+import os
+import re
+from datetime import date, datetime, timezone
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+from app.config import LOG_RETENTION_MONTHS, LOG_PARTITION_MONTHS_AHEAD, LOG_ARCHIVE_DIR
+
+# ==========================================================
+# PARTICIONES MENSUALES (access_logs / panic_logs)
+# La conversión inicial está en migrations/027_partition_access_panic_logs.sql
+# ==========================================================
+
+PARTITIONED_TABLES = ("access_logs", "panic_logs")
+MAINTENANCE_INTERVAL_SECONDS = 6 * 60 * 60
+MAINTENANCE_LOCK_ID = 27_001 # pg_advisory_lock: un solo worker hace mantenimiento
+
+_PARTITION_RE = re.compile(r"^(?P<table>\w+)_(?P<year>\d{4})_(?P<month>\d{2})$")
+
+
+def add_months(d, n):
+    month = d.month - 1 + n
+    return date(d.year + month // 12, month % 12 + 1, 1)
+
+
+def month_start(d=None):
+    d = d or datetime.now(timezone.utc).date()
+    return date(d.year, d.month, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_{month.year:04d}_{month.month:02d}"
+
+
+def is_partitioned(conn, table):
+    return conn.execute(text("""
+        SELECT 1 FROM pg_partitioned_table pt
+        JOIN pg_class c ON c.oid = pt.partrelid
+        WHERE c.relname = :table
+    """), {"table": table}).first() is not None
+
+
+def list_partitions(conn, table):
+    rows = conn.execute(text("""
+        SELECT child.relname FROM pg_inherits i
+        JOIN pg_class parent ON parent.oid = i.inhparent
+        JOIN pg_class child ON child.oid = i.inhrelid
+        WHERE parent.relname = :table
+    """), {"table": table}).all()
+    return [r[0] for r in rows]
+
+
+def ensure_partitions(conn, table, months_ahead=LOG_PARTITION_MONTHS_AHEAD):
+    """ Crea (si faltan) la partición del mes actual y las de los próximos meses. """
+    current = month_start()
+    for offset in range(0, months_ahead + 1):
+        start = add_months(current, offset)
+        conn.execute(text(
+            f'CREATE TABLE IF NOT EXISTS "{partition_name(table, start)}" '
+            f'PARTITION OF "{table}" '
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{add_months(start, 1).isoformat()}')"
+        ))
+
+
+def archive_partition(engine, name, archive_dir=LOG_ARCHIVE_DIR):
+    """ Exporta una partición completa a <archive_dir>/<name>.csv.gz (COPY, sin pasar por el ORM). """
+    os.makedirs(archive_dir, exist_ok=True)
+    final_path = os.path.join(archive_dir, f"{name}.csv.gz")
+    tmp_path = final_path + ".tmp"
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        with gzip.open(tmp_path, "wb") as f:
+            cursor.copy_expert(f'COPY (SELECT * FROM "{name}") TO STDOUT WITH CSV HEADER', f)
+        cursor.close()
+    finally:
+        raw.close()
+
+    os.replace(tmp_path, final_path) # Solo queda el archivo si el COPY terminó bien
+    return final_path
+
+
+def expired_partitions(conn, table, retention_months=LOG_RETENTION_MONTHS):
+    cutoff = add_months(month_start(), -retention_months)
+    expired = []
+    for name in list_partitions(conn, table):
+        match = _PARTITION_RE.match(name)
+        if not match or match["table"] != table:
+            continue # p.ej. <tabla>_default
+        if date(int(match["year"]), int(match["month"]), 1) < cutoff:
+            expired.append(name)
+    return sorted(expired)
+
+
+def run_partition_maintenance(engine):
+    """
+    1. Asegura particiones futuras.
+    2. Exporta a .csv.gz y elimina las que superan la retención.
+    Solo aplica en Postgres y sobre tablas ya migradas (ver migrations/027).
+    """
+    if engine.dialect.name != "postgresql":
+        return
+
+    with engine.connect() as conn:
+        if not conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": MAINTENANCE_LOCK_ID}).scalar():
+            return # Otro worker ya lo está haciendo
+        try:
+            for table in PARTITIONED_TABLES:
+                if not is_partitioned(conn, table):
+                    print(f"⚠️ Particiones: '{table}' aún no está particionada (falta migración 027).")
+                    continue
+
+                ensure_partitions(conn, table)
+                conn.commit()
+
+                for name in expired_partitions(conn, table):
+                    path = archive_partition(engine, name)
+                    conn.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'))
+                    conn.execute(text(f'DROP TABLE "{name}"'))
+                    conn.commit()
+                    print(f"🗄️ Partición {name} archivada en {path}")
+        finally:
+            conn.rollback() # Por si un error dejó la transacción abortada
+            conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MAINTENANCE_LOCK_ID})
+            conn.commit()
+
+
+async def partition_maintenance_loop(engine, interval=MAINTENANCE_INTERVAL_SECONDS):
+    """ Tarea de fondo (startup): mantenimiento periódico sin bloquear el event loop. """
+    while True:
+        try:
+            await run_in_threadpool(run_partition_maintenance, engine)
+        except Exception as e:
+            print(f"❌ Error mantenimiento de particiones: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,109 @@
+import asyncio
+import time
+from collections import OrderedDict
+from app.models import Pet, Member
+from app.utils.ws_manager import manager
+from app.config import redis_client, PET_ALERT_DELAY_SECONDS, PET_ALERT_WINDOW_SECONDS
+
+# ==========================================================
+# ALERTA DE MASCOTA PERDIDA
+# - Solo a la organización de la mascota (antes: a TODOS los sockets).
+# - Se espera PET_ALERT_DELAY_SECONDS antes de avisar: si el dueño se
+#   arrepiente (perdido -> en casa) no sale nada; varios toques = 1 aviso.
+# - Una vez avisado, la misma mascota no vuelve a sonar hasta pasada la
+#   ventana PET_ALERT_WINDOW_SECONDS (Redis: un solo aviso entre workers).
+# - El aviso usa un resumen cacheado de la mascota: sin consultas al disparar.
+# ==========================================================
+
+MAX_SUMMARIES = 2000
+
+
+def pet_summary(db, pet_id):
+    """ Resumen (cacheado) con lo que necesita el aviso. None si no existe. """
+    cached = lost_pet_notifier.summaries.get(pet_id)
+    if cached:
+        lost_pet_notifier.summaries.move_to_end(pet_id)
+        return cached
+
+    row = db.query(Pet.id, Pet.organization_id, Pet.owner_id, Pet.name, Pet.species, Pet.breed,
+                   Pet.contact_phone, Member.unit_info).outerjoin(Member, Member.id == Pet.owner_id) \
+        .filter(Pet.id == pet_id).first()
+    if not row:
+        return None
+    summary = {
+        "pet_id": row.id,
+        "org_id": row.organization_id,
+        "owner_id": row.owner_id,
+        "name": row.name,
+        "species": row.breed or row.species,
+        "unit": row.unit_info,
+        "contact_phone": row.contact_phone
+    }
+    lost_pet_notifier.summaries[pet_id] = summary
+    while len(lost_pet_notifier.summaries) > MAX_SUMMARIES:
+        lost_pet_notifier.summaries.popitem(last=False)
+    return summary
+
+
+class LostPetNotifier:
+    def __init__(self, delay=PET_ALERT_DELAY_SECONDS, window=PET_ALERT_WINDOW_SECONDS):
+        self.delay = delay
+        self.window = window
+        self.summaries = OrderedDict() # pet_id -> resumen (LRU)
+        self._pending = {} # pet_id -> tarea esperando el delay
+        self._sent_at = {} # pet_id -> monotonic del último aviso  [sin Redis]
+
+    def forget(self, pet_id):
+        """ Descarta el resumen: el próximo aviso relee nombre, teléfono, unidad... """
+        self.summaries.pop(pet_id, None)
+
+    def lost(self, summary):
+        """ La mascota quedó perdida: aviso diferido (coalescido). """
+        if summary["pet_id"] in self._pending:
+            return # Ya hay uno en camino
+        self._pending[summary["pet_id"]] = asyncio.create_task(self._fire_later(summary))
+
+    def found(self, pet_id):
+        """ Volvió a casa: se cancela el aviso pendiente (si lo hay). """
+        task = self._pending.pop(pet_id, None)
+        if task:
+            task.cancel()
+        # Si se vuelve a perder, el aviso sale con datos frescos de la BD
+        self.forget(pet_id)
+
+    def _claim(self, pet_id):
+        # True = este worker avisa; False = ya se avisó dentro de la ventana
+        if redis_client:
+            try:
+                return bool(redis_client.set(f"petalert:{pet_id}", 1, nx=True, ex=self.window))
+            except Exception:
+                pass
+        now = time.monotonic()
+        if now - self._sent_at.get(pet_id, -self.window) < self.window:
+            return False
+        # Los avisos con la ventana ya vencida no bloquean nada: fuera
+        for old_id in [k for k, ts in self._sent_at.items() if now - ts >= self.window]:
+            del self._sent_at[old_id]
+        self._sent_at[pet_id] = now
+        return True
+
+    async def _fire_later(self, summary):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            return
+        self._pending.pop(summary["pet_id"], None)
+        if not self._claim(summary["pet_id"]):
+            return
+
+        unit = f" ({summary['unit']})" if summary["unit"] else ""
+        await manager.broadcast({
+            "type": "PET_LOST",
+            "pet_id": summary["pet_id"],
+            "user": "ALERTA VECINAL",
+            "msg": f"Se perdió {summary['name']}, {summary['species']}{unit}. Revisen la sección Mascotas.",
+            "contact_phone": summary["contact_phone"]
+        }, org_id=summary["org_id"])
+
+
+lost_pet_notifier = LostPetNotifier()
@@ -0,0 +1,269 @@
+import asyncio
+import sys
+from starlette.concurrency import run_in_threadpool
+from app.database import SessionLocal
+from app.models import BulletinReceipt, BulletinEvent, Bulletin
+from app.config import RECEIPT_FLUSH_MS, RECEIPT_MAX_PENDING
+
+# ==========================================================
+# ACUSES DE COMUNICADOS (enviado / leído / confirmado)
+# Una fila por boletín con tres bitmaps de member_id en vez de una fila
+# por vecino y estado. Las lecturas se juntan en memoria y se escriben
+# en lote: un SELECT ... FOR UPDATE + un UPDATE por boletín tocado.
+# ==========================================================
+
+KINDS = ("sent", "read", "confirmed")
+
+
+class ReceiptBits:
+    """
+    Los tres bitmaps de un BulletinReceipt, relativos a base_member_id
+    (los ids de una organización no empiezan en 0). Si llega un id menor
+    a la base, se re-basa anteponiendo bytes.
+    """
+    def __init__(self, receipt: BulletinReceipt):
+        self.receipt = receipt
+        self.base = receipt.base_member_id or 0
+        self.bits = {kind: bytearray(getattr(receipt, f"{kind}_bits") or b"") for kind in KINDS}
+
+    def _rebase(self, member_id):
+        new_base = (member_id >> 3) << 3
+        if not any(self.bits.values()):
+            self.base = new_base
+            return
+        pad = bytes((self.base - new_base) >> 3)
+        for kind in KINDS:
+            if self.bits[kind]:
+                self.bits[kind][0:0] = pad
+        self.base = new_base
+
+    def contains(self, kind, member_id):
+        offset = member_id - self.base
+        data = self.bits[kind]
+        if offset < 0 or (offset >> 3) >= len(data):
+            return False
+        return bool(data[offset >> 3] & (1 << (offset & 7)))
+
+    def add(self, kind, member_id):
+        """ Marca el bit; True si era nuevo (para mantener el contador). """
+        if member_id < self.base or not any(self.bits.values()):
+            self._rebase(member_id)
+        offset = member_id - self.base
+        data = self.bits[kind]
+        index = offset >> 3
+        if index >= len(data):
+            data.extend(bytes(index + 1 - len(data)))
+        mask = 1 << (offset & 7)
+        if data[index] & mask:
+            return False
+        data[index] |= mask
+        setattr(self.receipt, f"{kind}_count", (getattr(self.receipt, f"{kind}_count") or 0) + 1)
+        return True
+
+    def save(self):
+        self.receipt.base_member_id = self.base
+        for kind in KINDS:
+            setattr(self.receipt, f"{kind}_bits", bytes(self.bits[kind]))
+
+
+def mark(bits: ReceiptBits, kind, member_id):
+    # Confirmar implica leer, leer implica haber recibido
+    changed = False
+    for step in KINDS[:KINDS.index(kind) + 1]:
+        changed = bits.add(step, member_id) or changed
+    return changed
+
+
+def create_receipt(db, bulletin_id, org_id, member_ids):
+    """ Fila de acuses con la audiencia ya marcada como 'enviado' (no hace commit). """
+    receipt = BulletinReceipt(bulletin_id=bulletin_id, organization_id=org_id,
+                              base_member_id=0, sent_count=0, read_count=0, confirmed_count=0)
+    bits = ReceiptBits(receipt)
+    for member_id in sorted(member_ids):
+        bits.add("sent", member_id)
+    bits.save()
+    db.add(receipt)
+    return receipt
+
+
+def apply_marks(db, marks):
+    """
+    marks: {(bulletin_id, kind): {member_id: org_id}}
+    Bloquea las filas tocadas una sola vez y aplica todos los bits en Python.
+    Ignora acuses de otra organización. No hace commit.
+    """
+    bulletin_ids = {bulletin_id for bulletin_id, _ in marks}
+    receipts = {
+        r.bulletin_id: r for r in db.query(BulletinReceipt)
+        .filter(BulletinReceipt.bulletin_id.in_(bulletin_ids))
+        .with_for_update().all()
+    }
+
+    # Boletines anteriores a los acuses compactos: se crea la fila al vuelo
+    missing = bulletin_ids - receipts.keys()
+    if missing:
+        for bulletin_id, org_id in db.query(Bulletin.id, Bulletin.organization_id).filter(Bulletin.id.in_(missing)):
+            receipts[bulletin_id] = create_receipt(db, bulletin_id, org_id, [])
+
+    changed = 0
+    touched = {}
+    # 'read' antes que 'confirmed' para que los contadores queden coherentes
+    for (bulletin_id, kind), members in sorted(marks.items(), key=lambda item: KINDS.index(item[0][1])):
+        receipt = receipts.get(bulletin_id)
+        if receipt is None:
+            continue
+        bits = touched.get(bulletin_id) or touched.setdefault(bulletin_id, ReceiptBits(receipt))
+        for member_id, org_id in members.items():
+            if org_id == receipt.organization_id and mark(bits, kind, member_id):
+                changed += 1
+
+    for bits in touched.values():
+        bits.save()
+    return changed
+
+
+def _write_marks(marks):
+    db = SessionLocal()
+    try:
+        changed = apply_marks(db, marks)
+        db.commit()
+        return changed
+    finally:
+        db.close()
+
+
+class ReceiptBuffer:
+    """
+    Junta los acuses (leído / confirmado) y los escribe cada N ms.
+    Un vecino que abre el mismo globo 5 veces = 1 bit, 0 filas nuevas.
+    """
+    def __init__(self, flush_ms=RECEIPT_FLUSH_MS, max_pending=RECEIPT_MAX_PENDING):
+        self.flush_interval = flush_ms / 1000
+        self.max_pending = max_pending
+        self._pending = {} # (bulletin_id, kind) -> {member_id: org_id}
+        self._size = 0
+        self._task = None
+        self._closing = False
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done() and not self._closing
+
+    def start(self):
+        if self.running: return
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if not self.running: return
+        self._closing = True
+        await self._task
+        self._task = None
+
+    def submit(self, bulletin_id, kind, member_id, org_id):
+        """ False si el buffer está apagado o lleno (quien llama escribe directo). """
+        if kind not in KINDS or not self.running or self._size >= self.max_pending:
+            return False
+        members = self._pending.setdefault((bulletin_id, kind), {})
+        if member_id not in members:
+            members[member_id] = org_id
+            self._size += 1
+        return True
+
+    async def _run(self):
+        while not self._closing:
+            await asyncio.sleep(self.flush_interval)
+            await self._flush()
+        await self._flush()
+
+    async def _flush(self):
+        if not self._pending: return
+        marks, self._pending, self._size = self._pending, {}, 0
+        try:
+            await run_in_threadpool(_write_marks, marks)
+        except Exception as e:
+            # Error pasajero de BD: los acuses vuelven a la cola (marcar un bit
+            # dos veces no cambia nada) y salen en el próximo flush
+            dropped = self._requeue(marks)
+            print(f"⚠️ ReceiptBuffer: lote de {sum(len(m) for m in marks.values())} acuses falló "
+                  f"({dropped} descartados por cola llena): {e}")
+
+    def _requeue(self, marks):
+        dropped = 0
+        for key, members in marks.items():
+            pending = self._pending.setdefault(key, {})
+            for member_id, org_id in members.items():
+                if member_id in pending:
+                    continue
+                if self._size >= self.max_pending:
+                    dropped += 1
+                    continue
+                pending[member_id] = org_id
+                self._size += 1
+        return dropped
+
+
+receipt_buffer = ReceiptBuffer()
+
+
+def record_receipt(db, bulletin_id, kind, member):
+    """ Ruta normal: buffer en memoria. Fallback: escritura directa con la sesión del request. """
+    if receipt_buffer.submit(bulletin_id, kind, member.id, member.organization_id):
+        return
+    apply_marks(db, {(bulletin_id, kind): {member.id: member.organization_id}})
+    db.commit()
+
+
+def delivery_stats(receipt: BulletinReceipt):
+    """ Resumen O(1) desde los contadores (no recorre bitmaps ni filas). """
+    if receipt is None:
+        return {"sent": 0, "read": 0, "confirmed": 0, "read_pct": 0}
+    sent = receipt.sent_count or 0
+    read = receipt.read_count or 0
+    return {
+        "sent": sent,
+        "read": read,
+        "confirmed": receipt.confirmed_count or 0,
+        "read_pct": round(read * 100 / sent) if sent else 0
+    }
+
+
+# ==========================================================
+# MIGRACIÓN: bulletin_events (filas) -> bulletin_receipts (bitmaps)
+#   python -m app.core.receipts migrate
+# Idempotente: los bits ya marcados no se vuelven a contar.
+# ==========================================================
+
+def migrate_bulletin_events(batch_size=50000):
+    db = SessionLocal()
+    try:
+        last_id, total = 0, 0
+        while True:
+            rows = db.query(BulletinEvent.id, BulletinEvent.bulletin_id, BulletinEvent.member_id,
+                            BulletinEvent.status, Bulletin.organization_id) \
+                .join(Bulletin, Bulletin.id == BulletinEvent.bulletin_id) \
+                .filter(BulletinEvent.id > last_id) \
+                .order_by(BulletinEvent.id).limit(batch_size).all()
+            if not rows:
+                break
+
+            marks = {}
+            for event_id, bulletin_id, member_id, status, org_id in rows:
+                if status in KINDS and member_id is not None:
+                    marks.setdefault((bulletin_id, status), {})[member_id] = org_id
+            apply_marks(db, marks)
+            db.commit()
+
+            last_id = rows[-1][0]
+            total += len(rows)
+            print(f"📦 bulletin_events migrados: {total}")
+        return total
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["migrate"]:
+        migrate_bulletin_events()
+    else:
+        print("Uso: python -m app.core.receipts migrate")
@@ -0,0 +1,187 @@
+import csv
+import io
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+from app.models import Payment
+from app.core.ledger import load_pending_debts, apply_payment_fifo
+
+# ==========================================================
+# CONCILIACIÓN BANCARIA MASIVA (Extracto CSV vs Pagos en revisión)
+# ==========================================================
+
+CHUNK_SIZE = 1000 # Filas por lote al leer / códigos por consulta IN (...)
+AMOUNT_TOLERANCE = 0.005 # Medio céntimo
+
+# Cabeceras aceptadas (ya normalizadas: minúsculas, sin tildes, "_")
+CODE_COLUMNS = ("operation_code", "nro_operacion", "numero_operacion", "n_operacion",
+                "cod_operacion", "codigo_operacion", "operacion", "codigo", "referencia")
+AMOUNT_COLUMNS = ("amount", "monto", "importe", "abono", "monto_recibido")
+
+
+def _normalize_header(name):
+    name = unicodedata.normalize("NFKD", name or "").encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]+", "_", name.strip().lower()).strip("_")
+
+
+def parse_amount(raw):
+    """ "S/ 1,250.50" | "1.250,50" | "150" -> 1250.5 (None si no es número) """
+    if raw is None:
+        return None
+    value = re.sub(r"[^0-9,.\-]", "", str(raw))
+    if not value:
+        return None
+
+    if "," in value and "." in value:
+        # El último separador es el decimal
+        if value.rfind(",") > value.rfind("."):
+            value = value.replace(".", "").replace(",", ".")
+        else:
+            value = value.replace(",", "")
+    elif "," in value:
+        # "150,50" es decimal; "1,250" es miles (siempre 3 dígitos)
+        head, _, tail = value.rpartition(",")
+        value = value.replace(",", "") if len(tail) == 3 else f"{head.replace(',', '')}.{tail}"
+
+    try:
+        return round(float(value), 2)
+    except ValueError:
+        return None
+
+
+def normalize_code(raw):
+    return re.sub(r"\s+", "", str(raw or "")).upper()
+
+
+@dataclass
+class StatementIndex:
+    """ Índice hash en memoria: código de operación -> (monto, línea del CSV) """
+    rows: dict = field(default_factory=dict)
+    duplicates: list = field(default_factory=list) # [(linea, codigo)]
+    invalid: list = field(default_factory=list) # [linea]
+    total_lines: int = 0
+
+    def add(self, line_no, code, amount):
+        self.total_lines += 1
+        if not code or amount is None:
+            self.invalid.append(line_no)
+        elif code in self.rows:
+            self.duplicates.append((line_no, code))
+        else:
+            self.rows[code] = (amount, line_no)
+
+
+def iter_statement_chunks(binary_file, chunk_size=CHUNK_SIZE):
+    """
+    Lee el CSV en streaming (sin cargarlo entero) y entrega lotes de
+    (linea, codigo, monto). Detecta separador "," / ";" / tab automáticamente.
+    """
+    text = io.TextIOWrapper(binary_file, encoding="utf-8-sig", errors="replace", newline="")
+    sample = text.read(4096)
+    text.seek(0)
+
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+    except csv.Error:
+        dialect = csv.excel
+
+    reader = csv.reader(text, dialect)
+    header = [_normalize_header(h) for h in next(reader, [])]
+    code_idx = next((header.index(c) for c in CODE_COLUMNS if c in header), None)
+    amount_idx = next((header.index(c) for c in AMOUNT_COLUMNS if c in header), None)
+
+    if code_idx is None or amount_idx is None:
+        raise ValueError("El extracto debe tener columnas de 'operación' y 'monto'.")
+
+    chunk = []
+    for line_no, row in enumerate(reader, start=2):
+        if not any(row):
+            continue
+        code = normalize_code(row[code_idx]) if code_idx < len(row) else ""
+        amount = parse_amount(row[amount_idx]) if amount_idx < len(row) else None
+        chunk.append((line_no, code, amount))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def build_statement_index(binary_file, chunk_size=CHUNK_SIZE):
+    index = StatementIndex()
+    for chunk in iter_statement_chunks(binary_file, chunk_size):
+        for line_no, code, amount in chunk:
+            index.add(line_no, code, amount)
+    return index
+
+
+@dataclass
+class ReconciliationReport:
+    approved: list = field(default_factory=list) # [Payment]
+    amount_mismatch: list = field(default_factory=list) # [(Payment, monto_banco)]
+    already_approved: list = field(default_factory=list) # [Payment]
+    duplicated_payments: list = field(default_factory=list) # [Payment] (mismo código reportado 2 veces)
+    not_reported: list = field(default_factory=list) # [(codigo, monto, linea)] en el banco, sin pago en sistema
+    index: StatementIndex = None
+
+
+def reconcile_statement(db, org_id, index, reviewer_id, chunk_size=CHUNK_SIZE):
+    """
+    Cruza el índice contra los pagos de la organización con consultas por
+    conjunto (IN) y aprueba los que coinciden exactamente en código y monto,
+    imputando FIFO. NO hace commit: lo decide quien llama.
+    """
+    report = ReconciliationReport(index=index)
+    codes = list(index.rows.keys())
+    payments = []
+
+    # Pagos viejos pudieron guardarse con espacios / minúsculas ("abc 123"):
+    # se comparan normalizados igual que el extracto
+    stored_code = func.upper(func.replace(Payment.operation_code, " ", ""))
+    for i in range(0, len(codes), chunk_size):
+        # FOR UPDATE: un approve_payment simultáneo espera y luego ve 'approved'
+        # (sin esto, el mismo pago se imputaba FIFO dos veces).
+        # joinedload: el aviso usa p.member.user_id (sin una consulta por pago);
+        # OF Payment: solo se bloquean los pagos, no la membresía del JOIN
+        payments += db.query(Payment).options(joinedload(Payment.member)).filter(
+            Payment.organization_id == org_id,
+            stored_code.in_(codes[i:i + chunk_size]),
+            Payment.status.in_(["review", "approved"])
+        ).order_by(Payment.created_at).with_for_update(of=Payment).all()
+
+    seen_codes = set()
+    to_approve = []
+    for p in payments:
+        code = normalize_code(p.operation_code)
+        bank_amount, _ = index.rows[code]
+
+        if p.status == "approved":
+            report.already_approved.append(p)
+        elif code in seen_codes:
+            report.duplicated_payments.append(p)
+        elif abs((p.amount or 0) - bank_amount) > AMOUNT_TOLERANCE:
+            report.amount_mismatch.append((p, bank_amount))
+        else:
+            to_approve.append(p)
+        seen_codes.add(code)
+
+    report.not_reported = [
+        (code, amount, line_no)
+        for code, (amount, line_no) in index.rows.items()
+        if code not in seen_codes
+    ]
+
+    # Imputación FIFO: una sola consulta de deudas para todos los vecinos
+    debts_by_member = load_pending_debts(db, {p.member_id for p in to_approve}, for_update=True)
+    now = datetime.now(timezone.utc)
+    for p in to_approve:
+        p.status = "approved"
+        p.reviewed_by = reviewer_id
+        p.reviewed_at = now
+        apply_payment_fifo(p.amount, debts_by_member.get(p.member_id, []))
+        report.approved.append(p)
+
+    return report
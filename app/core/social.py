@@ -0,0 +1,57 @@
+from sqlalchemy import update, delete
+from sqlalchemy.dialects import postgresql, sqlite
+from app.models import Pet, Reaction, Comment
+
+# ==========================================================
+# VIDA SOCIAL: reacciones y comentarios genéricos (target_type, target_id)
+# Los totales viven en la fila del objetivo (Pet.reaction_count / comment_count)
+# y se mueven en la MISMA transacción que el INSERT/DELETE: la tarjeta
+# muestra "12 ❤️" sin COUNT(*) por tarjeta.
+# ==========================================================
+
+# target_type -> modelo con reaction_count / comment_count
+TARGETS = {"pet": Pet}
+
+
+def _insert(db, model):
+    dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+    return dialect.insert(model)
+
+
+def _bump(db, target_type, target_id, column, delta):
+    model = TARGETS[target_type]
+    counter = getattr(model, column)
+    db.execute(update(model).where(model.id == target_id).values({column: counter + delta}))
+
+
+def toggle_reaction(db, member_id, target_type, target_id, reaction_type="like"):
+    """
+    Pone o saca la reacción del vecino. Devuelve True si quedó puesta.
+    El índice único (target, member, tipo) evita dobles likes aunque lleguen
+    dos toques a la vez. El commit lo hace quien llama.
+    """
+    inserted = db.execute(
+        _insert(db, Reaction).values(
+            member_id=member_id, target_type=target_type, target_id=target_id, reaction_type=reaction_type
+        ).on_conflict_do_nothing().returning(Reaction.id)
+    ).first()
+    if inserted:
+        _bump(db, target_type, target_id, "reaction_count", 1)
+        return True
+
+    removed = db.execute(
+        delete(Reaction).where(
+            Reaction.target_type == target_type, Reaction.target_id == target_id,
+            Reaction.member_id == member_id, Reaction.reaction_type == reaction_type
+        ).returning(Reaction.id)
+    ).first()
+    if removed:
+        _bump(db, target_type, target_id, "reaction_count", -1)
+    return False
+
+
+def add_comment(db, member_id, target_type, target_id, content):
+    comment = Comment(member_id=member_id, target_type=target_type, target_id=target_id, content=content)
+    db.add(comment)
+    _bump(db, target_type, target_id, "comment_count", 1)
+    return comment
@@ -0,0 +1,160 @@
+import json
+import time
+from array import array
+from collections import OrderedDict
+from sqlalchemy import or_
+from app.models import Member
+from app.core.events import on, publish
+
+# ==========================================================
+# SEGMENTACIÓN DE COMUNICADOS (Bulletin.target_criteria)
+# Criterios -> SQL indexado -> "audiencia" (bitmap de member_id) que se
+# reutiliza para WebSocket, Push y conteo de lecturas.
+#
+#   {"all": true}
+#   {"torre": "A"}                     -> unit_info LIKE 'Torre A%'
+#   {"unit_prefix": "Torre B - 5"}     -> unit_info LIKE 'Torre B - 5%'
+#   {"role": ["user", "admin"]}
+#   {"grado": "5", "seccion": "B"}     -> Member.attributes (cualquier clave)
+# Los valores pueden ser listas (OR dentro de la clave, AND entre claves).
+# ==========================================================
+
+AUDIENCE_TTL_SECONDS = 60
+AUDIENCE_MAX_ENTRIES = 1000 # (organización, criterio) distintos en memoria (LRU)
+AUDIENCE_MAX_BYTES = 32 * 1024 * 1024 # Tope de memoria de todas las audiencias juntas
+
+def _as_list(value):
+    return value if isinstance(value, (list, tuple)) else [value]
+
+
+def _like_prefix(prefix):
+    escaped = str(prefix).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return Member.unit_info.like(f"{escaped}%", escape="\\")
+
+
+def normalize_criteria(criteria):
+    """ Limpia claves vacías; sin criterios útiles = todos. """
+    clean = {}
+    for key, value in (criteria or {}).items():
+        if key == "all" or value in (None, "", []):
+            continue
+        clean[str(key).strip().lower()] = value
+    return clean or {"all": True}
+
+
+def compile_criteria(criteria):
+    """ Traduce los criterios a una lista de condiciones SQL sobre Member. """
+    conditions = []
+    for key, value in normalize_criteria(criteria).items():
+        if key == "all":
+            continue
+        values = _as_list(value)
+
+        if key == "torre":
+            conditions.append(or_(*(_like_prefix(f"Torre {v}") for v in values)))
+        elif key == "unit_prefix":
+            conditions.append(or_(*(_like_prefix(v) for v in values)))
+        elif key == "role":
+            conditions.append(Member.role.in_([str(v) for v in values]))
+        elif key == "position":
+            conditions.append(Member.position.in_([str(v) for v in values]))
+        else:
+            # Atributo libre del miembro (grado, seccion, ...)
+            conditions.append(Member.attributes[key].as_string().in_([str(v) for v in values]))
+    return conditions
+
+
+class Audience:
+    """
+    Conjunto de member_id como bitmap (1 bit por id): pertenencia O(1).
+    El bitmap empieza en el menor id ('base'): una organización con ids
+    altos (miles de millones) ocupa lo que abarcan SUS ids, no max_id/8.
+    'ids' (array de 4 bytes por id) conserva el orden para iterar.
+    """
+    def __init__(self, member_ids=()):
+        self.ids = array("I", sorted(set(member_ids)))
+        self.base = self.ids[0] if self.ids else 0
+        bitmap = bytearray(((self.ids[-1] - self.base) >> 3) + 1 if self.ids else 0)
+        for member_id in self.ids:
+            offset = member_id - self.base
+            bitmap[offset >> 3] |= 1 << (offset & 7)
+        self.bitmap = bytes(bitmap)
+
+    @property
+    def nbytes(self):
+        return len(self.bitmap) + self.ids.itemsize * len(self.ids)
+
+    def __contains__(self, member_id):
+        if member_id is None:
+            return False
+        offset = member_id - self.base
+        if offset < 0 or (offset >> 3) >= len(self.bitmap):
+            return False
+        return bool(self.bitmap[offset >> 3] & (1 << (offset & 7)))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids)
+
+
+class AudienceCache:
+    def __init__(self, ttl=AUDIENCE_TTL_SECONDS, max_entries=AUDIENCE_MAX_ENTRIES, max_bytes=AUDIENCE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.nbytes = 0 # Suma de Audience.nbytes en caché
+        self._cache = OrderedDict() # (org_id, criterios_json) -> (expira, Audience)  (LRU)
+
+    def resolve(self, db, org_id, criteria):
+        key = (org_id, json.dumps(normalize_criteria(criteria), sort_keys=True, default=str))
+        hit = self._cache.get(key)
+        if hit and hit[0] > time.monotonic():
+            self._cache.move_to_end(key)
+            return hit[1]
+
+        rows = db.query(Member.id).filter(
+            Member.organization_id == org_id,
+            Member.is_active == True,
+            *compile_criteria(criteria)
+        ).all()
+        audience = Audience(r[0] for r in rows)
+        self._drop(key)
+        self._cache[key] = (time.monotonic() + self.ttl, audience)
+        self.nbytes += audience.nbytes
+        # Se suelta la menos usada; la recién creada se devuelve aunque sola exceda el tope
+        while len(self._cache) > 1 and (len(self._cache) > self.max_entries or self.nbytes > self.max_bytes):
+            self._drop(next(iter(self._cache)))
+        return audience
+
+    def _drop(self, key):
+        hit = self._cache.pop(key, None)
+        if hit:
+            self.nbytes -= hit[1].nbytes
+
+    def invalidate(self, org_id=None):
+        if org_id is None:
+            self._cache.clear()
+            self.nbytes = 0
+        else:
+            for key in [k for k in self._cache if k[0] == org_id]:
+                self._drop(key)
+
+
+audience_cache = AudienceCache()
+
+
+def announce_members_changed(org_id):
+    """
+    Llamar tras el commit que cambia vecinos de la organización (alta, baja,
+    unidad, rol, atributos): cada worker descarta sus audiencias de esa org.
+    Hoy las membresías se cargan por script / BD (ninguna ruta las edita):
+    ese script debe llamarla; si no, aplica AUDIENCE_TTL_SECONDS.
+    """
+    publish("members.changed", org_id=org_id)
+
+
+@on("members.changed")
+def _on_members_changed(payload):
+    audience_cache.invalidate(payload.get("org_id"))
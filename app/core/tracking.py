@@ -0,0 +1,149 @@
+import asyncio
+import json
+import time
+from collections import deque
+from app.config import redis_client, TRACKING_TRAIL_SIZE, TRACKING_TTL_SECONDS
+from app.utils.ws_manager import manager, GUARD_ROLES
+from app.utils.fastjson import dumps
+
+# ==========================================================
+# TRACKING GPS EN VIVO
+# Última posición por incidente + rastro corto (ring buffer) para replay.
+# Los GPS_UPDATE NO se reenvían al llegar: cada guardia de la organización
+# recibe solo lo que cambió, a su propio ritmo.
+# ==========================================================
+
+TICK_SECONDS = 0.25
+
+
+class TrackedIncident:
+    def __init__(self, incident_id, org_id, member_id):
+        self.incident_id = incident_id
+        self.org_id = org_id
+        self.member_id = member_id
+        self.latest = None
+        self.version = 0
+        self.updated_at = time.monotonic()
+        self.trail = deque(maxlen=TRACKING_TRAIL_SIZE)
+
+    def as_message(self):
+        return {
+            "type": "GPS_UPDATE",
+            "incident_id": self.incident_id,
+            "member_id": self.member_id,
+            "coords": {"lat": self.latest["lat"], "lon": self.latest["lon"]},
+            "accuracy": self.latest.get("accuracy"),
+            "ts": self.latest["ts"]
+        }
+
+
+def parse_coords(coords):
+    try:
+        lat, lon = float(coords["lat"]), float(coords["lon"])
+    except (TypeError, KeyError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    accuracy = coords.get("accuracy")
+    return {"lat": round(lat, 6), "lon": round(lon, 6),
+            "accuracy": float(accuracy) if isinstance(accuracy, (int, float)) else None}
+
+
+class TrackingStore:
+    def __init__(self):
+        self.incidents = {} # incident_id -> TrackedIncident
+
+    # --- ESCRITURA (llega un GPS_UPDATE) ---
+    def update(self, incident_id, org_id, member_id, coords):
+        point = parse_coords(coords)
+        if point is None or org_id is None:
+            return False
+
+        incident = self.incidents.get(incident_id)
+        if incident is None:
+            incident = self.incidents[incident_id] = TrackedIncident(incident_id, org_id, member_id)
+        elif incident.org_id != org_id or incident.member_id != member_id:
+            return False # Solo el dueño del incidente puede moverlo
+
+        incident.updated_at = time.monotonic()
+        if incident.latest and (incident.latest["lat"], incident.latest["lon"]) == (point["lat"], point["lon"]):
+            return True # Misma posición: nada que propagar
+
+        point["ts"] = int(time.time() * 1000)
+        incident.latest = point
+        incident.version += 1
+        incident.trail.append(point)
+        self._mirror_to_redis(incident, point)
+        return True
+
+    def close(self, incident_id):
+        self.incidents.pop(incident_id, None)
+
+    def trail(self, incident_id):
+        incident = self.incidents.get(incident_id)
+        if incident:
+            return {"org_id": incident.org_id, "points": list(incident.trail)}
+
+        # Otro worker puede tener el incidente: Redis como respaldo
+        if redis_client:
+            try:
+                meta = redis_client.get(f"track:{incident_id}:meta")
+                if meta:
+                    points = redis_client.lrange(f"track:{incident_id}:trail", 0, -1)
+                    return {"org_id": json.loads(meta)["org_id"],
+                            "points": [json.loads(p) for p in reversed(points)]}
+            except Exception:
+                pass
+        return None
+
+    def _mirror_to_redis(self, incident, point):
+        if not redis_client: return
+        try:
+            key = f"track:{incident.incident_id}"
+            encoded = dumps(point)
+            pipe = redis_client.pipeline()
+            pipe.setex(f"{key}:meta", TRACKING_TTL_SECONDS,
+                       dumps({"org_id": incident.org_id, "member_id": incident.member_id}))
+            pipe.setex(f"{key}:last", TRACKING_TTL_SECONDS, encoded)
+            pipe.lpush(f"{key}:trail", encoded)
+            pipe.ltrim(f"{key}:trail", 0, TRACKING_TRAIL_SIZE - 1)
+            pipe.expire(f"{key}:trail", TRACKING_TTL_SECONDS)
+            pipe.execute()
+        except Exception:
+            pass
+
+    # --- LECTURA (envío coalescido a los guardias) ---
+    async def fan_out(self):
+        now = time.monotonic()
+
+        by_org = {}
+        for incident in list(self.incidents.values()):
+            if now - incident.updated_at > TRACKING_TTL_SECONDS:
+                self.close(incident.incident_id)
+            elif incident.latest:
+                by_org.setdefault(incident.org_id, []).append(incident)
+
+        for org_id, incidents in by_org.items():
+            for websocket, info in list(manager.connections_for(org_id, GUARD_ROLES)):
+                if now - info.track_last_sent < info.track_interval:
+                    continue
+                deltas = [i for i in incidents if i.version > info.track_seen.get(i.incident_id, 0)]
+                if not deltas:
+                    continue
+
+                info.track_last_sent = now
+                for incident in deltas:
+                    if not await manager.send_personal(websocket, incident.as_message()):
+                        break
+                    info.track_seen[incident.incident_id] = incident.version
+
+    async def run(self):
+        while True:
+            try:
+                await self.fan_out()
+            except Exception as e:
+                print(f"❌ Error tracking GPS: {e}")
+            await asyncio.sleep(TICK_SECONDS)
+
+
+tracking_store = TrackingStore()
@@ -1,25 +1,79 @@
-import json
+import asyncio
+import hashlib
 import os
 from fastapi import FastAPI, Request
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
-from fastapi.responses import FileResponse, RedirectResponse
+from .templating import templates, precompile_templates
+from fastapi.responses import FileResponse, RedirectResponse, Response
 from sqlalchemy.orm import Session
 
 from .database import engine, SessionLocal
 from .models import Organization
-from .config import redis_client, DEFAULT_THEME, THEMES
+from .config import redis_client, DEFAULT_THEME, THEMES, TEMPLATES_PRECOMPILE, ASSET_FINGERPRINT, RATE_LIMIT_ENABLED
+from .core.partitions import partition_maintenance_loop
+from .utils.access_buffer import access_buffer
+from .core.receipts import receipt_buffer
+from .utils.health_buffer import health_buffer
+from .utils.rate_limit import rate_limiter
+from .core import events
+from .core.assets import assets
+from .core.media import MediaStaticFiles
+from .core.tracking import tracking_store
+from .utils.ws_manager import manager
+from .utils import fastjson
 # Importamos todos los routers
-from .routers import auth, dashboard, ws, api, admin, security, pets, finance, services, partners, directory
+from .routers import auth, dashboard, ws, api, admin, security, pets, finance, services, partners, directory, sse
 
 app = FastAPI(title="Multi-Tenant SaaS")
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
-templates = Jinja2Templates(directory="app/templates")
+app.mount("/static", MediaStaticFiles(directory="static"), name="static")
+
+# --- TAREAS DE FONDO ---
+@app.on_event("startup")
+async def start_background_jobs():
+    # Plantillas compiladas antes del primer request (en un hilo, no bloquea el arranque)
+    if TEMPLATES_PRECOMPILE:
+        asyncio.create_task(asyncio.to_thread(precompile_templates))
+    # Estáticos con hash + variantes .br/.gz (si no, se construye en el primer asset_url)
+    if ASSET_FINGERPRINT:
+        asyncio.create_task(asyncio.to_thread(assets.build))
+    # Particiones mensuales de access_logs / panic_logs (crear futuras + archivar viejas)
+    asyncio.create_task(partition_maintenance_loop(engine))
+    # Micro-lotes de AccessLog (portería / check-in)
+    access_buffer.start()
+    # Acuses de lectura de comunicados (bitmaps en lote)
+    receipt_buffer.start()
+    # Reportes de salud de la PWA (UPDATE en lote)
+    health_buffer.start()
+    # Envío coalescido de posiciones GPS a los guardias
+    asyncio.create_task(tracking_store.run())
+    # Eventos de otros workers (invalidación de cachés)
+    asyncio.create_task(events.listen())
+    # Latido de WebSockets: PING + cierre de conexiones semiabiertas
+    asyncio.create_task(manager.heartbeat())
+
+@app.on_event("shutdown")
+async def stop_background_jobs():
+    await access_buffer.stop() # Vaciar eventos pendientes antes de apagar
+    await receipt_buffer.stop()
+    await health_buffer.stop()
+
+# --- LÍMITE DE PETICIONES ---
+# Declarado ANTES que tenant_middleware = corre DESPUÉS (ya conoce la organización y su plan)
+@app.middleware("http")
+async def rate_limit_middleware(request: Request, call_next):
+    if RATE_LIMIT_ENABLED:
+        rejected = rate_limiter.check(request)
+        if rejected:
+            return rejected
+    return await call_next(request)
 
 # --- MIDDLEWARE INTELIGENTE (Redis + DB) ---
 @app.middleware("http")
 async def tenant_middleware(request: Request, call_next):
+    # Los estáticos no dependen de la organización: sin Redis ni BD
+    if request.url.path.startswith(("/static/", "/assets/")):
+        return await call_next(request)
+
     host = request.headers.get("host", "").lower()
     hostname = host.split(":")[0]
     org_data = None
@@ -29,7 +83,7 @@ async def tenant_middleware(request: Request, call_next):
         try:
             cached_org = redis_client.get(f"tenant:{hostname}")
             if cached_org:
-                org_data = json.loads(cached_org)
+                org_data = fastjson.loads(cached_org)
         except Exception:
             pass
 
@@ -60,7 +114,7 @@ async def tenant_middleware(request: Request, call_next):
                         "config": org.config
                     }
                     if redis_client:
-                        redis_client.setex(f"tenant:{hostname}", 600, json.dumps(org_data))
+                        redis_client.setex(f"tenant:{hostname}", 600, fastjson.dumps(org_data))
         finally:
             db.close()
 
@@ -85,6 +139,7 @@ async def tenant_middleware(request: Request, call_next):
 app.include_router(auth.router)
 app.include_router(dashboard.router)
 app.include_router(ws.router)
+app.include_router(sse.router)
 app.include_router(api.router)
 app.include_router(admin.router)
 app.include_router(security.router)
@@ -95,9 +150,45 @@ app.include_router(partners.router)
 app.include_router(directory.router)
 
 # --- RUTAS BASE ---
+def _offline_context(request: Request):
+    org = request.state.org or {}
+    return {
+        "request": request,
+        "theme": request.state.theme,
+        "emergency_phone": (org.get("config") or {}).get("emergency_phone") # Teléfono de portería
+    }
+
 @app.get("/service-worker.js")
-async def get_service_worker():
-    return FileResponse("static/service-worker.js", media_type="application/javascript")
+async def get_service_worker(request: Request):
+    # Uno por organización: shell con hash + pantalla offline; la versión del
+    # caché es el hash de ese contenido (cambia solo si algo cambió)
+    slug = request.state.org["slug"] if request.state.org else "leavisamos"
+    precache = assets.precache_for(slug)
+    offline_html = templates.get_template("pages/offline.html").render(_offline_context(request))
+    version = hashlib.sha256("|".join(precache + [offline_html]).encode()).hexdigest()[:10]
+
+    body = templates.get_template("pwa/service-worker.js").render({"sw": {
+        "slug": slug,
+        "version": version,
+        "precache": precache,
+        "offline_url": "/offline",
+        "icon": assets.url_for("img/icon-192.png")
+    }})
+    etag = '"' + hashlib.sha1(body.encode()).hexdigest()[:20] + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Service-Worker-Allowed": "/"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/javascript", headers=headers)
+
+@app.get("/offline")
+async def offline_page(request: Request):
+    # Precacheada por el service worker: se muestra cuando no hay red
+    return templates.TemplateResponse("pages/offline.html", _offline_context(request))
+
+@app.get("/assets/{path:path}")
+async def get_asset(path: str, request: Request):
+    # Nombre con hash -> immutable; variante br/gzip según Accept-Encoding
+    return assets.response(path, request.headers.get("accept-encoding", ""))
 
 @app.get("/manifest.json")
 async def get_manifest():
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, DateTime, Text, JSON, Float, Enum
+from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, DateTime, Text, JSON, Float, Enum, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -40,6 +40,10 @@ class Organization(Base):
 
 class Member(Base):
     __tablename__ = "members"
+    __table_args__ = (
+        Index("ix_members_org_role", "organization_id", "role"),
+        Index("ix_members_org_unit", "organization_id", "unit_info", postgresql_ops={"unit_info": "text_pattern_ops"}),
+    )
     id = Column(Integer, primary_key=True, index=True)
     organization_id = Column(Integer, ForeignKey("organizations.id"))
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -50,6 +54,8 @@ class Member(Base):
     position = Column(String) # "Propietario", "Inquilino"
     
     permissions = Column(JSON, default={})
+    # Atributos libres para segmentar comunicados: {"grado": "5", "seccion": "B"}
+    attributes = Column(JSON, default={})
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
@@ -64,10 +70,13 @@ class Member(Base):
 
 class Device(Base):
     __tablename__ = "devices"
+    # Único por hash del endpoint, no por la URL completa (app/core/devices.py)
+    __table_args__ = (Index("ux_devices_endpoint_hash", "endpoint_hash", unique=True),)
     id = Column(Integer, primary_key=True, index=True)
     member_id = Column(Integer, ForeignKey("members.id"))
     
-    push_endpoint = Column(Text, unique=True)
+    push_endpoint = Column(Text)
+    endpoint_hash = Column(String(64)) # sha256(push_endpoint) en hex
     push_p256dh = Column(String)
     push_auth = Column(String)
     
@@ -87,8 +96,12 @@ class Device(Base):
     app_version = Column(String) # Para saber si tienen la app vieja
 
 # --- MÓDULO SEGURIDAD (Pánico & Accesos) ---
+# NOTA: En Postgres panic_logs y access_logs están particionadas por mes sobre
+# created_at (migrations/027). Filtra SIEMPRE por rango de created_at para que
+# el planner pode particiones.
 class PanicLog(Base):
     __tablename__ = "panic_logs"
+    __table_args__ = (Index("ix_panic_logs_org_created", "organization_id", "created_at"),)
     id = Column(Integer, primary_key=True)
     member_id = Column(Integer, ForeignKey("members.id"))
     organization_id = Column(Integer, ForeignKey("organizations.id"))
@@ -101,6 +114,7 @@ class PanicLog(Base):
 
 class AccessLog(Base):
     __tablename__ = "access_logs"
+    __table_args__ = (Index("ix_access_logs_org_created", "organization_id", "created_at"),)
     id = Column(Integer, primary_key=True)
     organization_id = Column(Integer, ForeignKey("organizations.id"))
     member_id = Column(Integer, ForeignKey("members.id"), nullable=True) # Si es vecino
@@ -261,6 +275,10 @@ class Bulletin(Base):
     # Relaciones
     organization = relationship("Organization")
     events = relationship("BulletinEvent", back_populates="bulletin")
+    receipt = relationship("BulletinReceipt", back_populates="bulletin", uselist=False)
+
+    # "Últimos comunicados de la organización" sin ordenar toda la tabla
+    __table_args__ = (Index("ix_bulletins_org_created", "organization_id", "created_at"),)
 
 class BulletinEvent(Base):
     __tablename__ = "bulletin_events"
@@ -275,10 +293,36 @@ class BulletinEvent(Base):
     member = relationship("Member")
 
 
+class BulletinReceipt(Base):
+    """
+    Acuses compactos: UNA fila por boletín con bitmaps de member_id
+    (bit = member_id - base_member_id) para enviado / leído / confirmado.
+    Los contadores se mantienen al escribir -> "X de Y leyeron" en O(1).
+    Reemplaza a BulletinEvent (una fila por vecino y estado).
+    """
+    __tablename__ = "bulletin_receipts"
+    bulletin_id = Column(Integer, ForeignKey("bulletins.id"), primary_key=True)
+    organization_id = Column(Integer, ForeignKey("organizations.id"), index=True)
+
+    base_member_id = Column(Integer, default=0) # Múltiplo de 8
+    sent_bits = Column(LargeBinary, default=b"")
+    read_bits = Column(LargeBinary, default=b"")
+    confirmed_bits = Column(LargeBinary, default=b"")
+
+    sent_count = Column(Integer, default=0)
+    read_count = Column(Integer, default=0)
+    confirmed_count = Column(Integer, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    bulletin = relationship("Bulletin", back_populates="receipt")
+
+
 # --- MÓDULO VIDA SOCIAL ---
 
 class Pet(Base):
     __tablename__ = "pets"
+    # Feed con cursor: WHERE organization_id = ? AND id < ? ORDER BY id DESC
+    __table_args__ = (Index("ix_pets_org_id", "organization_id", "id"),)
     id = Column(Integer, primary_key=True)
     organization_id = Column(Integer, ForeignKey("organizations.id"))
     owner_id = Column(Integer, ForeignKey("members.id"))
@@ -302,6 +346,10 @@ class Pet(Base):
     last_seen_location = Column(String, nullable=True)
     reward_amount = Column(String, nullable=True)
     contact_phone = Column(String, nullable=True)
+
+    # Totales desnormalizados (app/core/social.py los mueve junto con cada fila)
+    reaction_count = Column(Integer, nullable=False, default=0, server_default="0")
+    comment_count = Column(Integer, nullable=False, default=0, server_default="0")
     
     owner = relationship("Member")
 
@@ -328,6 +376,8 @@ class Debt(Base):
 # MÓDULO SOCIAL
 class Reaction(Base):
     __tablename__ = "reactions"
+    # Un like por vecino y objetivo; el prefijo (target_type, target_id) sirve para buscar por objetivo
+    __table_args__ = (Index("ux_reactions_target_member", "target_type", "target_id", "member_id", "reaction_type", unique=True),)
     id = Column(Integer, primary_key=True)
     member_id = Column(Integer, ForeignKey("members.id"))
     target_type = Column(String) # 'pet'
@@ -337,6 +387,7 @@ class Reaction(Base):
 
 class Comment(Base):
     __tablename__ = "comments"
+    __table_args__ = (Index("ix_comments_target", "target_type", "target_id", "created_at"),)
     id = Column(Integer, primary_key=True)
     member_id = Column(Integer, ForeignKey("members.id"))
     target_type = Column(String) # 'pet'
@@ -1,17 +1,20 @@
 import json
 import os
-from fastapi import APIRouter, Request, Depends, Form, BackgroundTasks
-from fastapi.templating import Jinja2Templates
+from fastapi import APIRouter, Request, Depends, Form, BackgroundTasks, HTTPException
+from app.templating import templates
 from fastapi.responses import HTMLResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from app.database import get_db, SessionLocal
 from app.models import Member, Bulletin, Device # Importamos modelos nuevos
 from app.routers.dashboard import get_current_member
 from app.routers.ws import manager # Para avisar al websocket
+from app.core.targeting import audience_cache, normalize_criteria
+from app.core.receipts import create_receipt, record_receipt, delivery_stats
+from app.core.bulletins import latest_bulletins, announce_bulletin
+from app.utils.fastjson import dumps
 from pywebpush import webpush, WebPushException
 
 router = APIRouter(tags=["admin"])
-templates = Jinja2Templates(directory="app/templates")
 
 from app.models import Member, Bulletin, Device, Organization # <--- Agrega Organization
 
@@ -30,7 +33,7 @@ async def admin_home(request: Request, member: Member = Depends(get_current_memb
 
     # ... (lógica de estadísticas existente) ...
     total_members = db.query(Member).filter(Member.organization_id == member.organization_id).count()
-    recent_bulletins = db.query(Bulletin).filter(Bulletin.organization_id == member.organization_id).order_by(Bulletin.created_at.desc()).limit(5).all()
+    recent_bulletins = db.query(Bulletin).options(joinedload(Bulletin.receipt)).filter(Bulletin.organization_id == member.organization_id).order_by(Bulletin.created_at.desc()).limit(5).all()
 
     return templates.TemplateResponse("pages/admin/home_admin.html", {
         "request": request,
@@ -45,51 +48,77 @@ async def admin_home(request: Request, member: Member = Depends(get_current_memb
         "bulletins": recent_bulletins
     })
 
+def parse_target_form(torre: str = None, role: str = None, criteria: str = None):
+    # Combina los campos simples del formulario con el JSON avanzado (grado, sección, ...)
+    target = {}
+    if criteria:
+        try:
+            parsed = json.loads(criteria)
+            if isinstance(parsed, dict): target.update(parsed)
+        except ValueError:
+            pass
+    if torre: target["torre"] = torre.strip()
+    if role: target["role"] = role.strip()
+    return normalize_criteria(target)
+
 @router.post("/admin/bulletin/create")
 async def create_bulletin(
     background_tasks: BackgroundTasks,
     title: str = Form(...),
     content: str = Form(...),
     priority: str = Form(...),
+    torre: str = Form(None), # Segmentación (opcional)
+    role: str = Form(None),
+    criteria: str = Form(None), # JSON: {"grado": "5", "seccion": "B"}
     db: Session = Depends(get_db),
     admin: Member = Depends(get_current_member)
 ):
-    # 1. Guardar en BD (Igual que antes)
+    # 0. Resolver la audiencia UNA vez (SQL indexado -> bitmap de member_id)
+    target_criteria = parse_target_form(torre, role, criteria)
+    audience = audience_cache.resolve(db, admin.organization_id, target_criteria)
+
+    # 1. Guardar en BD
     new_bulletin = Bulletin(
         organization_id=admin.organization_id,
         author_id=admin.id,
         title=title,
         content=content,
         priority=priority,
-        target_criteria={"all": True}
+        target_criteria=target_criteria
     )
     db.add(new_bulletin)
+    db.flush()
+
+    # Acuses compactos: la audiencia queda marcada como "enviado" en UNA fila
+    create_receipt(db, new_bulletin.id, admin.organization_id, audience)
     db.commit()
+
+    # Caché de "últimos comunicados" (este worker y los demás vía bus de eventos)
+    announce_bulletin(new_bulletin)
     
     # ---------------------------------------------------------
-    # 2. NUEVO: AVISO EN TIEMPO REAL (WebSocket)
+    # 2. AVISO EN TIEMPO REAL (WebSocket) solo a la audiencia
     # Esto hace que aparezca el "Globo" en la pantalla de Juan al instante
-    await manager.broadcast({
+    await manager.send_to_audience(admin.organization_id, audience, {
         "type": "BULLETIN",
+        "bulletin_id": new_bulletin.id,
         "title": title,
         "body": content, # Resumen
         "priority": priority,
-        "org_id": admin.organization_id # Para filtrar en el futuro si hay varios
+        "org_id": admin.organization_id
     })
     # ---------------------------------------------------------
 
-    # 3. Calcular destinatarios (Igual que antes)
-    total_targets = db.query(Device).join(Member).filter(
-        Member.organization_id == admin.organization_id,
-        Device.is_active == True
-    ).count()
+    # 3. Destinatarios = tamaño de la audiencia
+    total_targets = len(audience)
 
-    # 4. Encolar Push (Background)
+    # 4. Encolar Push (Background) con la MISMA audiencia
     background_tasks.add_task(
         send_bulletin_push_background, 
         f"📢 {title}", 
         content[:100], 
-        admin.organization_id
+        admin.organization_id,
+        list(audience)
     )
 
     # 5. Respuesta Visual (Igual que antes)
@@ -121,7 +150,7 @@ def getColor(priority):
 #==================================================================
 
 # 1. Extraer la lógica de envío a una función independiente
-def send_bulletin_push_background(title: str, body: str, org_id: int):
+def send_bulletin_push_background(title: str, body: str, org_id: int, member_ids: list = None):
     # 1. CREAR NUEVA SESIÓN (Vital para background tasks)
     db = SessionLocal() 
     
@@ -136,12 +165,28 @@ def send_bulletin_push_background(title: str, body: str, org_id: int):
             print("❌ Background Error: Falta VAPID_PRIVATE_KEY")
             return
 
-        # Buscar dispositivos
-        devices = db.query(Device).join(Member).filter(
-            Member.organization_id == org_id,
-            Device.is_active == True
-        ).all()
+        # Buscar dispositivos (de la audiencia, si el comunicado está segmentado)
+        if member_ids is None:
+            devices = db.query(Device).join(Member).filter(
+                Member.organization_id == org_id,
+                Device.is_active == True
+            ).all()
+        else:
+            devices = []
+            for i in range(0, len(member_ids), 1000):
+                devices += db.query(Device).filter(
+                    Device.member_id.in_(member_ids[i:i + 1000]),
+                    Device.is_active == True
+                ).all()
         
+        # Payload serializado UNA vez para todos los dispositivos
+        payload = dumps({
+            "title": title,
+            "body": body,
+            "url": "/dashboard",
+            "icon": "/static/images/icon-192.png"
+        })
+
         count = 0
         for dev in devices:
             try:
@@ -150,12 +195,7 @@ def send_bulletin_push_background(title: str, body: str, org_id: int):
                         "endpoint": dev.push_endpoint,
                         "keys": {"p256dh": dev.push_p256dh, "auth": dev.push_auth}
                     },
-                    data=json.dumps({
-                        "title": title,
-                        "body": body,
-                        "url": "/dashboard",
-                        "icon": "/static/images/icon-192.png"
-                    }),
+                    data=payload,
                     vapid_private_key=private_key,
                     vapid_claims={"sub": email},
                     ttl=60
@@ -175,74 +215,14 @@ def send_bulletin_push_background(title: str, body: str, org_id: int):
     finally:
         db.close() # CERRAR LA SESIÓN MANUALMENTE
 
-# 2. Modificar el endpoint para usar BackgroundTasks
-# --- ENDPOINT CREAR BOLETÍN ---
-@router.post("/admin/bulletin/create")
-async def create_bulletin(
-    background_tasks: BackgroundTasks, # <--- Inyección de tareas
-    title: str = Form(...),
-    content: str = Form(...),
-    priority: str = Form(...),
-    db: Session = Depends(get_db), # Sesión del Request (corta vida)
-    admin: Member = Depends(get_current_member)
-):
-    # 1. Guardar en Base de Datos (Usando sesión del request)
-    new_bulletin = Bulletin(
-        organization_id=admin.organization_id,
-        author_id=admin.id,
-        title=title,
-        content=content,
-        priority=priority,
-        target_criteria={"all": True}
-    )
-    db.add(new_bulletin)
-    db.commit()
-    
-    # 2. Calcular destinatarios (Solo para mostrar el número al Admin)
-    total_targets = db.query(Device).join(Member).filter(
-        Member.organization_id == admin.organization_id,
-        Device.is_active == True
-    ).count()
-
-    # 3. ENCOLAR LA TAREA 
-    # Pasamos datos primitivos (strings/ints), NO pasamos la sesión 'db'
-    background_tasks.add_task(
-        send_bulletin_push_background, 
-        f"📢 {title}", 
-        content[:100], 
-        admin.organization_id
-    )
-
-    # 4. RESPUESTA INMEDIATA
-    color = "blue"
-    if priority == 'alert': color = "red"
-    elif priority == 'warning': color = "yellow"
-
-    # Nota: Usamos "Hace un instante" porque acaba de ocurrir
-    return HTMLResponse(content=f"""
-    <div class="p-4 mb-3 bg-slate-800 rounded-lg border-l-4 border-{color}-500 fade-me-in shadow-md">
-        <div class="flex justify-between items-center">
-            <h3 class="font-bold text-white">{title}</h3>
-            <span class="text-[10px] text-slate-400 bg-black/30 px-2 py-1 rounded flex items-center gap-1">
-                <i class="ph ph-check text-green-500"></i> Enviando a {total_targets}...
-            </span>
-        </div>
-        <p class="text-sm text-slate-300 mt-2 whitespace-pre-wrap">{content}</p>
-        <div class="mt-2 text-[10px] text-slate-500 text-right">Hace un instante</div>
-    </div>
-    """)
-
-
 #==================================================================
 # API: OBTENER ÚLTIMO BOLETÍN (Para el Dashboard)
 #==================================================================
 
 @router.get("/api/bulletins/latest")
 async def get_latest_bulletin(db: Session = Depends(get_db), member: Member = Depends(get_current_member)):
-    # Buscar el último boletín de su organización
-    bulletin = db.query(Bulletin).filter(
-        Bulletin.organization_id == member.organization_id
-    ).order_by(Bulletin.created_at.desc()).first()
+    # Último boletín vigente de su organización (desde la caché)
+    bulletin = latest_bulletins.latest_for(db, member)
     
     if not bulletin:
         return {"status": "empty"}
@@ -253,4 +233,33 @@ async def get_latest_bulletin(db: Session = Depends(get_db), member: Member = De
         "content": bulletin.content,
         "priority": bulletin.priority,
         "date": bulletin.created_at.isoformat()
-    }
\ No newline at end of file
+    }
+
+
+#==================================================================
+# ACUSES DE LECTURA (Globo abierto / Firma)
+#==================================================================
+
+@router.post("/api/bulletins/{bulletin_id}/read")
+async def mark_bulletin_read(bulletin_id: int, db: Session = Depends(get_db), member: Member = Depends(get_current_member)):
+    record_receipt(db, bulletin_id, "read", member)
+    return {"status": "ok"}
+
+@router.post("/api/bulletins/{bulletin_id}/confirm")
+async def mark_bulletin_confirmed(bulletin_id: int, db: Session = Depends(get_db), member: Member = Depends(get_current_member)):
+    record_receipt(db, bulletin_id, "confirmed", member)
+    return {"status": "ok"}
+
+@router.get("/admin/bulletins/{bulletin_id}/stats")
+async def bulletin_stats(bulletin_id: int, db: Session = Depends(get_db), admin: Member = Depends(get_current_member)):
+    if admin.role != "admin":
+        raise HTTPException(status_code=403, detail="Solo administradores")
+
+    bulletin = db.query(Bulletin).options(joinedload(Bulletin.receipt)).filter(
+        Bulletin.id == bulletin_id,
+        Bulletin.organization_id == admin.organization_id
+    ).first()
+    if not bulletin:
+        raise HTTPException(status_code=404, detail="Comunicado no encontrado")
+
+    return delivery_stats(bulletin.receipt)
@@ -3,7 +3,7 @@ from dotenv import load_dotenv
 from fastapi import APIRouter, Depends, Body, Request
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.models import Device, Member, AccessLog, MemberRole, PanicLog, Debt, Payment, Bulletin, AuditLog, User
+from app.models import Member, AccessLog, MemberRole, PanicLog, Debt, Payment, Bulletin, AuditLog, User
 from app.routers.dashboard import get_current_member
 from app.core.actions import get_allowed_actions, get_action_ui
 from openai import OpenAI
@@ -14,7 +14,12 @@ import json
 
 from sqlalchemy import func
 
-from app.routers.ws import manager # Para avisar al websocket
+from app.utils.access_buffer import record_access
+from app.utils.health_buffer import record_health
+from app.core.devices import device_row, upsert_devices, MAX_BATCH
+from app.utils.ws_manager import GUARD_ROLES
+from app.core.tracking import tracking_store
+from fastapi import HTTPException
 
 load_dotenv(override=True)
 
@@ -30,47 +35,38 @@ async def subscribe_push(
     db: Session = Depends(get_db)
 ):
     # Estructura recibida: { subscription: {...}, details: {...} }
-    sub_data = payload.get("subscription", {})
-    details = payload.get("details", {})
-    
-    endpoint = sub_data.get("endpoint")
-    if not endpoint:
+    row = device_row(member.id, payload.get("subscription", {}), payload.get("details", {}),
+                     request.headers.get('user-agent', 'Desconocido'))
+    if not row:
         return {"status": "error", "msg": "Endpoint no válido"}
 
-    # Buscar si existe
-    device = db.query(Device).filter(Device.push_endpoint == endpoint).first()
-    
-    # Datos técnicos
-    keys = sub_data.get("keys", {})
+    # Crear o actualizar en un solo INSERT ... ON CONFLICT (por si cambió de PWA a Browser o actualizó OS)
+    ids = upsert_devices(db, [row])
+    db.commit()
+    # El cliente guarda este id y lo manda en /health/report (un solo dispositivo por reporte)
+    return {"status": "success", "msg": "Dispositivo registrado con éxito", "device_id": ids[row["endpoint_hash"]]}
+
+
+@router.post("/push/subscribe/batch")
+async def subscribe_push_batch(
+    request: Request,
+    payload: dict = Body(...),
+    member: Member = Depends(get_current_member),
+    db: Session = Depends(get_db)
+):
+    # Alta de varios dispositivos del vecino de una vez (celular + tablet + PC)
+    # { devices: [ { subscription: {...}, details: {...} }, ... ] }
+    items = payload.get("devices") or []
+    if not isinstance(items, list) or len(items) > MAX_BATCH:
+        raise HTTPException(status_code=400, detail=f"Máximo {MAX_BATCH} dispositivos por lote")
+
     user_agent_raw = request.headers.get('user-agent', 'Desconocido')
-    
-    if not device:
-        # CREAR NUEVO
-        new_device = Device(
-            member_id=member.id,
-            push_endpoint=endpoint,
-            push_p256dh=keys.get("p256dh"),
-            push_auth=keys.get("auth"),
-            
-            # Huella Digital
-            user_agent=user_agent_raw,
-            platform=details.get("platform"),
-            timezone=details.get("timezone"),
-            is_pwa=details.get("is_pwa", False)
-        )
-        db.add(new_device)
-        msg = "Dispositivo registrado con éxito"
-    else:
-        # ACTUALIZAR EXISTENTE (Importante por si cambió de PWA a Browser o actualizó OS)
-        device.push_p256dh = keys.get("p256dh")
-        device.push_auth = keys.get("auth")
-        device.user_agent = user_agent_raw
-        device.is_pwa = details.get("is_pwa", False)
-        device.last_seen = func.now() # Actualizamos la última vez visto
-        msg = "Datos de dispositivo actualizados"
-        
+    rows = [device_row(member.id, item.get("subscription", {}), item.get("details", {}), user_agent_raw)
+            for item in items if isinstance(item, dict)]
+    ids = upsert_devices(db, [row for row in rows if row])
     db.commit()
-    return {"status": "success", "msg": msg}
+    # Mismo orden que llegaron; None = suscripción sin endpoint
+    return {"status": "success", "device_ids": [ids.get(row["endpoint_hash"]) if row else None for row in rows]}
 
 
 @router.post("/proximity/check-in")
@@ -79,22 +75,17 @@ async def check_in_proximity(
     member: Member = Depends(get_current_member),
     db: Session = Depends(get_db)
 ):
-    # Crear Log de Acceso
-    new_log = AccessLog(
+    # Crear Log de Acceso (micro-lote) y avisar al Guardia (Monitor Centinela) vía WebSocket
+    # Usamos un tipo nuevo "INFO_ACCESS" para que sea verde, no rojo.
+    # El aviso sale desde el buffer, una vez que el lote hizo commit.
+    await record_access(db, dict(
         organization_id=member.organization_id,
         member_id=member.id,
         direction="IN",
         method="APP_CHECKIN", # Marcamos que fue voluntario desde la App
         target_unit=member.unit_info,
         visitor_name="Residente (Confirmado)"
-    )
-    db.add(new_log)
-    db.commit()
-
-    # Avisar al Guardia (Monitor Centinela) vía WebSocket
-    # Usamos un tipo nuevo "INFO_ACCESS" para que sea verde, no rojo
-    # Avisar al Guardia (Monitor Centinela) vía WebSocket
-    await manager.broadcast({
+    ), broadcast={
         "type": "INFO_ACCESS", 
         "user": member.user.name, # <--- CAMBIO AQUÍ (Agregamos .user)
         "user_id": member.user.id, # <--- Asegúrate de usar member.user.id aquí también
@@ -106,6 +97,22 @@ async def check_in_proximity(
     return {"status": "ok", "msg": "Ingreso registrado correctamente"}
 
 
+# --- TRACKING: REPLAY DEL RASTRO GPS DE UN INCIDENTE (Solo guardias) ---
+@router.get("/tracking/{incident_id}/trail")
+async def get_tracking_trail(
+    incident_id: str,
+    member: Member = Depends(get_current_member)
+):
+    if member.role not in GUARD_ROLES:
+        raise HTTPException(status_code=403, detail="Acceso denegado")
+
+    trail = tracking_store.trail(incident_id)
+    if not trail or trail["org_id"] != member.organization_id:
+        return {"status": "empty", "points": []}
+
+    return {"status": "ok", "incident_id": incident_id, "points": trail["points"]}
+
+
 #================================================================
 # CEREBRO IA: PROCESAR COMANDO DE VOZ
 # LA CENTRAL NEURAL (Integración OpenAI) 🧠✨
@@ -263,16 +270,20 @@ async def get_security_briefing(
     member: Member = Depends(get_current_member)
 ):
     # 1. Obtener eventos recientes (últimas 12h) usando la forma moderna
-    since = datetime.now(timezone.utc) - timedelta(hours=12)
+    # Rango cerrado [since, now) sobre created_at -> Postgres solo toca las particiones del mes
+    now = datetime.now(timezone.utc)
+    since = now - timedelta(hours=12)
     
-    panics = db.query(PanicLog).filter(
+    panics = db.query(func.count(PanicLog.id)).filter(
         PanicLog.organization_id == member.organization_id,
-        PanicLog.created_at >= since
-    ).all()
+        PanicLog.created_at >= since,
+        PanicLog.created_at < now
+    ).scalar() or 0
     
-    access = db.query(AccessLog).filter(
+    access = db.query(AccessLog.visitor_name, AccessLog.created_at).filter(
         AccessLog.organization_id == member.organization_id,
         AccessLog.created_at >= since,
+        AccessLog.created_at < now,
         AccessLog.method.in_(["MANUAL", "MANUAL_GUARDIA", "APP_CHECKIN"])
     ).order_by(AccessLog.created_at.desc()).limit(10).all()
 
@@ -281,7 +292,7 @@ async def get_security_briefing(
         return {"status": "ok", "text": "Sin novedades en el turno. Todo tranquilo."}
 
     # 3. Preparar datos para GPT
-    data_text = f"ALERTAS ROJAS: {len(panics)}. "
+    data_text = f"ALERTAS ROJAS: {panics}. "
     if panics:
         data_text += "Última alerta de pánico hace poco. "
         
@@ -309,31 +320,24 @@ async def get_security_briefing(
         
     except Exception as e:
         print(f"Error IA: {e}")
-        return {"status": "ok", "text": f"Resumen manual: {len(panics)} alertas y {len(access)} ingresos recientes."}
+        return {"status": "ok", "text": f"Resumen manual: {panics} alertas y {len(access)} ingresos recientes."}
     
 
 @router.post("/health/report")
 async def report_health(
     payload: dict = Body(...),
-    member: Member = Depends(get_current_member),
-    db: Session = Depends(get_db)
+    member: Member = Depends(get_current_member)
 ):
-    # payload = { online: true, permission: 'granted', ... }
-    
-    # 1. Buscar el dispositivo actual del usuario (basado en user_agent aproximado o sesión)
-    # Por simplicidad, actualizamos el último dispositivo activo o todos los de este usuario
-    # Idealmente, el frontend debería mandar un device_id si lo tuviera guardado.
-    
-    devices = db.query(Device).filter(Device.member_id == member.id).all()
-    
-    status_perm = payload.get("permission", "unknown")
-    
-    # Actualizamos el estado de permiso en la BD
-    for dev in devices:
-        dev.permission_status = status_perm
-        dev.last_seen = func.now()
-        dev.is_active = (status_perm == 'granted')
-    
-    db.commit()
-    
-    return {"status": "received"}
\ No newline at end of file
+    # payload = { device_id: 12, online: true, permission: 'granted', pwa: true, ... }
+    # device_id lo devolvió /push/subscribe; sin él (cliente viejo) se tocan todos sus dispositivos.
+    # Nada de commit aquí: el buffer junta los reportes y los escribe en lote.
+    device_id = payload.get("device_id")
+    if not isinstance(device_id, int) or isinstance(device_id, bool):
+        device_id = None
+
+    accepted = await record_health(
+        member.id, device_id,
+        str(payload.get("permission", "unknown"))[:20],
+        bool(payload.get("pwa"))
+    )
+    return {"status": "received" if accepted else "throttled"}
\ No newline at end of file
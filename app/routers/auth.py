@@ -1,13 +1,12 @@
 from fastapi import APIRouter, Form, Depends, HTTPException, Request, status
-from fastapi.responses import JSONResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
+from fastapi.responses import JSONResponse, RedirectResponse, HTMLResponse
+from app.templating import templates
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models import User, Member, Organization
-from app.utils.security import verify_password, create_access_token
+from app.utils.security import verify_password_async, create_access_token, PasswordBusy
 from app.routers.dashboard import get_current_member
 
-templates = Jinja2Templates(directory="app/templates")
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -30,8 +29,19 @@ async def login(
     # 2. Buscar Usuario Global
     user = db.query(User).filter(User.public_id == dni).first()
     
-    # 3. Validar Credenciales
-    if not user or not verify_password(code, user.access_code):
+    # 3. Validar Credenciales (argon2 en su propio pool: el loop sigue atendiendo alertas)
+    valid, new_hash = False, None
+    if user:
+        try:
+            valid, new_hash = await verify_password_async(code, user.access_code)
+        except PasswordBusy:
+            return HTMLResponse(
+                """<div class="p-3 mb-4 text-sm text-yellow-200 bg-yellow-900/50 rounded-lg text-center">Muchos ingresos a la vez. Intente en unos segundos.</div>""",
+                status_code=503,
+                headers={"Retry-After": "3"}
+            )
+
+    if not valid:
         # Retornamos HTML de error para que HTMX lo pinte en el formulario
         return JSONResponse(
             status_code=200, 
@@ -54,6 +64,11 @@ async def login(
             media_type="text/html"
         )
 
+    # Parámetros argon2 cambiaron desde que se guardó: se guarda el hash nuevo
+    if new_hash:
+        user.access_code = new_hash
+        db.commit()
+
     # 5. Éxito: Crear Sesión
     return create_session_response(user, membership)
 
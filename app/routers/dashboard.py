@@ -1,17 +1,31 @@
 from fastapi import APIRouter, Request, Depends, Cookie, HTTPException, status
-from fastapi.templating import Jinja2Templates
+from app.templating import templates
 from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.models import Member, Bulletin, Organization
+from app.models import Member, Organization
 from jose import jwt, JWTError
 from app.config import SECRET_KEY # Asegúrate que esto exista en config.py
 from app.utils.security import ALGORITHM
+from app.core.bulletins import latest_bulletins
 
 import os
 
 router = APIRouter(tags=["dashboard"])
-templates = Jinja2Templates(directory="app/templates")
+
+def decode_access_token(access_token: str):
+    """ Cookie "Bearer eyJhbG..." -> member_id (o None si falta, está vencida o es inválida). """
+    if not access_token:
+        return None
+    try:
+        # El token viene como "Bearer eyJhbG..."
+        scheme, token = access_token.split()
+        if scheme.lower() != 'bearer':
+            return None
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        return payload.get("sub")
+    except (JWTError, ValueError):
+        return None
 
 # Dependencia para proteger rutas
 def get_current_member(access_token: str = Cookie(None), db: Session = Depends(get_db)):
@@ -20,21 +34,9 @@ def get_current_member(access_token: str = Cookie(None), db: Session = Depends(g
         headers={"Location": "/"}, # Si falla, mandar al login
     )
     
-    if not access_token:
+    member_id = decode_access_token(access_token)
+    if member_id is None:
         raise exception_redirect
-    
-    try:
-        # El token viene como "Bearer eyJhbG..."
-        scheme, token = access_token.split()
-        if scheme.lower() != 'bearer':
-            raise exception_redirect
-            
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        member_id = payload.get("sub")
-        if member_id is None:
-             raise exception_redirect
-    except (JWTError, ValueError):
-         raise exception_redirect
          
     member = db.query(Member).filter(Member.id == member_id).first()
     if member is None:
@@ -46,8 +48,8 @@ def get_current_member(access_token: str = Cookie(None), db: Session = Depends(g
 async def dashboard_home(request: Request, member: Member = Depends(get_current_member), db: Session = Depends(get_db)):
     current_theme = getattr(request.state, "theme", None)
 
-    # BUSCAR ÚLTIMO BOLETÍN ACTIVO (Menos de 24h o no expirado)
-    latest_bulletin = db.query(Bulletin).order_by(Bulletin.created_at.desc()).first()
+    # ÚLTIMO BOLETÍN ACTIVO de SU organización (caché por org, respeta expires_at)
+    latest_bulletin = latest_bulletins.latest_for(db, member)
 
     # BUSCAR OTRAS MEMBRESÍAS DEL MISMO USUARIO
     my_profiles = db.query(Member).join(Organization).filter(
@@ -1,14 +1,11 @@
 from fastapi import APIRouter, Request, Depends, Query
-from fastapi.templating import Jinja2Templates
+from app.templating import templates
 from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
 from app.database import get_db
-from app.models import Member, User, Organization
-from fastapi import HTTPException
+from app.core.directory import directory_cache, tenant_org_id
 
 router = APIRouter(tags=["directory"])
-templates = Jinja2Templates(directory="app/templates")
 
 @router.get("/directory/accountants")
 async def public_directory(
@@ -16,26 +13,10 @@ async def public_directory(
     q: str = Query(None, min_length=3), # Búsqueda
     db: Session = Depends(get_db)
 ):
-    # Buscar Organización (Por slug o ID fijo para la demo)
-    # Asumimos que el Colegio es la org con type='colegio_prof'
-    # En producción filtrarías por subdominio o ID
-    
-    query = db.query(Member).join(User).join(Organization).filter(
-        Organization.type == "colegio_prof",
-        Member.is_active == True # <--- EL FILTRO DE ORO: Solo los que pagan
-    )
-
-    if q:
-        query = query.filter(
-            or_(
-                User.name.ilike(f"%{q}%"),
-                # CORRECCIÓN: Usar User.public_id en lugar de Member.public_id
-                User.public_id.ilike(f"%{q}%") 
-            )
-        )
-
-    # Limitar resultados para no mostrar toda la base
-    results = query.limit(20).all()
+    # Índice en memoria del colegio del host (o de todos los colegios):
+    # solo miembros habilitados (EL FILTRO DE ORO: solo los que pagan)
+    index = directory_cache.index(db, tenant_org_id(request))
+    results = index.search(q) if q else index.first()
 
     return templates.TemplateResponse("pages/public/directory.html", {
         "request": request,
@@ -44,8 +25,6 @@ async def public_directory(
     })
 
 
-
-
 @router.get("/cpc/{public_id}")
 async def public_profile(
     request: Request,
@@ -53,23 +32,15 @@ async def public_profile(
     db: Session = Depends(get_db)
 ):
     # Buscar miembro por ID Público (Matrícula) dentro de Colegios Profesionales
-    member = db.query(Member).join(User).join(Organization).filter(
-        Organization.type == "colegio_prof",
-        User.public_id == public_id
-    ).first()
+    profile = directory_cache.index(db, tenant_org_id(request)).by_public_id.get(public_id)
 
-    if not member:
+    if not profile:
         # Podríamos mostrar una página de "No encontrado o No Habilitado"
         return templates.TemplateResponse("pages/errors/404_profile.html", {"request": request})
 
-    # Calcular estado financiero real para mostrar la insignia
-    # (Si está inactivo en BD, mostramos advertencia roja)
-    
-    return templates.TemplateResponse("pages/public/profile_cv.html", {
-        "request": request,
-        "profile": member,
-        "theme": {"primary_color": member.organization.theme_color}
-    })
+    # Si no está habilitado, el perfil muestra la advertencia roja
+    return directory_cache.render_profile(templates, request, "pages/public/profile_cv.html", profile,
+                                          theme={"primary_color": profile.theme_color})
 
 
 # ... imports ...
@@ -77,35 +48,31 @@ async def public_profile(
 # RUTA 1: PERFIL DE SERVICIOS (Estudio Contable / Independiente)
 @router.get("/cpc/service/{public_id}")
 async def profile_service(request: Request, public_id: str, db: Session = Depends(get_db)):
-    member = db.query(Member).join(User).filter(User.public_id == public_id).first()
-    if not member: return "No encontrado"
+    profile = directory_cache.index(db, tenant_org_id(request)).by_public_id.get(public_id)
+    if not profile: return "No encontrado"
     
-    return templates.TemplateResponse("pages/public/profile_service.html", {
-        "request": request,
-        "profile": member,
+    return directory_cache.render_profile(templates, request, "pages/public/profile_service.html", profile,
         # Datos simulados para la demo (luego vendrán de BD)
-        "testimonials": [
+        testimonials=[
             {"name": "Empresa SAC", "text": "Excelente gestión tributaria, nos ahorraron multas.", "stars": 5},
             {"name": "Jorge L.", "text": "Muy ordenados y puntuales con las declaraciones.", "stars": 5}
         ]
-    })
+    )
 
 # RUTA 2: PERFIL DE TALENTO (Curriculum Vitae)
 @router.get("/cpc/cv/{public_id}")
 async def profile_cv(request: Request, public_id: str, db: Session = Depends(get_db)):
-    member = db.query(Member).join(User).filter(User.public_id == public_id).first()
-    if not member: return "No encontrado"
+    profile = directory_cache.index(db, tenant_org_id(request)).by_public_id.get(public_id)
+    if not profile: return "No encontrado"
     
-    return templates.TemplateResponse("pages/public/profile_cv.html", {
-        "request": request,
-        "profile": member,
+    return directory_cache.render_profile(templates, request, "pages/public/profile_cv.html", profile,
         # Datos simulados CV
-        "skills": ["NIIF Completas", "Auditoría Financiera", "SAP", "Concar", "Inglés Intermedio"],
-        "experience": [
+        skills=["NIIF Completas", "Auditoría Financiera", "SAP", "Concar", "Inglés Intermedio"],
+        experience=[
             {"role": "Contador Senior", "company": "Mina de Oro SAC", "years": "2020 - Presente"},
             {"role": "Analista Tributario", "company": "Consultores Asociados", "years": "2018 - 2020"}
         ]
-    })
+    )
 
 # En app/routers/directory.py
 
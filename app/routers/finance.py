@@ -5,13 +5,17 @@ from dotenv import load_dotenv
 from openai import OpenAI
 from datetime import datetime, timezone
 from fastapi import APIRouter, Request, Depends, Form, UploadFile, File
-from fastapi.templating import Jinja2Templates
+from app.templating import templates
 from fastapi.responses import HTMLResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func, asc, desc
+from sqlalchemy import func, desc
 from app.database import get_db
 from app.models import Member, Debt, Payment, Device
 from app.routers.dashboard import get_current_member
+from app.core.ledger import load_pending_debts, apply_payment_fifo
+from app.core.reconciliation import build_statement_index, reconcile_statement, normalize_code
+from app.core.fragments import fragment_cache, bump_versions
+from starlette.concurrency import run_in_threadpool
 # IMPORTANTE: Importamos el gestor de websockets
 from app.routers.ws import manager 
 
@@ -23,7 +27,6 @@ api_key = os.getenv("OPENAI_API_KEY")
 #print ("🔑 Cargando clave API en finance.py..."+ api_key)
 
 router = APIRouter(tags=["finance"])
-templates = Jinja2Templates(directory="app/templates")
 
 # --- ADMIN: GENERAR CUOTAS MASIVAS ---
 @router.post("/finance/generate-fees")
@@ -68,6 +71,7 @@ async def generate_fees(
             count += 1
     
     db.commit()
+    bump_versions(f"debts:org:{admin.organization_id}")
     
     return HTMLResponse(f"""
     <div class="bg-green-900/30 border-l-4 border-green-500 p-4 rounded mb-4 fade-me-in">
@@ -91,7 +95,9 @@ async def report_payment(
     if not operation_code and not voucher:
          return HTMLResponse('<div class="text-red-500 border border-red-500 p-2 rounded">❌ Debes ingresar el código o subir el voucher.</div>')
 
-    # Si hay código, validamos duplicados
+    # Si hay código, validamos duplicados (normalizado: "abc 123" == "ABC123",
+    # igual que el extracto en la conciliación)
+    operation_code = normalize_code(operation_code) or None
     if operation_code:
         exists = db.query(Payment).filter(
             Payment.operation_code == operation_code,
@@ -120,6 +126,7 @@ async def report_payment(
     )
     db.add(new_payment)
     db.commit()
+    bump_versions(f"payments:org:{member.organization_id}", f"debts:member:{member.id}")
 
     # AVISO AL ADMIN (Tiempo Real)
     await manager.broadcast({
@@ -127,7 +134,7 @@ async def report_payment(
         "org_id": member.organization_id,
         "amount": f"S/ {amount}",
         "user": member.user.name
-    })
+    }, org_id=member.organization_id, roles=("admin",))
 
     # RESPUESTA HTML (Reemplaza al formulario)
     return HTMLResponse("""
@@ -152,8 +159,15 @@ async def get_pending_payments(
     admin: Member = Depends(get_current_member)
 ):
     if admin.role != "admin": return ""
-    payments = db.query(Payment).filter(Payment.organization_id == admin.organization_id, Payment.status == "review").order_by(Payment.created_at.desc()).all()
-    return templates.TemplateResponse("components/admin_payment_list.html", {"request": request, "payments": payments})
+
+    def build():
+        payments = db.query(Payment).filter(Payment.organization_id == admin.organization_id, Payment.status == "review").order_by(Payment.created_at.desc()).all()
+        return {"payments": payments}
+
+    return fragment_cache.respond(
+        templates, request, "components/admin_payment_list.html", build,
+        scopes=[f"payments:org:{admin.organization_id}"], org_id=admin.organization_id
+    )
 
 # --- ADMIN: APROBAR PAGO (Con Notificación) ---
 @router.post("/finance/payment/{payment_id}/approve")
@@ -164,7 +178,8 @@ async def approve_payment(
 ):
     if admin.role != "admin": return "Error"
 
-    payment = db.query(Payment).filter(Payment.id == payment_id).first()
+    # Bloqueado hasta el commit: si la conciliación masiva lo tomó, se espera y se ve 'approved'
+    payment = db.query(Payment).filter(Payment.id == payment_id).with_for_update().first()
     if not payment or payment.status != 'review': return "Inválido"
 
     # 1. Actualizar estado
@@ -173,26 +188,14 @@ async def approve_payment(
     payment.reviewed_at = datetime.now(timezone.utc)
 
     # 2. Imputación FIFO
-    pending_debts = db.query(Debt).filter(
-        Debt.member_id == payment.member_id,
-        Debt.status == "pending"
-    ).order_by(asc(Debt.due_date)).all()
-
-    remaining = payment.amount
-    for debt in pending_debts:
-        if remaining <= 0: break
-        if remaining >= debt.balance:
-            remaining -= debt.balance
-            debt.balance = 0
-            debt.status = "paid"
-        else:
-            debt.balance -= remaining
-            remaining = 0
+    pending_debts = load_pending_debts(db, [payment.member_id], for_update=True).get(payment.member_id, [])
+    apply_payment_fifo(payment.amount, pending_debts)
             
     db.commit()
+    bump_versions(f"payments:org:{payment.organization_id}", f"debts:member:{payment.member_id}")
 
     # 3. NOTIFICAR AL VECINO (AQUÍ ESTÁ LO QUE FALTABA)
-    await manager.broadcast({
+    await manager.send_to_member(payment.member_id, {
         "type": "PAYMENT_UPDATE",
         "user_id": payment.member.user_id, # ID del usuario dueño de la membresía
         "status": "approved",
@@ -201,6 +204,41 @@ async def approve_payment(
 
     return HTMLResponse('<div class="bg-green-900/50 text-green-300 p-2 rounded text-center text-xs">Aprobado</div>')
 
+# --- ADMIN: CONCILIACIÓN MASIVA (Extracto Banco / Yape en CSV) ---
+@router.post("/finance/admin/reconcile")
+async def reconcile_bank_statement(
+    request: Request,
+    statement: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    admin: Member = Depends(get_current_member)
+):
+    if admin.role != "admin": return "Acceso denegado"
+
+    # Leer + indexar el CSV fuera del event loop (puede tener miles de filas)
+    try:
+        index = await run_in_threadpool(build_statement_index, statement.file)
+    except ValueError as e:
+        return HTMLResponse(f'<div class="bg-red-900/50 text-red-200 p-3 rounded text-sm">❌ {e}</div>')
+
+    report = reconcile_statement(db, admin.organization_id, index, reviewer_id=admin.id)
+    db.commit()
+    if report.approved:
+        bump_versions(f"payments:org:{admin.organization_id}",
+                      *{f"debts:member:{p.member_id}" for p in report.approved})
+
+    # Avisar a cada vecino cuyo pago quedó aprobado
+    for p in report.approved:
+        await manager.send_to_member(p.member_id, {
+            "type": "PAYMENT_UPDATE",
+            "user_id": p.member.user_id,
+            "status": "approved",
+            "msg": f"✅ Pago de S/ {p.amount} APROBADO."
+        })
+
+    return templates.TemplateResponse("components/reconciliation_report.html", {
+        "request": request, "report": report
+    })
+
 # --- ADMIN: RECHAZAR PAGO (Con Notificación) ---
 @router.post("/finance/payment/{payment_id}/reject")
 async def reject_payment(
@@ -220,9 +258,10 @@ async def reject_payment(
     payment.reviewed_at = datetime.now(timezone.utc)
     
     db.commit()
+    bump_versions(f"payments:org:{payment.organization_id}", f"debts:member:{payment.member_id}")
 
     # NOTIFICAR AL VECINO (AQUÍ TAMBIÉN)
-    await manager.broadcast({
+    await manager.send_to_member(payment.member_id, {
         "type": "PAYMENT_UPDATE",
         "user_id": payment.member.user_id,
         "status": "rejected",
@@ -238,27 +277,35 @@ async def get_my_summary(
     db: Session = Depends(get_db), 
     member: Member = Depends(get_current_member)
 ):
-    total_debt = db.query(func.sum(Debt.balance)).filter(
-        Debt.member_id == member.id,
-        Debt.status == "pending"
-    ).scalar() or 0.0
-
-    status_color = "blue"
-    if total_debt > 0: status_color = "red"
-    
-    return templates.TemplateResponse("components/finance_card.html", {
-        "request": request, "total_debt": total_debt, "status_color": status_color, "currency": "S/"
-    })
+    def build():
+        total_debt = db.query(func.sum(Debt.balance)).filter(
+            Debt.member_id == member.id,
+            Debt.status == "pending"
+        ).scalar() or 0.0
+
+        status_color = "blue"
+        if total_debt > 0: status_color = "red"
+        return {"total_debt": total_debt, "status_color": status_color, "currency": "S/"}
+
+    return fragment_cache.respond(
+        templates, request, "components/finance_card.html", build,
+        scopes=[f"debts:org:{member.organization_id}", f"debts:member:{member.id}"],
+        org_id=member.organization_id, member_id=member.id
+    )
 
 # --- VECINO: DETALLE DE DEUDAS Y PAGOS ---
 @router.get("/finance/my-debts-detail")
 async def get_my_debts_detail(request: Request, db: Session = Depends(get_db), member: Member = Depends(get_current_member)):
-    debts = db.query(Debt).filter(Debt.member_id == member.id).order_by(Debt.status.desc(), Debt.due_date).all()
-    payments = db.query(Payment).filter(Payment.member_id == member.id).order_by(Payment.created_at.desc()).limit(10).all()
-    
-    return templates.TemplateResponse("components/finance_debt_list.html", {
-        "request": request, "debts": debts, "payments": payments
-    })
+    def build():
+        debts = db.query(Debt).filter(Debt.member_id == member.id).order_by(Debt.status.desc(), Debt.due_date).all()
+        payments = db.query(Payment).filter(Payment.member_id == member.id).order_by(Payment.created_at.desc()).limit(10).all()
+        return {"debts": debts, "payments": payments}
+
+    return fragment_cache.respond(
+        templates, request, "components/finance_debt_list.html", build,
+        scopes=[f"debts:org:{member.organization_id}", f"debts:member:{member.id}"],
+        org_id=member.organization_id, member_id=member.id
+    )
 
 
 # 1. Endpoint para entregar el FORMULARIO LIMPIO
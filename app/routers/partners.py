@@ -1,14 +1,24 @@
 from fastapi import APIRouter, Request, Depends, Form, UploadFile, File
-from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models import Member, Partner, Organization
 from app.routers.dashboard import get_current_member
+from app.core.fragments import bump_versions
 import base64
 
 router = APIRouter(tags=["partners"])
-templates = Jinja2Templates(directory="app/templates")
+
+
+def partner_scope(partner: Partner):
+    """
+    Alcance del caché de /services que invalida este proveedor. Los globales
+    (organization_id NULL, cargados por script) suben "partners:global":
+    ese script debe llamar bump_versions("partners:global") tras el commit.
+    """
+    if partner.organization_id is None:
+        return "partners:global"
+    return f"partners:org:{partner.organization_id}"
 
 # --- ADMIN: GUARDAR NUEVO PARTNER ---
 @router.post("/partners/create")
@@ -46,6 +56,7 @@ async def create_partner(
     
     db.add(new_partner)
     db.commit()
+    bump_versions(partner_scope(new_partner))
     
     # Retornar mensaje de éxito
     return HTMLResponse(f"""
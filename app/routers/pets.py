@@ -1,28 +1,139 @@
-from fastapi import APIRouter, Request, Depends, Form, File, UploadFile
-from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Request, Depends, Form, File, UploadFile, HTTPException
+from app.templating import templates
+from fastapi.responses import HTMLResponse, RedirectResponse
+from sqlalchemy import update, case, func, not_
+from sqlalchemy.orm import Session, defer, joinedload
 from app.database import get_db
-from app.models import Member, Pet
+from app.models import Member, Pet, Reaction
 from app.routers.dashboard import get_current_member
-from app.routers.ws import manager # Para avisar si se pierde
+from app.core.fragments import fragment_cache, bump_versions
+from app.core.media import MediaResponse
+from app.core.social import toggle_reaction, add_comment
+from app.core.pet_alerts import lost_pet_notifier, pet_summary
 
 import base64
 
 router = APIRouter(tags=["pets"])
-templates = Jinja2Templates(directory="app/templates")
+
+FEED_PAGE_SIZE = 12
+NO_PHOTO_URL = "https://placehold.co/400x300?text=Sin+Foto"
+PHOTO_TYPES = {"image/jpeg", "image/png", "image/webp", "image/gif"}
+
+
+def feed_page(db: Session, member: Member, cursor: int = None):
+    """
+    Una página del feed por cursor (id de la última tarjeta vista): el costo es
+    el de la página, no el del edificio. Sin 'photos' (base64 pesado): cada
+    tarjeta pide su foto aparte (/pets/{id}/photo, loading="lazy").
+    """
+    query = db.query(Pet).options(defer(Pet.photos), joinedload(Pet.owner)).filter(
+        Pet.organization_id == member.organization_id
+    )
+    if cursor:
+        query = query.filter(Pet.id < cursor)
+    pets = query.order_by(Pet.id.desc()).limit(FEED_PAGE_SIZE + 1).all()
+
+    next_cursor = pets[FEED_PAGE_SIZE - 1].id if len(pets) > FEED_PAGE_SIZE else None
+    pets = pets[:FEED_PAGE_SIZE]
+
+    # Mis likes de ESTA página (una consulta, no una por tarjeta)
+    liked_ids = {row.target_id for row in db.query(Reaction.target_id).filter(
+        Reaction.target_type == "pet",
+        Reaction.target_id.in_([pet.id for pet in pets]),
+        Reaction.member_id == member.id,
+        Reaction.reaction_type == "like"
+    )} if pets else set()
+    return {"pets": pets, "next_cursor": next_cursor, "liked_ids": liked_ids}
+
+
+def _pet_in_org(db: Session, pet_id: int, member: Member):
+    pet = db.query(Pet).options(defer(Pet.photos)).filter(
+        Pet.id == pet_id, Pet.organization_id == member.organization_id
+    ).first()
+    if not pet:
+        raise HTTPException(status_code=404, detail="Mascota no encontrada")
+    return pet
+
 
 @router.get("/pets")
 async def pets_home(request: Request, member: Member = Depends(get_current_member), db: Session = Depends(get_db)):
-    # Ver mascotas de MI organización (Vecinos)
-    pets = db.query(Pet).filter(Pet.organization_id == member.organization_id).all()
     current_theme = getattr(request.state, "theme", None)
-    
-    return templates.TemplateResponse("pages/pets/home_pets.html", {
-        "request": request,
-        "user": member,
-        "pets": pets,
-        "theme": current_theme
+
+    def build():
+        # Ver mascotas de MI organización (Vecinos): solo la primera página
+        return {"user": member, "theme": current_theme, **feed_page(db, member)}
+
+    return fragment_cache.respond(
+        templates, request, "pages/pets/home_pets.html", build,
+        scopes=[f"pets:org:{member.organization_id}"],
+        org_id=member.organization_id, member_id=member.id
+    )
+
+@router.get("/pets/feed")
+async def pets_feed(request: Request, cursor: int = None, member: Member = Depends(get_current_member), db: Session = Depends(get_db)):
+    # Scroll infinito: el centinela de cada página pide la siguiente (hx-trigger="revealed")
+    return fragment_cache.respond(
+        templates, request, "components/pet_feed_page.html",
+        lambda: {"user": member, **feed_page(db, member, cursor)},
+        scopes=[f"pets:org:{member.organization_id}"],
+        org_id=member.organization_id, member_id=member.id
+    )
+
+@router.get("/pets/{pet_id}/photo")
+async def pet_photo(pet_id: int, member: Member = Depends(get_current_member), db: Session = Depends(get_db)):
+    # Solo la columna de fotos de UNA mascota de mi organización
+    row = db.query(Pet.photos).filter(Pet.id == pet_id, Pet.organization_id == member.organization_id).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Mascota no encontrada")
+
+    photo = row.photos[0] if row.photos else None
+    # El tipo del data URI lo puso el navegador al subir: solo imágenes raster
+    # (nada de text/html ni svg con <script> servidos desde nuestro dominio)
+    cache = {"Cache-Control": "private, max-age=86400", "X-Content-Type-Options": "nosniff",
+             "Content-Security-Policy": "sandbox"}
+    if photo and photo.startswith("data:") and "," in photo:
+        # data:image/jpeg;base64,... -> bytes con ETag fuerte y Range (MediaResponse)
+        header, data = photo.split(",", 1)
+        media_type = header[5:].split(";")[0].strip().lower()
+        if media_type not in PHOTO_TYPES:
+            return RedirectResponse(NO_PHOTO_URL, headers=cache)
+        try:
+            content = base64.b64decode(data)
+        except ValueError:
+            return RedirectResponse(NO_PHOTO_URL, headers=cache)
+        return MediaResponse(content=content, media_type=media_type, headers=cache)
+    if not photo or not photo.startswith(("https://", "http://")):
+        photo = NO_PHOTO_URL
+    return RedirectResponse(photo, headers=cache)
+
+@router.post("/pets/{pet_id}/react")
+async def react_pet(request: Request, pet_id: int, member: Member = Depends(get_current_member), db: Session = Depends(get_db)):
+    pet = _pet_in_org(db, pet_id, member)
+    liked = toggle_reaction(db, member.id, "pet", pet.id)
+    db.commit()
+    db.refresh(pet, ["reaction_count", "comment_count"])
+    bump_versions(f"pets:org:{member.organization_id}")
+    return templates.TemplateResponse("components/pet_social.html", {
+        "request": request, "pet": pet, "liked": liked
+    })
+
+@router.post("/pets/{pet_id}/comments")
+async def comment_pet(request: Request, pet_id: int, content: str = Form(None),
+                      member: Member = Depends(get_current_member), db: Session = Depends(get_db)):
+    # hx-prompt manda el texto en la cabecera HX-Prompt
+    content = (content or request.headers.get("HX-Prompt") or "").strip()[:500]
+    pet = _pet_in_org(db, pet_id, member)
+    if content:
+        add_comment(db, member.id, "pet", pet.id, content)
+        db.commit()
+        db.refresh(pet, ["reaction_count", "comment_count"])
+        bump_versions(f"pets:org:{member.organization_id}")
+    liked = db.query(Reaction.id).filter(
+        Reaction.target_type == "pet", Reaction.target_id == pet.id,
+        Reaction.member_id == member.id, Reaction.reaction_type == "like"
+    ).first() is not None
+    return templates.TemplateResponse("components/pet_social.html", {
+        "request": request, "pet": pet, "liked": liked
     })
 
 @router.post("/pets/register")
@@ -54,6 +165,7 @@ async def register_pet(
     )
     db.add(new_pet)
     db.commit()
+    bump_versions(f"pets:org:{member.organization_id}")
     
     return templates.TemplateResponse("components/pet_card.html", {
         "pet": new_pet, 
@@ -62,20 +174,28 @@ async def register_pet(
     })
 
 @router.post("/pets/{pet_id}/lost")
-async def report_lost_pet(pet_id: int, db: Session = Depends(get_db)):
-
-    pet = db.query(Pet).filter(Pet.id == pet_id).first()
-    pet.is_lost = not pet.is_lost # Toggle estado
+async def report_lost_pet(pet_id: int, member: Member = Depends(get_current_member), db: Session = Depends(get_db)):
+    # Toggle en un UPDATE: solo el dueño (o el admin) de ESTA organización
+    scope = [Pet.id == pet_id, Pet.organization_id == member.organization_id]
+    if member.role != "admin":
+        scope.append(Pet.owner_id == member.id)
+    row = db.execute(
+        update(Pet).where(*scope)
+        .values(is_lost=not_(func.coalesce(Pet.is_lost, False)),
+                lost_date=case((Pet.is_lost.is_(True), Pet.lost_date), else_=func.now()))
+        .returning(Pet.is_lost)
+    ).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Mascota no encontrada")
     db.commit()
-    
-    if pet.is_lost:
-        # ALERTA DE VOZ A TODOS
-        await manager.broadcast({
-            "type": "PRE_ARRIVAL", # Usamos amarillo (Advertencia)
-            "user": "ALERTA VECINAL",
-            "msg": f"Se perdió {pet.name}. Revisen la sección Mascotas."
-        })
-        
+    bump_versions(f"pets:org:{member.organization_id}")
+
+    if row.is_lost:
+        # Aviso a la organización, con margen por si fue un toque sin querer
+        lost_pet_notifier.lost(pet_summary(db, pet_id))
+    else:
+        lost_pet_notifier.found(pet_id)
+
     return "OK" # HTMX manejará el cambio de estado visual
 
 @router.post("/pets/register")
@@ -89,8 +209,8 @@ async def register_pet(
     db: Session = Depends(get_db),
     member: Member = Depends(get_current_member)
 ):
-    # 1. Procesar la Foto
-    if photo and photo.filename:
+    # 1. Procesar la Foto (solo imágenes raster; lo demás -> avatar por defecto)
+    if photo and photo.filename and photo.content_type in PHOTO_TYPES:
         contents = await photo.read()
         # Convertir a Base64 para guardar en BD (Formato: data:image/jpeg;base64,...)
         img_str = base64.b64encode(contents).decode("utf-8")
@@ -114,6 +234,7 @@ async def register_pet(
     )
     db.add(new_pet)
     db.commit()
+    bump_versions(f"pets:org:{member.organization_id}")
     
     return templates.TemplateResponse("components/pet_card.html", {
         "pet": new_pet, 
@@ -1,18 +1,18 @@
 from fastapi import APIRouter, Request, Depends, Form
-from fastapi.templating import Jinja2Templates
+from app.templating import templates
 from fastapi.responses import HTMLResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 from app.database import get_db
-from app.models import Member, AccessLog, Organization, User
+from app.models import Member, Organization, User
 from app.routers.dashboard import get_current_member
+from app.utils.access_buffer import record_access
 from itertools import groupby
 import os
 
 from zoneinfo import ZoneInfo
 
 router = APIRouter(tags=["security"])
-templates = Jinja2Templates(directory="app/templates")
 
 # 1. VISTA PRINCIPAL
 @router.get("/centinela")
@@ -161,16 +161,15 @@ async def log_access(
             # NO sobrescribimos 'visitor_name' con residente.user.name aquí, 
             # confiamos en lo que mandó el frontend (que ya es el nombre correcto).
     
-    new_log = AccessLog(
+    # Se guarda en micro-lote (buffer); responde cuando el lote ya hizo commit
+    new_log = await record_access(db, dict(
         organization_id=guardia.organization_id,
         member_id=member_id, 
         target_unit=target_unit or "Portería",
         direction="IN",
         method="MANUAL_GUARDIA",
         visitor_name=f"[{tipo}] {detalle}" # Quedará: "[RESIDENTE] Juan Pérez"
-    )
-    db.add(new_log)
-    db.commit()
+    ))
 
     # --- CORRECCIÓN DE HORA (UTC -> Lima) ---
     # Convertimos la hora guardada a la zona horaria de Perú
@@ -1,13 +1,13 @@
 from fastapi import APIRouter, Request, Depends
-from fastapi.templating import Jinja2Templates
+from app.templating import templates
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 from app.database import get_db
 from app.models import Member, Partner
 from app.routers.dashboard import get_current_member
+from app.core.fragments import fragment_cache
 
 router = APIRouter(tags=["services"])
-templates = Jinja2Templates(directory="app/templates")
 
 @router.get("/services")
 async def services_home(
@@ -18,26 +18,27 @@ async def services_home(
 ):
     current_theme = getattr(request.state, "theme", None)
 
-    # Lógica de Filtrado:
-    # Mostrar Partners GLOBALES (org_id es NULL) OR Partners de MI EDIFICIO
-    query = db.query(Partner).filter(
-        or_(
-            Partner.organization_id == None,
-            Partner.organization_id == member.organization_id
+    def build():
+        # Lógica de Filtrado:
+        # Mostrar Partners GLOBALES (org_id es NULL) OR Partners de MI EDIFICIO
+        query = db.query(Partner).filter(
+            or_(
+                Partner.organization_id == None,
+                Partner.organization_id == member.organization_id
+            )
         )
-    )
 
-    # Filtro por categoría si se selecciona
-    if category:
-        query = query.filter(Partner.category == category)
+        # Filtro por categoría si se selecciona
+        if category:
+            query = query.filter(Partner.category == category)
 
-    # Ordenar: Promocionados primero, luego verificados
-    partners = query.order_by(Partner.is_promoted.desc(), Partner.is_verified.desc()).all()
+        # Ordenar: Promocionados primero, luego verificados
+        partners = query.order_by(Partner.is_promoted.desc(), Partner.is_verified.desc()).all()
+        return {"user": member, "partners": partners, "theme": current_theme, "selected_category": category}
 
-    return templates.TemplateResponse("pages/services/home_services.html", {
-        "request": request,
-        "user": member,
-        "partners": partners,
-        "theme": current_theme,
-        "selected_category": category
-    })
\ No newline at end of file
+    # La categoría va en la query string -> ya es parte de la clave
+    return fragment_cache.respond(
+        templates, request, "pages/services/home_services.html", build,
+        scopes=["partners:global", f"partners:org:{member.organization_id}"],
+        org_id=member.organization_id, member_id=member.id
+    )
\ No newline at end of file
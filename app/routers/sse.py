@@ -0,0 +1,69 @@
+import asyncio
+from fastapi import APIRouter, Request, Cookie
+from fastapi.responses import StreamingResponse, JSONResponse
+from starlette.concurrency import run_in_threadpool
+from app.routers.dashboard import decode_access_token
+from app.routers.ws import with_session, identify_socket
+from app.utils.ws_manager import manager, SSEClient
+from app.utils.fastjson import dumps
+from app.config import SSE_KEEPALIVE_SECONDS
+
+router = APIRouter(tags=["sse"])
+
+# ==========================================================
+# CANAL DE SOLO LECTURA (Server-Sent Events)
+# Para pantallas que solo RECIBEN (boletines, pagos, alertas): mismo manager
+# que /ws/alerta, pero sin socket bidireccional ni sesión de BD abierta.
+#   const es = new EventSource('/sse/events?types=BULLETIN,PAYMENT_UPDATE');
+# El navegador reconecta solo y manda Last-Event-ID -> se reenvía lo perdido.
+# ==========================================================
+
+def _frame(event_id, data: str):
+    # 'data' ya viene serializado por el manager (una vez por evento)
+    return f"id: {event_id}\ndata: {data}\n\n" if event_id else f"data: {data}\n\n"
+
+
+@router.get("/sse/events")
+async def sse_events(request: Request, types: str = None, access_token: str = Cookie(None)):
+    # Sesión de BD SOLO para validar la cookie; se cierra antes de abrir el stream
+    member_id = decode_access_token(access_token)
+    info, org_limit = await run_in_threadpool(with_session, identify_socket, member_id) if member_id else (None, None)
+    if info is None:
+        return JSONResponse({"detail": "No autenticado"}, status_code=401)
+    if not await manager.admit(info, org_limit):
+        return JSONResponse({"detail": "Demasiadas conexiones"}, status_code=503, headers={"Retry-After": "30"})
+
+    wanted = [t.strip() for t in types.split(",") if t.strip()] if types else None
+    client = SSEClient(types=wanted)
+    last_event_id = request.headers.get("last-event-id") or request.query_params.get("last_event_id")
+
+    async def stream():
+        await manager.connect(client, info)
+        try:
+            yield "retry: 3000\n\n"
+
+            # Reanudar: lo que se perdió mientras estaba desconectado
+            if last_event_id:
+                missed = manager.replay.since(last_event_id, info)
+                if missed is None:
+                    yield _frame(None, dumps({"type": "RESYNC"})) # Hueco: el cliente recarga su estado
+                else:
+                    for event_id, message in missed:
+                        if not wanted or message.get("type") in wanted:
+                            yield _frame(event_id, dumps(message))
+
+            while not client.closed:
+                try:
+                    event_id, frame = await asyncio.wait_for(client.queue.get(), SSE_KEEPALIVE_SECONDS)
+                    yield _frame(event_id, frame)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n" # Mantiene vivo el proxy (Railway / nginx)
+        finally:
+            manager.disconnect(client)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no" # Sin buffer en nginx
+    })
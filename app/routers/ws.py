@@ -1,20 +1,30 @@
-import json
 import os
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
+import time
+from typing import Optional, Tuple
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Header, status
 from sqlalchemy.orm import Session
-from app.database import get_db
-from app.utils.ws_manager import manager
-from app.models import Device, Member
+from starlette.concurrency import run_in_threadpool
+from app.database import SessionLocal
+from app.utils.ws_manager import manager, ConnectionInfo, GUARD_ROLES
+from app.utils.fastjson import dumps
+from app.models import Device, Member, PanicLog
+from app.routers.dashboard import decode_access_token
+from app.core.tracking import tracking_store
+from app.core.incidents import incident_engine
+from app.config import TRACKING_MIN_INTERVAL_MS, METRICS_TOKEN
 from pywebpush import webpush, WebPushException
 
 router = APIRouter(tags=["websockets"])
 
 # --- FUNCIÓN DE ENVÍO PUSH ---
-def trigger_push_notifications(db: Session, title: str, body: str):
+def trigger_push_notifications(db: Session, title: str, body: str, org_id: int = None):
     """
-    Busca todos los dispositivos activos y les envía la alerta Push.
+    Busca todos los dispositivos activos (de la organización, si se indica) y les envía la alerta Push.
     """
-    devices = db.query(Device).filter(Device.is_active == True).all()
+    query = db.query(Device).filter(Device.is_active == True)
+    if org_id is not None:
+        query = query.join(Member).filter(Member.organization_id == org_id)
+    devices = query.all()
     
     # Leer credenciales del .env / Railway Variables
     private_key = os.getenv("VAPID_PRIVATE_KEY")
@@ -26,6 +36,14 @@ def trigger_push_notifications(db: Session, title: str, body: str):
 
     print(f"🚀 Iniciando envío Push a {len(devices)} dispositivos...")
 
+    # Payload serializado UNA vez para todos los dispositivos
+    payload = dumps({
+        "title": title, 
+        "body": body,
+        "icon": "/static/images/icon-192.png", # Asegúrate de tener este ícono
+        "url": "/dashboard"
+    })
+
     for dev in devices:
         try:
             webpush(
@@ -36,12 +54,7 @@ def trigger_push_notifications(db: Session, title: str, body: str):
                         "auth": dev.push_auth
                     }
                 },
-                data=json.dumps({
-                    "title": title, 
-                    "body": body,
-                    "icon": "/static/images/icon-192.png", # Asegúrate de tener este ícono
-                    "url": "/dashboard"
-                }),
+                data=payload,
                 vapid_private_key=private_key,
                 vapid_claims={"sub": email}
             )
@@ -56,10 +69,11 @@ def trigger_push_notifications(db: Session, title: str, body: str):
             print(f"❌ Error genérico Push: {e}")
 
 
-# NUEVA FUNCIÓN: Notificar solo a la Unidad Familiar + Seguridad
-def notify_family_and_security(db: Session, unit: str, title: str, body: str, exclude_user_id: int):
+# NUEVA FUNCIÓN: Notificar solo a la Unidad Familiar + Seguridad (de SU organización)
+def notify_family_and_security(db: Session, org_id: int, unit: str, title: str, body: str, exclude_user_id: int):
     # 1. Buscar familiares (Misma unidad, excluyendo al que envía)
     family_devices = db.query(Device).join(Member).filter(
+        Member.organization_id == org_id,
         Member.unit_info == unit,
         Member.id != exclude_user_id,
         Device.is_active == True
@@ -67,6 +81,7 @@ def notify_family_and_security(db: Session, unit: str, title: str, body: str, ex
     
     # 2. Buscar Seguridad (Staff/Admin)
     security_devices = db.query(Device).join(Member).filter(
+        Member.organization_id == org_id,
         Member.role.in_(["staff", "security", "admin"]),
         Device.is_active == True
     ).all()
@@ -80,6 +95,7 @@ def notify_family_and_security(db: Session, unit: str, title: str, body: str, ex
     
     if not targets or not private_key: return
 
+    payload = dumps({"title": title, "body": body, "url": "/dashboard"})
     for dev in targets:
         try:
             webpush(
@@ -87,44 +103,109 @@ def notify_family_and_security(db: Session, unit: str, title: str, body: str, ex
                     "endpoint": dev.push_endpoint,
                     "keys": {"p256dh": dev.push_p256dh, "auth": dev.push_auth}
                 },
-                data=json.dumps({"title": title, "body": body, "url": "/dashboard"}),
+                data=payload,
                 vapid_private_key=private_key,
                 vapid_claims={"sub": email}
             )
         except: pass
 
 
+# --- PÁNICO: PERSISTENCIA + PUSH (Corre en el carril de pánico, no en el event loop) ---
+def persist_and_push_panic(incident, title: str, body: str):
+    db = SessionLocal()
+    try:
+        coords = incident.coords or {}
+        log = PanicLog(
+            member_id=incident.member_id,
+            organization_id=incident.org_id,
+            lat=coords.get("lat"),
+            lon=coords.get("lon"),
+            address_ref=incident.location
+        )
+        db.add(log)
+        db.commit()
+        incident.panic_log_id = log.id
+
+        # Push solo a la organización del incidente (si se conoce)
+        trigger_push_notifications(db, title=title, body=body, org_id=incident.org_id)
+    finally:
+        db.close()
+
+
+# --- SESIONES CORTAS ---
+# El socket vive horas; la conexión a la BD solo lo que dura el mensaje que la necesita.
+def with_session(fn, *args, **kwargs):
+    db = SessionLocal()
+    try:
+        return fn(db, *args, **kwargs)
+    finally:
+        db.close()
+
+
+# --- IDENTIDAD DEL SOCKET (se valida UNA vez, en el handshake) ---
+def identify_socket(db: Session, member_id) -> Tuple[Optional[ConnectionInfo], Optional[int]]:
+    """ (ConnectionInfo, cupo de conexiones de la organización) o (None, None). """
+    member = db.query(Member).filter(Member.id == member_id, Member.is_active == True).first()
+    if member is None:
+        return None, None
+    info = ConnectionInfo(
+        member_id=member.id, org_id=member.organization_id, role=member.role,
+        label=(member.user.name if member.user else None) or "Vecino", unit=member.unit_info
+    )
+    org_config = (member.organization.config if member.organization else None) or {}
+    return info, org_config.get("ws_limit")
+
+
 # --- WEBSOCKET ENDPOINT ---
+# Sin Depends(get_db): una sesión por request duraría toda la vida del socket
 @router.websocket("/ws/alerta")
-async def websocket_endpoint(
-    websocket: WebSocket, 
-    db: Session = Depends(get_db)
-):
-    await manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket):
+    # Handshake autenticado: misma cookie/JWT que el resto de la app.
+    # Sin sesión válida no se acepta el socket (nada de anónimos).
+    member_id = decode_access_token(websocket.cookies.get("access_token"))
+    info, org_limit = await run_in_threadpool(with_session, identify_socket, member_id) if member_id else (None, None)
+    if info is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    if not await manager.admit(info, org_limit):
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER) # Cupo de la organización lleno
+        return
+
+    await manager.connect(websocket, info)
     try:
         while True:
             data = await websocket.receive_json()
+            info.last_seen = time.monotonic() # Cualquier mensaje cuenta como señal de vida
+            
+            # --- LATIDO: respuesta al PING del servidor ---
+            if data.get("type") == "PONG":
+                continue
             
             # --- CASO 1: LLEGADA ANTICIPADA (Botón Amarillo) ---
+            # Quién y dónde salen del socket, no del payload
             if data.get("type") == "PRE_ARRIVAL":
-                usuario = data.get("user", "Vecino")
-                unidad = data.get("unit", "")
-                user_id = data.get("user_id") 
+                usuario = info.label
+                unidad = info.unit or ""
+                user_id = info.member_id
 
-                # A. WebSocket (Para el Guardia - Visual Inmediato)
-                await manager.broadcast({
+                # A. WebSocket (Para el Guardia - Visual Inmediato) + familia de la unidad
+                message = {
                     "type": "PRE_ARRIVAL",
                     "user": usuario,
                     "user_id": user_id, 
                     "unit": unidad,
                     "msg": "Llegando en aprox. 5 min"
-                })
+                }
+                for connection, target in list(manager.connections_for(info.org_id)):
+                    if target.role in GUARD_ROLES or (unidad and target.unit == unidad):
+                        await manager.send_personal(connection, message)
 
                 # B. Push a Familiares (Secundario)
                 # Nota: Asegúrate de tener definida la función 'notify_family_and_security' arriba
                 try:
-                    notify_family_and_security(
-                        db, unit=unidad, 
+                    await run_in_threadpool(
+                        with_session, notify_family_and_security,
+                        org_id=info.org_id, unit=unidad, 
                         title="🟡 LLEGADA SEGURA", 
                         body=f"{usuario} está llegando a casa.",
                         exclude_user_id=user_id
@@ -134,34 +215,74 @@ async def websocket_endpoint(
 
             # --- CASO 2: PÁNICO (Botón Rojo) ---
             elif data.get("type") == "PANIC_BUTTON":
-                usuario = data.get("user", "Vecino")
+                usuario = f"{info.label} ({info.unit})" if info.unit else info.label
                 ubicacion = data.get("location", "")
+
+                incident, is_new = incident_engine.trigger(
+                    info.org_id, info.member_id, usuario,
+                    location=ubicacion, coords=data.get("coords")
+                )
+                if not is_new:
+                    # Toque repetido dentro de la ventana: la alarma ya está en curso
+                    await manager.send_personal(websocket, {
+                        "type": "PANIC_ACK",
+                        "incident_id": incident.id if incident else None,
+                        "duplicate": True
+                    })
+                    continue
                 
                 # 1. PRIORIDAD TOTAL: WebSocket (Pantalla Roja Inmediata)
-                # Enviamos esto ANTES de intentar el Push para evitar lag
-                await manager.broadcast({
+                # Carril prioritario: concurrente, guardias primero, solo su organización
+                # (también los sockets de los otros workers, vía bus de eventos)
+                await incident_engine.announce({
                     "type": "ALERTA_CRITICA",
+                    "incident_id": incident.id,
                     "user": usuario,
                     "msg": "¡ALERTA DE SEGURIDAD!",
-                    "coords": data.get("coords")
-                })
+                    "coords": data.get("coords"),
+                    "sent_at": data.get("sent_at") # Eco para medir latencia (benchmarks)
+                }, org_id=info.org_id)
+                await manager.send_personal(websocket, {"type": "PANIC_ACK", "incident_id": incident.id, "duplicate": False})
 
-                # 2. SECUNDARIO: Push Notification Global
-                try:
-                    trigger_push_notifications(
-                        db,
-                        title="🚨 ALERTA VECINAL 🚨",
-                        body=f"{usuario} ha activado el botón de pánico. {ubicacion}"
-                    )
-                except Exception as e:
-                    print(f"Error Push Pánico (No bloqueante): {e}")
+                # 2. SECUNDARIO: PanicLog + Push (hilos del carril de pánico, no bloquea)
+                incident_engine.run_in_lane(
+                    persist_and_push_panic, incident,
+                    "🚨 ALERTA VECINAL 🚨",
+                    f"{usuario} ha activado el botón de pánico. {ubicacion}"
+                )
+
+            # --- CASO 2B: GUARDIA CIERRA EL INCIDENTE ---
+            elif data.get("type") == "PANIC_RESOLVE":
+                # Cierre, fin del tracking y ALERTA_RESUELTA: en cada worker (panic.resolved)
+                if info.role in GUARD_ROLES:
+                    incident_engine.resolve(data.get("incident_id"), info.member_id, info.org_id)
 
             # --- CASO 3: ACTUALIZACIÓN GPS (Tracking) ---
+            # No se reenvía al instante: se guarda la última posición del incidente y
+            # el tracking_store la manda (coalescida) solo a los guardias de la organización.
             elif data.get("type") == "GPS_UPDATE":
-                await manager.broadcast({
-                    "type": "GPS_UPDATE",
-                    "coords": data.get("coords")
-                })
+                if info.member_id:
+                    active = incident_engine.active_for(info.org_id, info.member_id)
+                    # El id del cliente NO se usa: rotándolo se crearían rastros sin límite
+                    incident_id = active.id if active else f"m{info.member_id}"
+                    tracking_store.update(incident_id, info.org_id, info.member_id, data.get("coords"))
+
+            # --- CASO 4: GUARDIA ELIGE SU RITMO DE TRACKING ---
+            elif data.get("type") == "TRACK_SUBSCRIBE":
+                try:
+                    interval_ms = max(int(data.get("interval_ms")), TRACKING_MIN_INTERVAL_MS)
+                    info.track_interval = interval_ms / 1000
+                except (TypeError, ValueError):
+                    pass
                 
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
\ No newline at end of file
+        manager.disconnect(websocket)
+
+
+# --- MÉTRICAS DE CONEXIONES (para monitoreo) ---
+# curl -H "Authorization: Bearer $METRICS_TOKEN" https://.../metrics
+@router.get("/metrics")
+async def connection_metrics(authorization: str = Header(None)):
+    if not METRICS_TOKEN or authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=404)
+    return manager.snapshot()
\ No newline at end of file
@@ -0,0 +1,168 @@
+// Service Worker generado por el servidor (main.py -> /service-worker.js)
+// Uno por organización: la versión es el hash de lo precacheado, así que
+// un deploy que cambia un CSS/JS o la página offline crea un caché nuevo.
+
+const SW = {{ sw | tojson }};
+
+const SHELL = `${SW.slug}-shell-${SW.version}`; // Estáticos con hash + /offline
+const PAGES = `${SW.slug}-pages`;               // Última copia de cada página (network-first)
+const FRAGMENTS = `${SW.slug}-fragments`;       // Fragmentos HTMX (stale-while-revalidate)
+const RUNTIME = `${SW.slug}-runtime`;           // CDN (tailwind, htmx, iconos) y /static sin hash
+const KEEP = [SHELL, PAGES, FRAGMENTS, RUNTIME];
+const PRIVATE = [PAGES, FRAGMENTS];             // Datos del usuario: se borran al salir
+
+// --- INSTALACIÓN: precache del shell ---
+self.addEventListener('install', (event) => {
+  event.waitUntil(
+    caches.open(SHELL)
+      .then((cache) => cache.addAll([SW.offline_url, ...SW.precache]))
+      .then(() => self.skipWaiting())
+  );
+});
+
+// --- ACTIVACIÓN: borrar versiones anteriores (incluye 'ccpl-v1') ---
+self.addEventListener('activate', (event) => {
+  event.waitUntil(
+    caches.keys()
+      .then((names) => Promise.all(names.filter((n) => !KEEP.includes(n)).map((n) => caches.delete(n))))
+      .then(() => self.clients.claim())
+  );
+});
+
+function clearPrivate() {
+  return Promise.all(PRIVATE.map((n) => caches.delete(n)));
+}
+
+async function putIfOk(cacheName, request, response) {
+  if (response && response.ok && !response.redirected) {
+    const cache = await caches.open(cacheName);
+    await cache.put(request, response.clone());
+  }
+  return response;
+}
+
+// Páginas: siempre red primero; sin red -> última copia -> pantalla offline (pánico)
+async function networkFirstPage(request) {
+  try {
+    const response = await fetch(request);
+    if (response.redirected && new URL(response.url).pathname === '/login') {
+      await clearPrivate(); // Sesión vencida
+    }
+    return await putIfOk(PAGES, request, response);
+  } catch (e) {
+    return (await caches.match(request, { cacheName: PAGES }))
+      || (await caches.match(SW.offline_url, { cacheName: SHELL }));
+  }
+}
+
+// Fragmentos HTMX: responde al toque con lo guardado y revalida por detrás.
+// Si la página pide dato fresco (Cache-Control: no-cache, ver base.html),
+// va a la red y solo usa la copia si no hay conexión.
+async function fragment(event) {
+  const request = event.request;
+  const cached = await caches.match(request, { cacheName: FRAGMENTS });
+  const network = fetch(request).then((response) => putIfOk(FRAGMENTS, request, response));
+
+  if (request.headers.get('Cache-Control') === 'no-cache' || !cached) {
+    try {
+      return await network;
+    } catch (e) {
+      return cached || new Response('<div class="text-xs text-slate-500 p-4">Sin conexión</div>',
+        { headers: { 'Content-Type': 'text/html; charset=utf-8' } });
+    }
+  }
+  event.waitUntil(network.catch(() => {}));
+  return cached;
+}
+
+async function cacheFirst(request, cacheName) {
+  const cached = await caches.match(request);
+  return cached || putIfOk(cacheName, request, await fetch(request));
+}
+
+async function staleWhileRevalidate(event, cacheName) {
+  const cached = await caches.match(event.request, { cacheName });
+  const network = fetch(event.request).then((response) => {
+    // Respuestas opacas del CDN (no-cors) también sirven para <script>/<link>
+    if (response.ok || response.type === 'opaque') {
+      return caches.open(cacheName).then((cache) => cache.put(event.request, response.clone())).then(() => response);
+    }
+    return response;
+  });
+  if (cached) {
+    event.waitUntil(network.catch(() => {}));
+    return cached;
+  }
+  return network;
+}
+
+self.addEventListener('fetch', (event) => {
+  const request = event.request;
+  if (request.method !== 'GET') return; // POST/PUT: directo a la red
+
+  const url = new URL(request.url);
+  const sameOrigin = url.origin === self.location.origin;
+
+  if (sameOrigin) {
+    // Tiempo real y APIs: nunca desde caché
+    if (url.pathname.startsWith('/ws') || url.pathname.startsWith('/sse') || url.pathname.startsWith('/api/')) return;
+
+    if (request.mode === 'navigate') {
+      if (url.pathname === '/login') event.waitUntil(clearPrivate());
+      return event.respondWith(networkFirstPage(request));
+    }
+    if (request.headers.get('HX-Request') === 'true') return event.respondWith(fragment(event));
+    if (url.pathname.startsWith('/assets/')) return event.respondWith(cacheFirst(request, SHELL)); // Inmutables
+    if (url.pathname.startsWith('/static/')) return event.respondWith(staleWhileRevalidate(event, RUNTIME));
+    return;
+  }
+
+  if (['script', 'style', 'font'].includes(request.destination)) {
+    event.respondWith(staleWhileRevalidate(event, RUNTIME));
+  }
+});
+
+// --- PUSH (alertas de pánico, pagos, comunicados) ---
+self.addEventListener('push', (event) => {
+  let data = { title: 'Alerta', body: 'Nueva notificación', url: '/dashboard' };
+  if (event.data) {
+    data = event.data.json();
+  }
+
+  const options = {
+    body: data.body,
+    icon: data.icon || SW.icon,
+    badge: SW.icon, // Icono pequeño en barra de estado (Android)
+    vibrate: [1000, 500, 1000, 500, 1000], // Patrón de vibración agresivo (SOS)
+    data: { url: data.url },
+    tag: 'alerta-panico', // Agrupa notificaciones para no llenar la barra
+    renotify: true, // Vuelve a vibrar aunque ya haya una notificación ahí (CRÍTICO)
+    requireInteraction: true, // No desaparece sola, el usuario debe tocarla
+    actions: [
+      { action: 'open_url', title: '🔴 VER ALERTA' }
+    ]
+  };
+
+  event.waitUntil(self.registration.showNotification(data.title, options));
+});
+
+// Cuando el usuario toca la notificación
+self.addEventListener('notificationclick', (event) => {
+  event.notification.close();
+  const target = (event.notification.data && event.notification.data.url) || '/dashboard';
+
+  event.waitUntil(
+    clients.matchAll({ type: 'window', includeUncontrolled: true }).then((clientList) => {
+      // Si la app ya está abierta, ponle foco
+      for (const client of clientList) {
+        if (client.url.includes(target) && 'focus' in client) {
+          return client.focus();
+        }
+      }
+      // Si no, abre una ventana nueva
+      if (clients.openWindow) {
+        return clients.openWindow(target);
+      }
+    })
+  );
+});
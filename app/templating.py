@@ -0,0 +1,40 @@
+import os
+import time
+from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache
+from app.config import TEMPLATES_AUTO_RELOAD, TEMPLATE_CACHE_DIR
+from app.core.assets import asset_url
+
+# ==========================================================
+# ENTORNO JINJA ÚNICO
+# Todos los routers usan ESTE objeto: un solo caché de plantillas
+# compiladas, bytecode en disco (sobrevive reinicios del worker) y
+# sin revisar el mtime de cada archivo en producción.
+# ==========================================================
+
+templates = Jinja2Templates(directory="app/templates")
+templates.env.auto_reload = TEMPLATES_AUTO_RELOAD
+templates.env.cache_size = 1000 # Hay más plantillas que el default (400) entre sites/landing/pages
+templates.env.globals["asset_url"] = asset_url # URLs de estáticos con hash (app/core/assets.py)
+
+if TEMPLATE_CACHE_DIR:
+    try:
+        os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+        templates.env.bytecode_cache = FileSystemBytecodeCache(TEMPLATE_CACHE_DIR)
+    except OSError as e:
+        print(f"⚠️ Caché de bytecode Jinja desactivado: {e}")
+
+
+def precompile_templates():
+    """ Compila todas las plantillas por adelantado (se llama al arrancar, en un hilo). """
+    start = time.perf_counter()
+    count, errors = 0, 0
+    for name in templates.env.list_templates(extensions=["html"]):
+        try:
+            templates.env.get_template(name)
+            count += 1
+        except Exception as e:
+            errors += 1
+            print(f"⚠️ Plantilla con error: {name}: {e}")
+    print(f"✅ {count} plantillas precompiladas en {(time.perf_counter() - start) * 1000:.0f} ms ({errors} con error)")
+    return count
@@ -0,0 +1,124 @@
+# app/utils/access_buffer.py
+import asyncio
+from sqlalchemy import insert
+from starlette.concurrency import run_in_threadpool
+from app.database import SessionLocal
+from app.models import AccessLog
+from app.utils.ws_manager import manager
+from app.config import ACCESS_BUFFER_FLUSH_MS, ACCESS_BUFFER_MAX_ROWS, ACCESS_BUFFER_MAX_PENDING
+
+
+class BufferUnavailable(Exception):
+    pass
+
+
+class AccessLogBuffer:
+    """
+    Agrupa los INSERT de AccessLog en micro-lotes (cada N ms o N filas).
+    Quien llama espera hasta que SU lote hizo commit (ack durable) y recibe
+    (id, created_at). El aviso por WebSocket sale desde el lote ya guardado.
+    """
+    def __init__(self, flush_ms=ACCESS_BUFFER_FLUSH_MS, max_rows=ACCESS_BUFFER_MAX_ROWS,
+                 max_pending=ACCESS_BUFFER_MAX_PENDING):
+        self.flush_interval = flush_ms / 1000
+        self.max_rows = max_rows
+        self.max_pending = max_pending
+        self._pending = [] # [(valores, mensaje_ws, future)]
+        self._wakeup = None
+        self._task = None
+        self._closing = False
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done() and not self._closing
+
+    def start(self):
+        if self.running: return
+        self._closing = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Cierre ordenado: se vacía lo pendiente antes de salir
+        if not self.running: return
+        self._closing = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+
+    async def submit(self, values: dict, broadcast: dict = None):
+        if not self.running or len(self._pending) >= self.max_pending:
+            raise BufferUnavailable()
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((values, broadcast, future))
+        if len(self._pending) >= self.max_rows:
+            self._wakeup.set()
+        return await future
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self._flush()
+        await self._flush()
+
+    async def _flush(self):
+        while self._pending:
+            batch = self._pending[:self.max_rows]
+            self._pending = self._pending[self.max_rows:]
+
+            try:
+                rows = await run_in_threadpool(_insert_batch, [values for values, _, _ in batch])
+            except Exception as e:
+                print(f"⚠️ AccessLogBuffer: lote de {len(batch)} falló ({e}), cada llamada reintenta sola.")
+                for _, _, future in batch:
+                    if not future.done(): future.set_exception(e)
+                continue
+
+            for (_, _, future), row in zip(batch, rows):
+                if not future.done(): future.set_result(row)
+
+            # Avisos en tiempo real SOLO de lo que ya está en BD (y solo a su organización)
+            for values, broadcast, _ in batch:
+                if broadcast:
+                    await manager.broadcast(broadcast, org_id=values.get("organization_id"))
+
+
+def _insert_batch(values_list):
+    # Un solo INSERT multi-fila + un solo commit por lote
+    db = SessionLocal()
+    try:
+        stmt = insert(AccessLog).returning(AccessLog.id, AccessLog.created_at, sort_by_parameter_order=True)
+        rows = db.execute(stmt, values_list).all()
+        db.commit()
+        return rows
+    finally:
+        db.close()
+
+
+access_buffer = AccessLogBuffer()
+
+
+async def record_access(db, values: dict, broadcast: dict = None):
+    """
+    Registra un AccessLog y devuelve algo con .id y .created_at.
+    Ruta normal: micro-lote del buffer. Fallback: INSERT + commit directo con
+    la sesión del request (buffer apagado, saturado o lote fallido).
+    """
+    try:
+        return await access_buffer.submit(values, broadcast)
+    except BufferUnavailable:
+        pass
+    except Exception as e:
+        print(f"⚠️ AccessLogBuffer no disponible, commit directo: {e}")
+
+    new_log = AccessLog(**values)
+    db.add(new_log)
+    db.commit()
+    if broadcast:
+        await manager.broadcast(broadcast, org_id=values.get("organization_id"))
+    return new_log
@@ -0,0 +1,16 @@
+# app/utils/fastjson.py
+import orjson
+
+# ==========================================================
+# JSON rápido (orjson) para lo que se serializa en caliente:
+# mensajes en tiempo real, payloads Push y caché de tenants en Redis.
+# Se serializa UNA vez y el texto resultante se reutiliza.
+# ==========================================================
+
+def dumps(obj) -> str:
+    # default=str: Decimal, UUID, etc. (fechas ya las entiende orjson)
+    return orjson.dumps(obj, default=str).decode()
+
+
+def loads(data):
+    return orjson.loads(data)
@@ -0,0 +1,136 @@
+# app/utils/health_buffer.py
+import asyncio
+import time
+from datetime import datetime, timezone
+from sqlalchemy import update, bindparam
+from starlette.concurrency import run_in_threadpool
+from app.database import SessionLocal
+from app.models import Device
+from app.config import redis_client, HEALTH_FLUSH_MS, HEALTH_MIN_INTERVAL_SECONDS, HEALTH_MAX_PENDING
+
+
+class HealthReportBuffer:
+    """
+    Reportes de salud de la PWA (/api/health/report) -> UPDATE en lote.
+    - Un reporte por dispositivo cada HEALTH_MIN_INTERVAL_SECONDS (salvo que
+      cambie el permiso: un 'denied' nuevo se registra enseguida).
+    - Entre flushes solo vale el último reporte de cada dispositivo.
+    - Cada flush = un UPDATE por dispositivo en UNA transacción.
+    """
+    def __init__(self, flush_ms=HEALTH_FLUSH_MS, min_interval=HEALTH_MIN_INTERVAL_SECONDS,
+                 max_pending=HEALTH_MAX_PENDING):
+        self.flush_interval = flush_ms / 1000
+        self.min_interval = min_interval
+        self.max_pending = max_pending
+        self._pending = {} # (member_id, device_id) -> reporte
+        self._last = {} # (member_id, device_id) -> (monotonic, permiso)  [sin Redis]
+        self._task = None
+        self._closing = False
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done() and not self._closing
+
+    def start(self):
+        if self.running: return
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if not self.running: return
+        self._closing = True
+        await self._task
+        self._task = None
+
+    def allow(self, key, permission):
+        """ Límite por dispositivo. Redis si hay (compartido entre workers), si no memoria. """
+        if redis_client:
+            try:
+                rl_key = f"health:rl:{key[0]}:{key[1] or 'all'}"
+                if redis_client.set(rl_key, permission, nx=True, ex=self.min_interval):
+                    return True
+                if redis_client.get(rl_key) != permission:
+                    redis_client.setex(rl_key, self.min_interval, permission)
+                    return True
+                return False
+            except Exception:
+                pass
+
+        now = time.monotonic()
+        last = self._last.get(key)
+        if last and now - last[0] < self.min_interval and last[1] == permission:
+            return False
+        self._last[key] = (now, permission)
+        return True
+
+    def submit(self, key, report):
+        """ False si el buffer está apagado o lleno (quien llama escribe directo). """
+        if not self.running or (key not in self._pending and len(self._pending) >= self.max_pending):
+            return False
+        self._pending[key] = report
+        return True
+
+    async def _run(self):
+        while not self._closing:
+            await asyncio.sleep(self.flush_interval)
+            await self._flush()
+            self._prune()
+        await self._flush()
+
+    def _prune(self):
+        cutoff = time.monotonic() - self.min_interval
+        self._last = {k: v for k, v in self._last.items() if v[0] >= cutoff}
+
+    async def _flush(self):
+        if not self._pending: return
+        reports, self._pending = self._pending, {}
+        try:
+            await run_in_threadpool(write_reports, reports)
+        except Exception as e:
+            print(f"⚠️ HealthReportBuffer: lote de {len(reports)} reportes falló: {e}")
+
+
+def write_reports(reports):
+    # executemany: un UPDATE preparado, N juegos de parámetros, un commit
+    by_device, by_member = [], []
+    for (member_id, device_id), report in reports.items():
+        params = dict(b_member=member_id, b_device=device_id, **{f"b_{k}": v for k, v in report.items()})
+        (by_device if device_id else by_member).append(params)
+
+    # Los bindparam no pueden llamarse como las columnas del SET: prefijo b_
+    values = dict(permission_status=bindparam("b_permission"), is_active=bindparam("b_is_active"),
+                  last_seen=bindparam("b_seen_at"))
+    db = SessionLocal()
+    try:
+        if by_device:
+            # member_id en el WHERE: un device_id ajeno no toca nada
+            db.execute(update(Device.__table__)
+                       .where(Device.id == bindparam("b_device"), Device.member_id == bindparam("b_member"))
+                       .values(is_pwa=bindparam("b_is_pwa"), **values), by_device)
+        if by_member:
+            # Cliente viejo sin device_id: todos los dispositivos del vecino (como antes)
+            db.execute(update(Device.__table__).where(Device.member_id == bindparam("b_member"))
+                       .values(**values), by_member)
+        db.commit()
+    finally:
+        db.close()
+
+
+health_buffer = HealthReportBuffer()
+
+
+async def record_health(member_id, device_id, permission, is_pwa):
+    """ True si se aceptó, False si llegó antes del intervalo mínimo. """
+    key = (member_id, device_id)
+    if not health_buffer.allow(key, permission):
+        return False
+
+    report = {
+        "permission": permission,
+        "is_active": permission == "granted",
+        "is_pwa": is_pwa,
+        "seen_at": datetime.now(timezone.utc)
+    }
+    if not health_buffer.submit(key, report):
+        await run_in_threadpool(write_reports, {key: report})
+    return True
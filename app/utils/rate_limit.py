@@ -0,0 +1,148 @@
+# app/utils/rate_limit.py
+import math
+import time
+from fastapi import Request
+from fastapi.responses import HTMLResponse, JSONResponse
+from app.config import redis_client, RATE_LIMITS, RATE_LIMIT_TRUST_PROXY, RATE_LIMIT_PROXY_HOPS, RATE_LIMIT_MAX_KEYS
+
+# ==========================================================
+# LÍMITE DE PETICIONES (balde de fichas)
+# Cada balde tiene N fichas y se rellena a N por ventana; cada petición
+# gasta una. Dos baldes por clase de ruta: por IP y por organización
+# (según Organization.config["plan"]). Con Redis el balde vive allí y se
+# actualiza con un script Lua (atómico, un viaje de red); si no, en memoria.
+# ==========================================================
+
+# (método, prefijo de ruta, clase). Lo que no está aquí no se limita.
+ROUTE_CLASSES = (
+    ("POST", "/auth/login", "auth"),
+    ("POST", "/api/brain/process-command", "llm"),
+    ("GET", "/api/brain/briefing", "llm"),
+    ("POST", "/finance/payment/analyze-voucher", "llm"),
+    ("GET", "/directory/", "public"),
+    ("GET", "/cpc/", "public"),
+)
+
+TOKEN_BUCKET_LUA = """
+local cap = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 't', 'ts')
+local tokens = tonumber(bucket[1]) or cap
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(cap, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+else
+  wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 't', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(cap / rate * 1000) + 1000)
+return {allowed, tostring(wait)}
+"""
+
+
+def parse_budget(spec):
+    """ "10/60" -> (capacidad 10, 10/60 fichas por segundo). """
+    count, seconds = spec.split("/")
+    return float(count), float(count) / float(seconds)
+
+
+def route_class(request: Request):
+    path = request.url.path
+    for method, prefix, name in ROUTE_CLASSES:
+        if request.method == method and path.startswith(prefix):
+            return name
+    return None
+
+
+def client_ip(request: Request):
+    # Detrás del proxy (Railway) la IP real es la que agregó NUESTRO proxy:
+    # la de más a la derecha (una por salto). Lo de la izquierda lo escribe
+    # el cliente y se puede inventar (rotarlo saltaría el límite).
+    if RATE_LIMIT_TRUST_PROXY:
+        hops = [h.strip() for h in request.headers.get("x-forwarded-for", "").split(",") if h.strip()]
+        if hops:
+            return hops[-min(RATE_LIMIT_PROXY_HOPS, len(hops))]
+    return request.client.host if request.client else "?"
+
+
+class RateLimiter:
+    def __init__(self, limits=RATE_LIMITS, max_keys=RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = {} # clave -> [fichas, último monotonic]  [sin Redis]
+        self._script = redis_client.register_script(TOKEN_BUCKET_LUA) if redis_client else None
+        # Los presupuestos se parsean una vez: rechazar debe ser barato
+        self.limits = {}
+        for name, scopes in limits.items():
+            self.limits[name] = {
+                "ip": parse_budget(scopes["ip"]) if scopes.get("ip") else None,
+                "org": {plan: parse_budget(spec) for plan, spec in scopes.get("org", {}).items()}
+            }
+
+    def hit(self, key, capacity, rate):
+        """ (permitido, segundos hasta la próxima ficha) """
+        if self._script:
+            try:
+                allowed, wait = self._script(keys=[f"rl:{key}"], args=[capacity, rate, time.time()])
+                return bool(int(allowed)), float(wait)
+            except Exception:
+                pass
+
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._prune(now)
+            bucket = self._buckets[key] = [capacity, now]
+        tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return True, 0.0
+        bucket[0] = tokens
+        return False, (1 - tokens) / rate
+
+    def _prune(self, now):
+        # Fuera los baldes que ya se habrían llenado solos (IPs que no volvieron)
+        idle = [k for k, (_, ts) in self._buckets.items() if now - ts > 3600]
+        for key in idle or list(self._buckets)[:len(self._buckets) // 2]:
+            self._buckets.pop(key, None)
+
+    def check(self, request: Request):
+        """ None si pasa; si no, la respuesta 429 (sin tocar BD ni plantillas). """
+        name = route_class(request)
+        limits = self.limits.get(name)
+        if not limits:
+            return None
+
+        if limits["ip"]:
+            allowed, wait = self.hit(f"{name}:ip:{client_ip(request)}", *limits["ip"])
+            if not allowed:
+                return too_many_requests(request, wait)
+
+        org = getattr(request.state, "org", None)
+        if org and limits["org"]:
+            plan = (org.get("config") or {}).get("plan", "default")
+            budget = limits["org"].get(plan) or limits["org"].get("default")
+            if budget:
+                allowed, wait = self.hit(f"{name}:org:{org['id']}", *budget)
+                if not allowed:
+                    return too_many_requests(request, wait)
+        return None
+
+
+def too_many_requests(request: Request, wait):
+    headers = {"Retry-After": str(max(1, math.ceil(wait)))}
+    if request.headers.get("HX-Request"):
+        return HTMLResponse(
+            '<div class="p-3 text-sm text-yellow-200 bg-yellow-900/50 rounded text-center">Demasiados intentos. Espere un momento.</div>',
+            status_code=429, headers=headers
+        )
+    return JSONResponse({"detail": "Demasiadas peticiones"}, status_code=429, headers=headers)
+
+
+rate_limiter = RateLimiter()
@@ -1,14 +1,25 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import jwt
 from passlib.context import CryptContext
 from app.config import SECRET_KEY # Asegúrate de tener esto en config.py
+from app.config import ARGON2_TIME_COST, ARGON2_MEMORY_COST_KB, ARGON2_PARALLELISM, PASSWORD_WORKERS, PASSWORD_MAX_QUEUE
 
 # Configuración
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 30 # 30 días (Sesión larga para PWA)
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+# Parámetros argon2 desde config: si cambian, los hashes viejos se siguen
+# aceptando y se rehacen en el siguiente login (verify_and_update)
+pwd_context = CryptContext(
+    schemes=["argon2"], deprecated="auto",
+    argon2__time_cost=ARGON2_TIME_COST,
+    argon2__memory_cost=ARGON2_MEMORY_COST_KB,
+    argon2__parallelism=ARGON2_PARALLELISM
+)
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -16,6 +27,46 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+
+# ==========================================================
+# ARGON2 FUERA DEL EVENT LOOP
+# Cada verificación son decenas de ms de CPU (y 64 MB de RAM). En el loop,
+# una ola de logins congela los WebSockets: el pánico espera su turno.
+# Pool propio y acotado (argon2-cffi suelta el GIL): a lo sumo
+# PASSWORD_WORKERS hashes a la vez y PASSWORD_MAX_QUEUE esperando;
+# el resto recibe PasswordBusy (reintentar) en vez de hacer cola infinita.
+# ==========================================================
+
+class PasswordBusy(Exception):
+    """ Demasiados logins esperando: responder 503 y que el cliente reintente. """
+
+
+_password_pool = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix="argon2")
+_password_slots = threading.BoundedSemaphore(PASSWORD_WORKERS + PASSWORD_MAX_QUEUE)
+
+
+async def _run_password_job(fn, *args):
+    if not _password_slots.acquire(blocking=False):
+        raise PasswordBusy()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_password_pool, fn, *args)
+    finally:
+        _password_slots.release()
+
+
+async def verify_password_async(plain_password, hashed_password):
+    """
+    (válida, hash_nuevo). hash_nuevo != None si el hash guardado usa parámetros
+    viejos: quien llama lo guarda (rehash transparente).
+    """
+    if not hashed_password:
+        return False, None
+    try:
+        return await _run_password_job(pwd_context.verify_and_update, plain_password, hashed_password)
+    except ValueError:
+        return False, None # Hash corrupto o de otro esquema
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
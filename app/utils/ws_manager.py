@@ -1,27 +1,294 @@
 # app/utils/ws_manager.py
+import asyncio
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
 from fastapi import WebSocket
-from typing import List
+from typing import Dict, List, Optional, Set
+from app.utils.fastjson import dumps
+from app.config import (TRACKING_VIEWER_INTERVAL_MS, PANIC_SEND_TIMEOUT_MS,
+                        SSE_REPLAY_SIZE, SSE_REPLAY_TTL_SECONDS, SSE_QUEUE_SIZE,
+                        WS_PING_INTERVAL_SECONDS, WS_IDLE_TIMEOUT_SECONDS,
+                        WS_MAX_PER_ORG, WS_MAX_PER_MEMBER)
+
+GUARD_ROLES = ("staff", "security", "admin")
+
+@dataclass
+class ConnectionInfo:
+    # Identidad del socket: la fija el servidor en el handshake (cookie), nunca el payload
+    member_id: Optional[int] = None
+    org_id: Optional[int] = None
+    role: Optional[str] = None
+    label: str = "Vecino" # Nombre para mostrar en alertas
+    unit: Optional[str] = None
+
+    # Salud de la conexión (heartbeat)
+    connected_at: float = field(default_factory=time.monotonic)
+    last_seen: float = field(default_factory=time.monotonic) # Último mensaje/PONG recibido
+
+    # Tracking GPS: cada visor recibe a su propio ritmo (coalescido)
+    track_interval: float = TRACKING_VIEWER_INTERVAL_MS / 1000
+    track_last_sent: float = 0.0
+    track_seen: Dict[str, int] = field(default_factory=dict) # incidente -> versión ya enviada
+
+class SSEClient:
+    """
+    Suscriptor SSE (solo lectura). Se registra en el manager igual que un
+    WebSocket: los mensajes caen en una cola que vacía /sse/events.
+    """
+    def __init__(self, types=None):
+        self.queue = asyncio.Queue(maxsize=SSE_QUEUE_SIZE)
+        self.types = set(types) if types else None # Filtro por tipo de evento (opcional)
+        self.closed = False
+
+    async def accept(self):
+        pass
+
+    async def send_frame(self, frame: str, event_id: str = None, message: dict = None):
+        if self.closed:
+            raise RuntimeError("SSE cerrado")
+        if self.types and message is not None and message.get("type") not in self.types:
+            return
+        # Cola llena = cliente que no lee: QueueFull -> el manager lo desconecta
+        self.queue.put_nowait((event_id, frame))
+
+    async def send_json(self, message: dict, event_id: str = None):
+        await self.send_frame(dumps(message), event_id, message)
+
+    def close(self):
+        self.closed = True
+
+
+class ReplayBuffer:
+    """
+    Últimos eventos enviados (con su alcance) para que un cliente SSE que
+    reconecta con Last-Event-ID reciba lo que se perdió. Los ids llevan el
+    arranque del proceso: un id de otro worker/arranque no se puede reanudar.
+    """
+    def __init__(self, size=SSE_REPLAY_SIZE, ttl=SSE_REPLAY_TTL_SECONDS):
+        self.boot = uuid.uuid4().hex[:6]
+        self.ttl = ttl
+        self.seq = 0
+        self.entries = deque(maxlen=size) # (seq, monotonic, org_id, audiencia, roles, mensaje)
+
+    def record(self, message: dict, org_id: int = None, audience=None, roles=None) -> str:
+        self.seq += 1
+        self.entries.append((self.seq, time.monotonic(), org_id, audience, roles, message))
+        return f"{self.boot}-{self.seq}"
+
+    def since(self, last_event_id: str, info: "ConnectionInfo"):
+        """ [(event_id, mensaje)] posteriores a last_event_id visibles para info; None si hay hueco. """
+        boot, _, seq = (last_event_id or "").partition("-")
+        if boot != self.boot or not seq.isdigit():
+            return None
+        seq = int(seq)
+        now = time.monotonic()
+        if self.entries and seq < self.entries[0][0] - 1:
+            return None # Se perdieron eventos que ya salieron del buffer
+
+        missed = []
+        for entry_seq, ts, org_id, audience, roles, message in self.entries:
+            if entry_seq <= seq or now - ts > self.ttl: continue
+            if org_id is not None and org_id != info.org_id: continue
+            if audience is not None and info.member_id not in audience: continue
+            if roles and info.role not in roles: continue
+            missed.append((f"{self.boot}-{entry_seq}", message))
+        return missed
+
 
 class ConnectionManager:
     def __init__(self):
         # Aquí guardamos a todos los vecinos conectados
         self.active_connections: List[WebSocket] = []
+        self.info: Dict[WebSocket, ConnectionInfo] = {}
+        # Índices para envíos dirigidos sin recorrer a todos
+        self.by_org: Dict[int, Set[WebSocket]] = {}
+        self.by_member: Dict[int, Set[WebSocket]] = {}
+        self.replay = ReplayBuffer()
+        self.counters = {"accepted": 0, "rejected": 0, "evicted": 0, "reaped": 0}
 
-    async def connect(self, websocket: WebSocket):
+    # --- CUPOS ---
+    async def admit(self, info: ConnectionInfo, org_limit: int = None) -> bool:
+        """
+        ¿Entra una conexión más? Sobre el cupo del vecino se cierra SU conexión
+        más vieja (típico: celular que reconectó y dejó la anterior colgada).
+        Sobre el cupo de la organización se rechaza la nueva.
+        """
+        if len(self.by_org.get(info.org_id, ())) >= (org_limit or WS_MAX_PER_ORG):
+            self.counters["rejected"] += 1
+            return False
+
+        mine = sorted(self.by_member.get(info.member_id, ()), key=lambda ws: self.info[ws].connected_at)
+        for oldest in mine[:max(0, len(mine) - WS_MAX_PER_MEMBER + 1)]:
+            self.counters["evicted"] += 1
+            await self.close(oldest, code=4000)
+        return True
+
+    async def close(self, websocket, code: int = 1001):
+        self.disconnect(websocket)
+        if not isinstance(websocket, SSEClient):
+            try:
+                await asyncio.wait_for(websocket.close(code=code), 1)
+            except:
+                pass
+
+    def touch(self, websocket):
+        info = self.info.get(websocket)
+        if info:
+            info.last_seen = time.monotonic()
+
+    async def connect(self, websocket: WebSocket, info: ConnectionInfo = None):
         await websocket.accept()
+        info = info or ConnectionInfo()
+        self.counters["accepted"] += 1
         self.active_connections.append(websocket)
+        self.info[websocket] = info
+        if info.org_id is not None:
+            self.by_org.setdefault(info.org_id, set()).add(websocket)
+        if info.member_id is not None:
+            self.by_member.setdefault(info.member_id, set()).add(websocket)
 
     def disconnect(self, websocket: WebSocket):
         if websocket in self.active_connections:
             self.active_connections.remove(websocket)
+        info = self.info.pop(websocket, None)
+        if info:
+            for index, key in ((self.by_org, info.org_id), (self.by_member, info.member_id)):
+                sockets = index.get(key)
+                if sockets is not None:
+                    sockets.discard(websocket)
+                    if not sockets:
+                        index.pop(key, None)
+        if isinstance(websocket, SSEClient):
+            websocket.close()
+
+    def connections_for(self, org_id: int, roles=None):
+        # Sockets de una organización (opcional: solo ciertos roles)
+        for connection in list(self.by_org.get(org_id, ())):
+            info = self.info.get(connection)
+            if info is None: continue
+            if roles and info.role not in roles: continue
+            yield connection, info
+
+    @staticmethod
+    async def _send(connection, frame: str, event_id: str = None, message: dict = None):
+        # 'frame' ya viene serializado: el mismo texto para todos los destinatarios.
+        # Los clientes SSE reciben además el id del evento (para Last-Event-ID)
+        if isinstance(connection, SSEClient):
+            await connection.send_frame(frame, event_id, message)
+        else:
+            await connection.send_text(frame)
+
+    async def send_to_audience(self, org_id: int, audience, message: dict):
+        # Solo los sockets identificados cuyo member_id está en la audiencia (bitmap)
+        event_id = self.replay.record(message, org_id, audience)
+        frame = dumps(message)
+        for connection, info in list(self.connections_for(org_id)):
+            if info.member_id in audience:
+                await self.send_personal(connection, message, event_id, frame)
 
-    async def broadcast(self, message: dict):
-        # Enviar el mensaje a TODOS los conectados
-        for connection in self.active_connections:
+    async def send_personal(self, websocket: WebSocket, message: dict, event_id: str = None, frame: str = None):
+        try:
+            await self._send(websocket, frame or dumps(message), event_id, message)
+            return True
+        except:
+            self.disconnect(websocket)
+            return False
+
+    async def send_to_member(self, member_id: int, message: dict):
+        # Todos los dispositivos conectados de UN vecino (celular + PC)
+        event_id = self.replay.record(message, audience={member_id})
+        frame = dumps(message)
+        for connection in list(self.by_member.get(member_id, ())):
+            await self.send_personal(connection, message, event_id, frame)
+
+    async def broadcast(self, message: dict, org_id: int = None, roles=None):
+        # Sin org_id: a TODOS los conectados. Con org_id: solo esa organización (y roles)
+        event_id = self.replay.record(message, org_id, roles=roles)
+        frame = dumps(message) # Una sola serialización para N destinatarios
+        if org_id is None:
+            targets = list(self.active_connections)
+        else:
+            targets = [connection for connection, _ in self.connections_for(org_id, roles)]
+        for connection in targets:
             try:
-                await connection.send_json(message)
+                await self._send(connection, frame, event_id, message)
             except:
                 # Si falla (se desconectó), lo sacamos de la lista
                 self.disconnect(connection)
 
-manager = ConnectionManager()
\ No newline at end of file
+    async def broadcast_priority(self, message: dict, org_id: int = None):
+        """
+        Carril prioritario (pánico): envío concurrente con timeout por socket,
+        guardias primero. Un celular lento no retrasa a los demás.
+        """
+        if org_id is None:
+            targets = list(self.info.items()) # Origen anónimo: comportamiento anterior (todos)
+        else:
+            targets = list(self.connections_for(org_id))
+
+        event_id = self.replay.record(message, org_id)
+        frame = dumps(message)
+
+        async def send(websocket):
+            try:
+                await asyncio.wait_for(self._send(websocket, frame, event_id, message), PANIC_SEND_TIMEOUT_MS / 1000)
+            except:
+                self.disconnect(websocket)
+
+        guards = [ws for ws, info in targets if info.role in GUARD_ROLES]
+        others = [ws for ws, info in targets if info.role not in GUARD_ROLES]
+        await asyncio.gather(*(send(ws) for ws in guards))
+        await asyncio.gather(*(send(ws) for ws in others))
+
+    # --- HEARTBEAT ---
+    async def heartbeat(self):
+        """
+        Cada WS_PING_INTERVAL_SECONDS: PING a cada WebSocket y cierre de los
+        que no respondieron nada en WS_IDLE_TIMEOUT_SECONDS (semiabiertos).
+        Los SSE se vigilan solos (keepalive + desconexión del request).
+        """
+        while True:
+            await asyncio.sleep(WS_PING_INTERVAL_SECONDS)
+            try:
+                now = time.monotonic()
+                stale, alive = [], []
+                for websocket, info in list(self.info.items()):
+                    if isinstance(websocket, SSEClient): continue
+                    (stale if now - info.last_seen > WS_IDLE_TIMEOUT_SECONDS else alive).append(websocket)
+
+                for websocket in stale:
+                    self.counters["reaped"] += 1
+                    await self.close(websocket, code=1001)
+
+                ping = dumps({"type": "PING"})
+                async def send(websocket):
+                    try:
+                        await asyncio.wait_for(websocket.send_text(ping), PANIC_SEND_TIMEOUT_MS / 1000)
+                    except:
+                        self.disconnect(websocket)
+                await asyncio.gather(*(send(ws) for ws in alive))
+            except Exception as e:
+                print(f"❌ Error heartbeat WS: {e}")
+
+    # --- MÉTRICAS ---
+    def snapshot(self):
+        orgs = {}
+        now = time.monotonic()
+        for websocket, info in list(self.info.items()):
+            org = orgs.setdefault(str(info.org_id), {"total": 0, "sse": 0, "roles": {}, "oldest_seconds": 0})
+            org["total"] += 1
+            if isinstance(websocket, SSEClient):
+                org["sse"] += 1
+            org["roles"][info.role or "?"] = org["roles"].get(info.role or "?", 0) + 1
+            org["oldest_seconds"] = max(org["oldest_seconds"], int(now - info.connected_at))
+        return {
+            "connections": len(self.info),
+            "organizations": orgs,
+            "counters": dict(self.counters),
+            "limits": {"per_org": WS_MAX_PER_ORG, "per_member": WS_MAX_PER_MEMBER,
+                       "ping_seconds": WS_PING_INTERVAL_SECONDS, "idle_seconds": WS_IDLE_TIMEOUT_SECONDS}
+        }
+
+manager = ConnectionManager()
@@ -0,0 +1,77 @@
+"""
+Benchmark: inserts/seg de AccessLog con commit por evento vs micro-lotes.
+
+Uso:
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_access_buffer --events 2000
+    DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.bench_access_buffer
+
+En sqlite las tablas se crean solas; en Postgres usa una BD de pruebas.
+"""
+import argparse
+import asyncio
+import time
+
+from app.database import Base, engine, SessionLocal
+from app.models import AccessLog
+from app.utils.access_buffer import AccessLogBuffer
+
+
+def sample_event(i):
+    return dict(organization_id=None, member_id=None, direction="IN", method="BENCH",
+                target_unit=f"Dpto {i % 300}", visitor_name=f"[VISITA] Bench {i}")
+
+
+async def run_unbatched(events, concurrency):
+    # Comportamiento anterior: 1 INSERT + 1 COMMIT por evento
+    def insert_one(i):
+        db = SessionLocal()
+        try:
+            db.add(AccessLog(**sample_event(i)))
+            db.commit()
+        finally:
+            db.close()
+
+    sem = asyncio.Semaphore(concurrency)
+    async def worker(i):
+        async with sem:
+            await asyncio.to_thread(insert_one, i)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(events)))
+    return time.perf_counter() - start
+
+
+async def run_batched(events, flush_ms, max_rows):
+    buffer = AccessLogBuffer(flush_ms=flush_ms, max_rows=max_rows, max_pending=events + 1)
+    buffer.start()
+    start = time.perf_counter()
+    await asyncio.gather(*(buffer.submit(sample_event(i)) for i in range(events)))
+    elapsed = time.perf_counter() - start
+    await buffer.stop()
+    return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20, help="Requests simultáneos sin buffer")
+    parser.add_argument("--flush-ms", type=int, default=50)
+    parser.add_argument("--max-rows", type=int, default=200)
+    args = parser.parse_args()
+
+    if engine.dialect.name == "sqlite":
+        Base.metadata.create_all(engine, tables=[AccessLog.__table__])
+
+    unbatched = await run_unbatched(args.events, args.concurrency)
+    batched = await run_batched(args.events, args.flush_ms, args.max_rows)
+
+    print(f"Eventos: {args.events} ({engine.dialect.name})")
+    print(f"  Commit por evento : {args.events / unbatched:10.0f} inserts/s  ({unbatched:.2f}s)")
+    print(f"  Micro-lotes       : {args.events / batched:10.0f} inserts/s  ({batched:.2f}s)")
+
+    with engine.begin() as conn:
+        conn.execute(AccessLog.__table__.delete().where(AccessLog.method == "BENCH"))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+"""
+Microbenchmark: CPU de un broadcast a N destinatarios.
+
+Compara el envío anterior (send_json = json.dumps por CADA socket, como hace
+Starlette) contra manager.broadcast actual (orjson una vez + send_text con el
+mismo texto). Los sockets son falsos: se mide solo la serialización y el
+recorrido del manager, no la red.
+
+Uso:
+    python -m benchmarks.bench_broadcast_encoding --recipients 10000 --rounds 20
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from app.utils.ws_manager import ConnectionManager, ConnectionInfo
+
+
+class FakeSocket:
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        pass
+
+    async def send_json(self, data, mode="text"):
+        # Igual que starlette.websockets.WebSocket.send_json
+        await self.send_text(json.dumps(data, separators=(",", ":"), ensure_ascii=False))
+
+
+MESSAGE = {
+    "type": "BULLETIN",
+    "bulletin_id": 123,
+    "title": "Corte de agua programado",
+    "body": "Mañana de 9:00 a 13:00 no habrá agua en las Torres A y B por mantenimiento de la cisterna. " * 3,
+    "priority": "warning",
+    "org_id": 1
+}
+
+
+async def per_recipient(sockets):
+    # Comportamiento anterior: una serialización por socket
+    for ws in sockets:
+        await ws.send_json(MESSAGE)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--recipients", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    manager = ConnectionManager()
+    sockets = [FakeSocket() for _ in range(args.recipients)]
+    for i, ws in enumerate(sockets):
+        await manager.connect(ws, ConnectionInfo(member_id=i + 1, org_id=1, role="user"))
+
+    results = {}
+    for name, run in (("json.dumps por destinatario", lambda: per_recipient(sockets)),
+                      ("orjson una vez (manager.broadcast)", lambda: manager.broadcast(MESSAGE, org_id=1))):
+        await run() # calentamiento
+        start = time.process_time()
+        for _ in range(args.rounds):
+            await run()
+        results[name] = (time.process_time() - start) / args.rounds * 1000
+
+    print(f"Broadcast a {args.recipients} destinatarios ({len(json.dumps(MESSAGE))} bytes), {args.rounds} rondas:")
+    for name, ms in results.items():
+        print(f"  {name:<36} {ms:8.1f} ms CPU por broadcast")
+    before, after = results.values()
+    print(f"  Ahorro: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+"""
+Prueba de carga: sockets ociosos vs. pool de conexiones de la BD.
+
+Levanta la app EN ESTE PROCESO (uvicorn) para poder leer el pool del engine,
+abre N WebSockets ociosos a /ws/alerta y mide:
+  - conexiones del pool en uso con todos los sockets abiertos
+  - latencia de un request HTTP que sí usa la BD (no debe esperar al pool)
+
+Antes (Depends(get_db) en el socket) cada socket retenía una conexión: con el
+pool por defecto (5 + 10 overflow) el socket 16 se quedaba esperando y los
+requests normales caían por timeout del pool.
+
+Todos los sockets son del MISMO vecino (--member-id): para esta corrida se
+suben WS_MAX_PER_MEMBER y WS_MAX_PER_ORG (si no, sobre 5 el servidor cierra
+los más viejos con 4000). Los vivos se cuentan en el ConnectionManager, no
+por las aperturas; los clientes contestan PING con PONG como el navegador.
+
+Uso:
+    python -m benchmarks.bench_idle_sockets --sockets 2000 --member-id 1
+(necesita ulimit -n por encima de 2 x sockets; el socket exige sesión, se
+firma un token para --member-id, que debe existir y estar activo)
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import uvicorn
+import websockets
+
+# Antes de importar la app (los cupos se leen al importar app.config)
+os.environ.setdefault("WS_MAX_PER_MEMBER", "1000000")
+os.environ.setdefault("WS_MAX_PER_ORG", "1000000")
+
+from app.main import app
+from app.utils.ws_manager import manager
+from app.database import engine
+from app.utils.security import create_access_token
+
+
+async def idle_client(url, cookie, opened, stop):
+    async with websockets.connect(url, open_timeout=60, additional_headers={"Cookie": cookie}) as ws:
+        opened.append(ws)
+        while not stop.is_set():
+            try:
+                data = json.loads(await asyncio.wait_for(ws.recv(), timeout=1))
+            except asyncio.TimeoutError:
+                continue
+            if data.get("type") == "PING":
+                await ws.send(json.dumps({"type": "PONG"}))
+
+
+async def timed_db_request(port):
+    # /dashboard sin cookie: pasa por el middleware de organización (BD) y redirige
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    start = time.perf_counter()
+    writer.write(b"GET /dashboard HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n")
+    await writer.drain()
+    status = (await reader.readline()).decode().strip()
+    await reader.read()
+    writer.close()
+    return status, (time.perf_counter() - start) * 1000
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sockets", type=int, default=2000)
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--batch", type=int, default=200) # Aperturas simultáneas
+    parser.add_argument("--member-id", type=int, default=1)
+    args = parser.parse_args()
+    cookie = f'access_token="Bearer {create_access_token({"sub": str(args.member_id)})}"'
+
+    server = uvicorn.Server(uvicorn.Config(app, port=args.port, log_level="warning",
+                                           ws_max_queue=1, backlog=4096))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    url = f"ws://127.0.0.1:{args.port}/ws/alerta"
+    stop = asyncio.Event()
+    opened, tasks = [], []
+
+    start = time.perf_counter()
+    for i in range(0, args.sockets, args.batch):
+        tasks += [asyncio.create_task(idle_client(url, cookie, opened, stop))
+                  for _ in range(min(args.batch, args.sockets - i))]
+        while len(opened) < len(tasks) and not any(t.done() for t in tasks):
+            await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - start
+
+    failed = [t for t in tasks if t.done() and t.exception()]
+    stats = manager.snapshot()
+    print(f"Sockets abiertos: {len(opened)}/{args.sockets} en {elapsed:.1f} s ({len(failed)} fallidos)")
+    print(f"Vivos en el servidor: {stats['connections']} | contadores {stats['counters']} | límites {stats['limits']}")
+    print(f"Pool BD con todos abiertos: {engine.pool.status()}")
+
+    for _ in range(3):
+        status, ms = await timed_db_request(args.port)
+        print(f"  Request con BD: {status} en {ms:.1f} ms")
+
+    stop.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    server.should_exit = True
+    await server_task
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
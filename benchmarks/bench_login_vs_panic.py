@@ -0,0 +1,91 @@
+"""
+Benchmark: ola de logins vs. latencia de la alarma de pánico (en este proceso).
+
+Mientras L logins verifican argon2 al mismo tiempo, una "alarma" se dispara
+cada --panic-ms y se mide cuánto tarda el loop en atenderla (lo mismo que
+espera un ALERTA_CRITICA que llega por /ws/alerta). Modos:
+  reposo   sin logins (piso del loop)
+  antes    verify_password() dentro del handler async (bloquea el loop)
+  ahora    verify_password_async() (pool acotado de app/utils/security.py)
+
+Los parámetros argon2 salen de config (ARGON2_*, PASSWORD_WORKERS,
+PASSWORD_MAX_QUEUE): se pueden probar otros con variables de entorno.
+
+Uso:
+    python -m benchmarks.bench_login_vs_panic --logins 50 --waves 3
+    ARGON2_MEMORY_COST_KB=19456 ARGON2_TIME_COST=2 python -m benchmarks.bench_login_vs_panic
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.utils.security import get_password_hash, verify_password, verify_password_async, PasswordBusy
+
+
+async def panic_probe(stop, interval, delays):
+    # El retraso entre "debía correr" y "corrió" = lo que espera la alarma
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        due = loop.time() + interval
+        await asyncio.sleep(interval)
+        delays.append((loop.time() - due) * 1000)
+
+
+async def login_old(code, hashed):
+    return verify_password(code, hashed)
+
+
+async def login_new(code, hashed):
+    try:
+        return (await verify_password_async(code, hashed))[0]
+    except PasswordBusy:
+        return None
+
+
+async def run(mode, hashed, logins, waves, interval):
+    stop = asyncio.Event()
+    delays = []
+    probe = asyncio.create_task(panic_probe(stop, interval, delays))
+    await asyncio.sleep(interval * 5)
+
+    login = {"antes": login_old, "ahora": login_new}.get(mode)
+    results = []
+    start = time.perf_counter()
+    for _ in range(waves):
+        if login:
+            results += await asyncio.gather(*[login("123456", hashed) for _ in range(logins)])
+        else:
+            await asyncio.sleep(0.5)
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await probe
+    delays.sort()
+    return {
+        "ok": sum(1 for r in results if r),
+        "busy": sum(1 for r in results if r is None),
+        "login_s": len(results) / elapsed if results else 0,
+        "p50": statistics.median(delays),
+        "p95": delays[max(0, int(len(delays) * 0.95) - 1)],
+        "max": delays[-1],
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--waves", type=int, default=3)
+    parser.add_argument("--panic-ms", type=float, default=10)
+    args = parser.parse_args()
+
+    hashed = get_password_hash("123456")
+    print(f"{args.waves} olas de {args.logins} logins | alarma cada {args.panic_ms:.0f} ms")
+    print(f"{'modo':8} {'ok':>5} {'503':>5} {'login/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    for mode in ("reposo", "antes", "ahora"):
+        r = await run(mode, hashed, args.logins, args.waves, args.panic_ms / 1000)
+        print(f"{mode:8} {r['ok']:>5} {r['busy']:>5} {r['login_s']:>8.1f} {r['p50']:>8.1f} {r['p95']:>8.1f} {r['max']:>8.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
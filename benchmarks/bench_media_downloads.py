@@ -0,0 +1,91 @@
+"""
+Prueba de carga: descargas concurrentes de la sirena (static/sounds/sirena.mp3).
+
+Levanta la app EN ESTE PROCESO (uvicorn) y compara:
+  antes    StaticFiles original (lee el archivo en trozos de 64 KB cada vez)
+  ahora    /static con MediaResponse (ETag fuerte, Range, bytes en memoria)
+
+Escenarios por ruta:
+  completo   N clientes bajan el archivo entero
+  rango      N clientes piden 256 KB (reanudación del <audio> en el celular)
+  revalidar  N clientes con If-None-Match (304 sin cuerpo)
+
+Uso:
+    python -m benchmarks.bench_media_downloads --clients 200 --rounds 3
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+import uvicorn
+from fastapi.staticfiles import StaticFiles
+from starlette.routing import Mount
+
+from app.main import app
+
+PATH = "sounds/sirena.mp3"
+
+
+async def download(client, url, headers):
+    start = time.perf_counter()
+    r = await client.get(url, headers=headers)
+    return r.status_code, len(r.content), (time.perf_counter() - start) * 1000
+
+
+async def scenario(client, url, clients, rounds, headers):
+    latencies, total_bytes, statuses = [], 0, set()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        results = await asyncio.gather(*[download(client, url, headers) for _ in range(clients)])
+        for status, size, ms in results:
+            statuses.add(status)
+            total_bytes += size
+            latencies.append(ms)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "status": ",".join(map(str, sorted(statuses))),
+        "req_s": len(latencies) / elapsed,
+        "mb_s": total_bytes / elapsed / 1024 / 1024,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8798)
+    args = parser.parse_args()
+
+    # Comportamiento anterior, montado aparte (antes que /static) para comparar en el mismo proceso
+    app.router.routes.insert(0, Mount("/static/antes", StaticFiles(directory="static")))
+    server = uvicorn.Server(uvicorn.Config(app, port=args.port, log_level="warning", backlog=4096))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    base = f"http://127.0.0.1:{args.port}"
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=120) as client:
+        print(f"{args.clients} clientes x {args.rounds} rondas, {PATH}")
+        print(f"{'ruta':<8} {'escenario':<10} {'status':>7} {'req/s':>8} {'MB/s':>8} {'p50':>9} {'p95':>9}")
+        for label, prefix in (("antes", "/static/antes/"), ("ahora", "/static/")):
+            url = prefix + PATH
+            etag = (await client.get(url)).headers["etag"] # Calentamiento + ETag de cada ruta
+            for name, headers in (("completo", {}),
+                                  ("rango", {"Range": "bytes=262144-524287"}),
+                                  ("revalidar", {"If-None-Match": etag})):
+                r = await scenario(client, url, args.clients, args.rounds, headers)
+                print(f"{label:<8} {name:<10} {r['status']:>7} {r['req_s']:>8.0f} {r['mb_s']:>8.1f} "
+                      f"{r['p50']:>7.1f}ms {r['p95']:>7.1f}ms")
+
+    server.should_exit = True
+    await server_task
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
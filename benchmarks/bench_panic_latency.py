@@ -0,0 +1,151 @@
+"""
+Benchmark: latencia de alarma de pánico (toque -> pantalla del guardia).
+
+Abre clientes simulados contra un servidor YA levantado:
+  - N residentes ociosos conectados a /ws/alerta
+  - G guardias que miden cuándo les llega ALERTA_CRITICA
+  - F celulares mandando GPS_UPDATE a 1 Hz (ruido de fondo)
+y dispara R pánicos. El primer guardia resuelve cada incidente (PANIC_RESOLVE)
+para que el siguiente toque no caiga en el debounce.
+
+El socket exige sesión: --resident-token / --guard-token son el valor de la
+cookie access_token ("Bearer eyJ...") de un vecino y de un guardia de la MISMA
+organización.
+
+Todos los sockets usan esos DOS tokens: el servidor debe levantarse con
+WS_MAX_PER_MEMBER (y WS_MAX_PER_ORG) por encima de los clientes, si no cierra
+los más viejos (código 4000) y la prueba mide menos guardias de los que cree.
+Los clientes responden PING con PONG (si no, el heartbeat los cierra). Con
+--metrics-token se leen de /metrics las conexiones vivas y las expulsiones.
+
+Uso:
+    WS_MAX_PER_MEMBER=100000 WS_MAX_PER_ORG=100000 METRICS_TOKEN=bench \\
+        uvicorn app.main:app --port 8000 &
+    python -m benchmarks.bench_panic_latency --url ws://localhost:8000/ws/alerta \\
+        --resident-token "Bearer ..." --guard-token "Bearer ..." --metrics-token bench \\
+        --residents 500 --guards 5 --gps 50 --rounds 20
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import urllib.request
+
+import websockets
+
+
+def connect(url, token):
+    return websockets.connect(url, additional_headers={"Cookie": f'access_token="{token}"'})
+
+
+async def receive(ws, timeout):
+    """ Siguiente mensaje (dict) o None; contesta el PING del servidor. """
+    try:
+        data = json.loads(await asyncio.wait_for(ws.recv(), timeout=timeout))
+    except asyncio.TimeoutError:
+        return None
+    if data.get("type") == "PING":
+        await ws.send(json.dumps({"type": "PONG"}))
+    return data
+
+
+async def idle_client(url, token, stop):
+    async with connect(url, token) as ws:
+        while not stop.is_set():
+            await receive(ws, 1)
+
+
+async def gps_client(url, token, stop, hz):
+    async with connect(url, token) as ws:
+        lat = -3.7437
+        while not stop.is_set():
+            lat += 0.0001
+            await ws.send(json.dumps({"type": "GPS_UPDATE", "coords": {"lat": lat, "lon": -73.2516}}))
+            await receive(ws, 1 / hz) # Vaciar lo recibido (alertas, PING) en vez de dormir
+
+
+async def guard_client(url, token, stop, latencies, resolver=False):
+    async with connect(url, token) as ws:
+        while not stop.is_set():
+            data = await receive(ws, 1)
+            if not data:
+                continue
+            if data.get("type") == "ALERTA_CRITICA" and data.get("sent_at"):
+                latencies.append((time.perf_counter() - data["sent_at"]) * 1000)
+                if resolver:
+                    await ws.send(json.dumps({"type": "PANIC_RESOLVE", "incident_id": data["incident_id"]}))
+
+
+def server_metrics(ws_url, token):
+    """ /metrics del servidor (conexiones vivas, expulsiones); None si no se puede leer. """
+    url = ws_url.replace("ws", "http", 1).rsplit("/ws/", 1)[0] + "/metrics"
+    request = urllib.request.Request(url, headers={"Authorization": f"Bearer {token}"})
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return json.loads(response.read())
+    except Exception as e:
+        print(f"  (no se pudo leer {url}: {e})")
+        return None
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="ws://localhost:8000/ws/alerta")
+    parser.add_argument("--resident-token", required=True)
+    parser.add_argument("--guard-token", required=True)
+    parser.add_argument("--residents", type=int, default=200)
+    parser.add_argument("--guards", type=int, default=3)
+    parser.add_argument("--gps", type=int, default=20)
+    parser.add_argument("--gps-hz", type=float, default=1.0)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--metrics-token", default=None) # METRICS_TOKEN del servidor
+    args = parser.parse_args()
+
+    stop = asyncio.Event()
+    latencies = []
+    tasks = [asyncio.create_task(idle_client(args.url, args.resident_token, stop)) for _ in range(args.residents)]
+    tasks += [asyncio.create_task(gps_client(args.url, args.resident_token, stop, args.gps_hz)) for _ in range(args.gps)]
+    tasks += [asyncio.create_task(guard_client(args.url, args.guard_token, stop, latencies, resolver=(i == 0)))
+              for i in range(args.guards)]
+    await asyncio.sleep(2) # Dejar que todos conecten
+
+    # Vivos de verdad: un socket expulsado (4000) o rechazado termina su tarea
+    alive = sum(1 for t in tasks if not t.done())
+    print(f"Clientes conectados: {alive}/{len(tasks)}")
+    if args.metrics_token:
+        metrics = await asyncio.to_thread(server_metrics, args.url, args.metrics_token)
+        if metrics:
+            print(f"  /metrics: {metrics['connections']} conexiones, contadores {metrics['counters']}, "
+                  f"límites {metrics['limits']}")
+    if alive < len(tasks):
+        print("  ⚠️ Faltan clientes: ¿WS_MAX_PER_MEMBER / WS_MAX_PER_ORG del servidor por debajo de la prueba?")
+
+    async with connect(args.url, args.resident_token) as panic_ws:
+        for i in range(args.rounds):
+            await panic_ws.send(json.dumps({
+                "type": "PANIC_BUTTON",
+                "location": "benchmark",
+                "coords": None,
+                "sent_at": time.perf_counter()
+            }))
+            await asyncio.sleep(0.5)
+
+    await asyncio.sleep(2)
+    stop.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    expected = args.rounds * args.guards
+    lost = [t for t in tasks if t.done() and not t.cancelled() and t.exception()]
+    if lost:
+        print(f"Clientes cerrados por el servidor durante la prueba: {len(lost)} ({lost[0].exception()!r})")
+    print(f"Clientes: {args.residents} residentes, {args.guards} guardias, {args.gps} GPS @ {args.gps_hz} Hz")
+    print(f"Alarmas recibidas: {len(latencies)}/{expected}")
+    if latencies:
+        latencies.sort()
+        p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+        print(f"  p50 {statistics.median(latencies):.1f} ms | p95 {p95:.1f} ms | max {latencies[-1]:.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+"""
+Benchmark: arranque en frío y primer request con plantillas Jinja.
+
+Cada escenario corre en un proceso NUEVO (arranque real) y mide:
+  - import de app.main
+  - primer request a varias páginas (compila base.html + la página)
+  - segundo request (ya en caché del entorno)
+
+Escenarios:
+  sin_cache     sin caché de bytecode (compila desde el .html)
+  bytecode_frio caché de bytecode vacío (compila y escribe a disco)
+  bytecode      caché de bytecode ya poblado (reinicio de worker / deploy)
+  precompilado  bytecode + precompile_templates() antes del primer request
+
+Uso:
+    python -m benchmarks.bench_template_startup
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+PAGES = ["/login", "/", "/resumen", "/demo/ads"]
+
+
+def child(precompile):
+    start = time.perf_counter()
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.templating import precompile_templates
+    result = {"import_ms": (time.perf_counter() - start) * 1000}
+
+    if precompile:
+        start = time.perf_counter()
+        precompile_templates()
+        result["precompile_ms"] = (time.perf_counter() - start) * 1000
+
+    client = TestClient(app)
+    for label in ("first", "second"):
+        start = time.perf_counter()
+        for page in PAGES:
+            client.get(page, follow_redirects=False)
+        result[f"{label}_ms"] = (time.perf_counter() - start) * 1000
+    print("RESULT " + json.dumps(result))
+
+
+def run(scenario, cache_dir):
+    env = dict(os.environ, TEMPLATES_PRECOMPILE="false", TEMPLATES_AUTO_RELOAD="false")
+    env["TEMPLATE_CACHE_DIR"] = "" if scenario == "sin_cache" else cache_dir
+    args = [sys.executable, "-m", "benchmarks.bench_template_startup", "--child"]
+    if scenario == "precompilado":
+        args.append("--precompile")
+    out = subprocess.run(args, env=env, capture_output=True, text=True).stdout
+    line = next(l for l in out.splitlines() if l.startswith("RESULT "))
+    return json.loads(line[len("RESULT "):])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--child", action="store_true")
+    parser.add_argument("--precompile", action="store_true")
+    args = parser.parse_args()
+    if args.child:
+        return child(args.precompile)
+
+    cache_dir = tempfile.mkdtemp(prefix="jinja-bench-")
+    try:
+        print(f"{'escenario':<14} {'import':>9} {'precomp.':>9} {'1er req':>9} {'2do req':>9}  ({len(PAGES)} páginas)")
+        for scenario in ("sin_cache", "bytecode_frio", "bytecode", "precompilado"):
+            r = run(scenario, cache_dir)
+            print(f"{scenario:<14} {r['import_ms']:>7.0f}ms {r.get('precompile_ms', 0):>7.0f}ms "
+                  f"{r['first_ms']:>7.1f}ms {r['second_ms']:>7.1f}ms")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+-- =====================================================================
+-- 027: access_logs y panic_logs particionadas por MES (RANGE created_at)
+-- Ejecutar una sola vez en Postgres (>= 12):
+--   psql "$DATABASE_URL" -f migrations/027_partition_access_panic_logs.sql
+-- Después, app/core/partitions.py crea los meses futuros y archiva los viejos.
+-- =====================================================================
+BEGIN;
+
+-- ---------------------------------------------------------------------
+-- ACCESS LOGS
+-- ---------------------------------------------------------------------
+ALTER TABLE access_logs RENAME TO access_logs_legacy;
+ALTER INDEX IF EXISTS access_logs_pkey RENAME TO access_logs_legacy_pkey;
+
+CREATE TABLE access_logs (
+    id              INTEGER NOT NULL DEFAULT nextval('access_logs_id_seq'),
+    organization_id INTEGER REFERENCES organizations(id),
+    member_id       INTEGER REFERENCES members(id),
+    visitor_name    VARCHAR,
+    visitor_dni     VARCHAR,
+    target_unit     VARCHAR,
+    direction       VARCHAR,
+    method          VARCHAR,
+    created_at      TIMESTAMPTZ NOT NULL DEFAULT now(),
+    -- En tablas particionadas la PK debe incluir la llave de partición
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- La secuencia pasa a la tabla nueva (si no, el DROP de la vieja la borra)
+ALTER SEQUENCE access_logs_id_seq OWNED BY access_logs.id;
+
+-- Red de seguridad: un evento de portería nunca debe fallar por falta de partición
+CREATE TABLE access_logs_default PARTITION OF access_logs DEFAULT;
+
+CREATE INDEX ix_access_logs_org_created ON access_logs (organization_id, created_at);
+
+-- ---------------------------------------------------------------------
+-- PANIC LOGS
+-- ---------------------------------------------------------------------
+ALTER TABLE panic_logs RENAME TO panic_logs_legacy;
+ALTER INDEX IF EXISTS panic_logs_pkey RENAME TO panic_logs_legacy_pkey;
+
+CREATE TABLE panic_logs (
+    id              INTEGER NOT NULL DEFAULT nextval('panic_logs_id_seq'),
+    member_id       INTEGER REFERENCES members(id),
+    organization_id INTEGER REFERENCES organizations(id),
+    lat             DOUBLE PRECISION,
+    lon             DOUBLE PRECISION,
+    address_ref     VARCHAR,
+    created_at      TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+ALTER SEQUENCE panic_logs_id_seq OWNED BY panic_logs.id;
+
+CREATE TABLE panic_logs_default PARTITION OF panic_logs DEFAULT;
+
+CREATE INDEX ix_panic_logs_org_created ON panic_logs (organization_id, created_at);
+
+-- ---------------------------------------------------------------------
+-- PARTICIONES MENSUALES: desde el dato más antiguo hasta 2 meses adelante
+-- ---------------------------------------------------------------------
+DO $$
+DECLARE
+    t TEXT;
+    m DATE;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['access_logs', 'panic_logs'] LOOP
+        FOR m IN EXECUTE format(
+            'SELECT generate_series(date_trunc(''month'', COALESCE(min(created_at), now())),
+                                    date_trunc(''month'', now()) + interval ''2 month'',
+                                    interval ''1 month'')::date
+             FROM %I', t || '_legacy')
+        LOOP
+            EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                           t || '_' || to_char(m, 'YYYY_MM'), t, m, (m + interval '1 month')::date);
+        END LOOP;
+    END LOOP;
+END $$;
+
+-- ---------------------------------------------------------------------
+-- COPIAR HISTÓRICO Y ELIMINAR TABLAS VIEJAS
+-- ---------------------------------------------------------------------
+INSERT INTO access_logs (id, organization_id, member_id, visitor_name, visitor_dni,
+                         target_unit, direction, method, created_at)
+SELECT id, organization_id, member_id, visitor_name, visitor_dni,
+       target_unit, direction, method, COALESCE(created_at, now())
+FROM access_logs_legacy;
+
+INSERT INTO panic_logs (id, member_id, organization_id, lat, lon, address_ref, created_at)
+SELECT id, member_id, organization_id, lat, lon, address_ref, COALESCE(created_at, now())
+FROM panic_logs_legacy;
+
+DROP TABLE access_logs_legacy;
+DROP TABLE panic_logs_legacy;
+
+COMMIT;
@@ -0,0 +1,17 @@
+-- =====================================================================
+-- 031: Segmentación de comunicados (app/core/targeting.py)
+--   psql "$DATABASE_URL" -f migrations/031_member_targeting.sql
+-- =====================================================================
+BEGIN;
+
+ALTER TABLE members ADD COLUMN IF NOT EXISTS attributes JSON DEFAULT '{}';
+
+-- rol y prefijo de unidad ("Torre A%") siempre van junto a organization_id
+CREATE INDEX IF NOT EXISTS ix_members_org_role ON members (organization_id, role);
+CREATE INDEX IF NOT EXISTS ix_members_org_unit ON members (organization_id, unit_info text_pattern_ops);
+
+-- Atributos más usados en colegios (grado / sección)
+CREATE INDEX IF NOT EXISTS ix_members_org_grado ON members (organization_id, (attributes->>'grado'));
+CREATE INDEX IF NOT EXISTS ix_members_org_seccion ON members (organization_id, (attributes->>'seccion'));
+
+COMMIT;
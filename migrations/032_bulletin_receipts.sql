@@ -0,0 +1,26 @@
+-- =====================================================================
+-- 032: Acuses compactos de comunicados (app/core/receipts.py)
+--   psql "$DATABASE_URL" -f migrations/032_bulletin_receipts.sql
+--   python -m app.core.receipts migrate   # bulletin_events -> bitmaps
+-- =====================================================================
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS bulletin_receipts (
+    bulletin_id      INTEGER PRIMARY KEY REFERENCES bulletins(id),
+    organization_id  INTEGER REFERENCES organizations(id),
+    base_member_id   INTEGER DEFAULT 0,
+    sent_bits        BYTEA DEFAULT '',
+    read_bits        BYTEA DEFAULT '',
+    confirmed_bits   BYTEA DEFAULT '',
+    sent_count       INTEGER DEFAULT 0,
+    read_count       INTEGER DEFAULT 0,
+    confirmed_count  INTEGER DEFAULT 0,
+    updated_at       TIMESTAMPTZ DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS ix_bulletin_receipts_organization_id ON bulletin_receipts (organization_id);
+
+COMMIT;
+
+-- bulletin_events queda solo como histórico; tras migrar y verificar:
+--   DROP TABLE bulletin_events;
@@ -0,0 +1,7 @@
+-- =====================================================================
+-- 033: Últimos comunicados por organización (app/core/bulletins.py)
+--   psql "$DATABASE_URL" -f migrations/033_bulletins_org_created.sql
+-- =====================================================================
+
+-- Fuera de transacción: CONCURRENTLY no bloquea la creación de comunicados
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_bulletins_org_created ON bulletins (organization_id, created_at DESC);
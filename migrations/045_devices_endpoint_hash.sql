@@ -0,0 +1,19 @@
+-- =====================================================================
+-- 045: Registro de dispositivos por hash del endpoint (app/core/devices.py)
+--   psql "$DATABASE_URL" -f migrations/045_devices_endpoint_hash.sql
+-- =====================================================================
+BEGIN;
+
+ALTER TABLE devices ADD COLUMN IF NOT EXISTS endpoint_hash VARCHAR(64);
+
+-- Mismo cálculo que endpoint_hash() en Python: sha256 del texto, en hex
+UPDATE devices SET endpoint_hash = encode(sha256(convert_to(push_endpoint, 'UTF8')), 'hex')
+WHERE endpoint_hash IS NULL AND push_endpoint IS NOT NULL;
+
+COMMIT;
+
+-- Fuera de transacción: CONCURRENTLY no bloquea las suscripciones
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ux_devices_endpoint_hash ON devices (endpoint_hash);
+
+-- El índice único sobre el texto completo ya no hace falta
+ALTER TABLE devices DROP CONSTRAINT IF EXISTS devices_push_endpoint_key;
@@ -0,0 +1,30 @@
+-- =====================================================================
+-- 046: Feed de mascotas con cursor + contadores sociales (app/core/social.py)
+--   psql "$DATABASE_URL" -f migrations/046_social_counters.sql
+-- =====================================================================
+BEGIN;
+
+ALTER TABLE pets ADD COLUMN IF NOT EXISTS reaction_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE pets ADD COLUMN IF NOT EXISTS comment_count INTEGER NOT NULL DEFAULT 0;
+
+-- Likes repetidos (antes no había restricción): queda el más antiguo
+DELETE FROM reactions r USING reactions older
+WHERE r.target_type = older.target_type AND r.target_id = older.target_id
+  AND r.member_id = older.member_id AND r.reaction_type = older.reaction_type
+  AND r.id > older.id;
+
+-- Totales iniciales desde las tablas genéricas
+UPDATE pets p SET reaction_count = c.total
+FROM (SELECT target_id, COUNT(*) AS total FROM reactions WHERE target_type = 'pet' GROUP BY target_id) c
+WHERE p.id = c.target_id;
+
+UPDATE pets p SET comment_count = c.total
+FROM (SELECT target_id, COUNT(*) AS total FROM comments WHERE target_type = 'pet' GROUP BY target_id) c
+WHERE p.id = c.target_id;
+
+COMMIT;
+
+-- Fuera de transacción: CONCURRENTLY no bloquea likes ni altas de mascotas
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_pets_org_id ON pets (organization_id, id);
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ux_reactions_target_member ON reactions (target_type, target_id, member_id, reaction_type);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_comments_target ON comments (target_type, target_id, created_at);
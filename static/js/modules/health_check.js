@@ -14,6 +14,7 @@ async function checkHealthAndReport() {
                   window.navigator.standalone === true;
 
     const status = {
+        device_id: Number(localStorage.getItem('deviceId')) || null, // Lo guarda dashboard.js al suscribirse
         online: navigator.onLine,
         permission: Notification.permission,
         userAgent: navigator.userAgent,
@@ -25,6 +25,25 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    // Cierres del servidor: 4000 = desplazado por otra pestaña/dispositivo del
+    // mismo vecino, 1008 = sesión inválida -> NO reconectar (se pelearían).
+    // 1013 (servidor lleno) / 1006 (red): espera exponencial con azar.
+    let reintentos = 0;
+    let desplazado = false;
+
+    function esperaReintento() {
+        const base = Math.min(30000, 1000 * 2 ** reintentos++);
+        return base / 2 + Math.random() * base / 2;
+    }
+
+    // La pestaña desplazada vuelve a conectarse solo si el vecino la usa de nuevo
+    document.addEventListener('visibilitychange', () => {
+        if (desplazado && document.visibilityState === 'visible') {
+            desplazado = false;
+            connectWebSocket();
+        }
+    });
+
     function connectWebSocket() {
         if (socket && socket.readyState === WebSocket.OPEN) return;
 
@@ -32,16 +51,33 @@ document.addEventListener('DOMContentLoaded', () => {
         socket = new WebSocket(config.wsUrl);
 
         socket.onopen = () => {
+            reintentos = 0;
             console.log("🟢 WS Conectado");
             updateConnectionUI('connected');
+            enviarPanicoPendiente();
         };
 
         socket.onmessage = (event) => {
             const data = JSON.parse(event.data);
             
+            // Latido del servidor: sin respuesta, el socket se da por muerto
+            if (data.type === "PING") {
+                socket.send(JSON.stringify({ type: "PONG" }));
+                return;
+            }
+
+            // El servidor recibió el pánico: sale de la cola offline
+            if (data.type === "PANIC_ACK") {
+                localStorage.removeItem('panicPending');
+                return;
+            }
+            
             if (data.type === "ALERTA_CRITICA") {
                 mostrarAlerta(data);
             }
+            else if (data.type === "PET_LOST") {
+                if(window.Toast) window.Toast.show(`🐾 ${data.msg}`, 'warning', 8000);
+            }
             else if (data.type === "BULLETIN") {
                 // NUEVO: Agregar globo en tiempo real
                 agregarGloboBoletin(data);
@@ -67,16 +103,19 @@ document.addEventListener('DOMContentLoaded', () => {
                 // 4. Recargar lista de detalles (si está abierta)
                 const detail = document.getElementById('debt-details-container');
                 if(detail && detail.innerHTML.trim() !== "") {
-                     htmx.ajax('GET', '/finance/my-debts-detail', {target: '#debt-details-container', swap: 'innerHTML'});
+                     htmx.ajax('GET', '/finance/my-debts-detail', {target: '#debt-details-container', swap: 'innerHTML', headers: {'Cache-Control': 'no-cache'}});
                 }
             }
 
         };
 
-        socket.onclose = () => {
-            console.log("🔴 WS Desconectado. Reintentando...");
+        socket.onclose = (event) => {
             updateConnectionUI('disconnected');
-            setTimeout(connectWebSocket, 3000);
+            if (event.code === 4000) { desplazado = true; return; }
+            if (event.code === 1008) return;
+            const espera = esperaReintento();
+            console.log(`🔴 WS Desconectado (${event.code}). Reintentando en ${Math.round(espera / 1000)} s...`);
+            setTimeout(connectWebSocket, espera);
         };
         
         socket.onerror = (err) => {
@@ -141,6 +180,12 @@ document.addEventListener('DOMContentLoaded', () => {
         }
 
         modal.showModal();
+
+        // Acuse de lectura (una vez por globo; el servidor lo junta en lote)
+        if (d.id && !d.readSent) {
+            element.dataset.readSent = "1";
+            fetch(`/api/bulletins/${d.id}/read`, { method: 'POST', credentials: 'same-origin' }).catch(() => {});
+        }
     };
 
         // *******************************************************************************
@@ -185,6 +230,7 @@ document.addEventListener('DOMContentLoaded', () => {
         // Crear HTML
         const html = `
         <div onclick="verDetalleBoletin(this)"
+             data-id="${data.bulletin_id || ''}"
              data-title="${data.title}"
              data-content="${safeContent}" 
              data-priority="${data.priority}"
@@ -223,14 +269,14 @@ document.addEventListener('DOMContentLoaded', () => {
             // Confirmación visual rápida (Vibración)
             if (navigator.vibrate) navigator.vibrate([500, 200, 500]);
 
-            // Enviar WebSocket
-            socket.send(JSON.stringify({
-                type: "PANIC_BUTTON",
-                user: `${config.user.name} (${config.user.unit})`,
-                location: "Ubicación pendiente...",
-                coords: null,
-                user_id: config.user.id
-            }));
+            // Enviar WebSocket (sin conexión: queda en cola y sale al reconectar)
+            localStorage.setItem('panicPending', JSON.stringify({ at: Date.now(), coords: null }));
+            if (socket && socket.readyState === WebSocket.OPEN) {
+                enviarPanicoPendiente();
+            } else {
+                if(window.Toast) window.Toast.show("Sin conexión: la alerta se enviará al reconectar", 'error', 8000);
+                connectWebSocket();
+            }
 
             // GPS en segundo plano... (tu código existente de GPS)
             if ("geolocation" in navigator) {
@@ -246,6 +292,21 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
 
+    // Cola de pánico compartida con la pantalla offline (pages/offline.html)
+    function enviarPanicoPendiente() {
+        const pending = JSON.parse(localStorage.getItem('panicPending') || 'null');
+        if (!pending || !socket || socket.readyState !== WebSocket.OPEN) return;
+        if (Date.now() - pending.at > 30 * 60 * 1000) {
+            localStorage.removeItem('panicPending'); // Demasiado vieja
+            return;
+        }
+        socket.send(JSON.stringify({
+            type: "PANIC_BUTTON",
+            location: "Ubicación pendiente...",
+            coords: pending.coords
+        }));
+    }
+
     // B. Botón Amarillo (Llegando)
     const btnLlegando = document.getElementById('btn-llegando');
     if (btnLlegando) {
@@ -402,6 +463,8 @@ document.addEventListener('DOMContentLoaded', () => {
             });
 
             if (response.ok) {
+                const result = await response.json();
+                if (result.device_id) localStorage.setItem('deviceId', result.device_id); // Para /api/health/report
                 alert("✅ Notificaciones activadas y dispositivo registrado.");
             } else {
                 console.error("Error respuesta servidor:", await response.text());
@@ -210,18 +210,35 @@ document.addEventListener('DOMContentLoaded', () => {
     const wsUrl = window.APP_CONFIG ? window.APP_CONFIG.wsUrl : 
                   (window.location.protocol === 'https:' ? 'wss:' : 'ws:') + '//' + window.location.host + '/ws/alerta';
 
+    // 4000 = desplazado por otra consola del mismo usuario, 1008 = sesión
+    // inválida: no reconectar. 1013 (servidor lleno) / 1006 (red): espera
+    // exponencial con azar para no martillar al servidor.
+    let reintentos = 0;
+    let desplazado = false;
+
+    document.addEventListener('visibilitychange', () => {
+        if (desplazado && document.visibilityState === 'visible') {
+            desplazado = false;
+            connect();
+        }
+    });
+
     function connect() {
         if (socket && socket.readyState === WebSocket.OPEN) return;
         socket = new WebSocket(wsUrl);
         
         socket.onopen = () => {
+            reintentos = 0;
             updateConnectionStatus(true);
             window.logSystem("Centinela Online.", "text-green-500");
         };
         socket.onmessage = (e) => handleMessage(JSON.parse(e.data));
-        socket.onclose = () => {
+        socket.onclose = (event) => {
             updateConnectionStatus(false);
-            setTimeout(connect, 3000);
+            if (event.code === 4000) { desplazado = true; return; }
+            if (event.code === 1008) return;
+            const base = Math.min(30000, 1000 * 2 ** reintentos++);
+            setTimeout(connect, base / 2 + Math.random() * base / 2);
         };
     }
 
@@ -240,8 +257,11 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     function handleMessage(data) {
+        // Latido del servidor: sin respuesta, el socket se da por muerto
+        if (data.type === "PING") { socket.send(JSON.stringify({ type: "PONG" })); return; }
         if (data.type === "ALERTA_CRITICA") triggerVisual(data, "bg-red-600", "⚠️ PÁNICO", radioSiren, true);
         else if (data.type === "PRE_ARRIVAL") triggerVisual(data, "bg-yellow-600", "🚶 LLEGANDO", soundDing, false);
+        else if (data.type === "PET_LOST") triggerVisual(data, "bg-yellow-600", "🐾 MASCOTA", soundDing, false);
         else if (data.type === "INFO_ACCESS") actualizarLlegada(data);
     }
 
@@ -1,118 +0,0 @@
-/**
- * CCPL - Service Worker
- * PWA Offline Support
- */
-
-const CACHE_NAME = 'ccpl-v1';
-const urlsToCache = [
-  '/',
-  '/static/css/sites/ccp-loreto.css',
-  '/static/js/sites/ccp-loreto.js',
-  '/static/manifest.json',
-  '/static/img/logo-ccpl.png',
-  '/static/img/icon-192.png',
-  '/static/img/icon-512.png'
-];
-
-// Install Service Worker
-self.addEventListener('install', (event) => {
-  console.log('Service Worker: Installing...');
-  
-  event.waitUntil(
-    caches.open(CACHE_NAME)
-      .then((cache) => {
-        console.log('Service Worker: Caching files');
-        return cache.addAll(urlsToCache);
-      })
-      .then(() => self.skipWaiting())
-  );
-});
-
-// Activate Service Worker
-self.addEventListener('activate', (event) => {
-  console.log('Service Worker: Activating...');
-  
-  event.waitUntil(
-    caches.keys()
-      .then((cacheNames) => {
-        return Promise.all(
-          cacheNames.map((cache) => {
-            if (cache !== CACHE_NAME) {
-              console.log('Service Worker: Clearing old cache');
-              return caches.delete(cache);
-            }
-          })
-        );
-      })
-      .then(() => self.clients.claim())
-  );
-});
-
-// Fetch Strategy: Cache First, then Network
-self.addEventListener('fetch', (event) => {
-  event.respondWith(
-    caches.match(event.request)
-      .then((response) => {
-        // Return cached version or fetch from network
-        return response || fetch(event.request);
-      })
-      .catch(() => {
-        // Fallback for offline
-        if (event.request.destination === 'document') {
-          return caches.match('/');
-        }
-      })
-  );
-});
-
-// Background Sync (for future implementation)
-self.addEventListener('sync', (event) => {
-  if (event.tag === 'sync-payments') {
-    event.waitUntil(syncPayments());
-  }
-});
-
-async function syncPayments() {
-  // TODO: Implement payment sync logic
-  console.log('Service Worker: Syncing payments...');
-}
-
-// Push Notifications (for future implementation)
-self.addEventListener('push', (event) => {
-  const data = event.data ? event.data.json() : {};
-  const options = {
-    body: data.body || 'Tienes una nueva notificación',
-    icon: '/static/img/icon-192.png',
-    badge: '/static/img/icon-192.png',
-    vibrate: [200, 100, 200],
-    data: {
-      dateOfArrival: Date.now(),
-      primaryKey: data.primaryKey || 1
-    },
-    actions: [
-      {
-        action: 'explore',
-        title: 'Ver más'
-      },
-      {
-        action: 'close',
-        title: 'Cerrar'
-      }
-    ]
-  };
-
-  event.waitUntil(
-    self.registration.showNotification(data.title || 'CCPL', options)
-  );
-});
-
-// Notification Click Handler
-self.addEventListener('notificationclick', (event) => {
-  event.notification.close();
-
-  if (event.action === 'explore') {
-    event.waitUntil(
-      clients.openWindow('/')
-    );
-  }
-});
\ No newline at end of file